@@ -0,0 +1,383 @@
+"""
+Benchmarks of pippy against a local stand-in for the PIP API.
+
+The stub server (pippy.testing.StubPIPServer) runs in a separate process,
+so serving responses doesn't compete with the client for the GIL. It serves
+payloads the size of the production API's: about 170 countries over 42
+years. Each response is rendered once and replayed, so the timings measure
+pippy rather than the stub.
+
+Run the suite and write the results to a JSON file:
+
+    python -m benchmarks.bench run --output results.json
+
+Compare two runs, flagging benchmarks whose median got slower by more than
+the threshold (the exit status is 1 if any did):
+
+    python -m benchmarks.bench compare baseline.json results.json
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import requests
+
+import pippy
+from pippy import cache
+from pippy.cache import _read_entry, cache_frame, memory_cache
+from pippy.schema import SCHEMA, frame_from_records
+from pippy.server import get_base_url
+from pippy.testing import scaled_countries, StubPIPServer
+from pippy.wire import frame_from_arrow, read_arrow
+
+# Sizes of the payloads: "full" is about the size of the production API,
+# "quick" is for smoke tests.
+SIZES = {
+    "full": {"countries": 170, "years": range(1981, 2023), "fanout": 64},
+    "quick": {"countries": 30, "years": range(2010, 2020), "fanout": 8},
+}
+
+# Latency the stub adds to each request in the fan-out benchmark, seconds.
+FANOUT_DELAY = 0.02
+
+# Relative slowdown of the median above which compare() flags a benchmark.
+REGRESSION_THRESHOLD = 0.10
+
+
+def _serve(connection, countries, years, delay):
+    """Run a stub server in this process until told to stop."""
+    stub = StubPIPServer(
+        countries=scaled_countries(countries),
+        years=list(years),
+        delay=delay,
+        memoize=True,
+    ).start()
+    connection.send(stub.url)
+    connection.recv()
+    stub.stop()
+
+
+class _Server:
+    """A stub server running in a child process."""
+
+    def __init__(self, countries, years, delay=0.0):
+        context = multiprocessing.get_context("spawn")
+        self._connection, child = context.Pipe()
+        self._process = context.Process(
+            target=_serve,
+            args=(child, countries, years, delay),
+            daemon=True,
+        )
+
+    def __enter__(self):
+        self._process.start()
+        self.url = self._connection.recv()
+        return self
+
+    def __exit__(self, *exc):
+        self._connection.send("stop")
+        self._process.join(timeout=10)
+
+
+def _time(func, repeat, setup=None):
+    """Time ``func`` ``repeat`` times after a warm-up run."""
+    if setup is not None:
+        setup()
+    func()
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _result(timings, amount=None, unit=None):
+    median = statistics.median(timings)
+    result = {
+        "median": median,
+        "min": min(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "repeat": len(timings),
+    }
+    if amount is not None:
+        result["throughput"] = amount / median
+        result["unit"] = unit
+    return result
+
+
+def _clear_cache():
+    memory_cache.clear()
+    for path in cache.CACHE_DIR.rglob("*"):
+        if path.is_file():
+            path.unlink()
+
+
+def bench_get_stats(repeat):
+    """Cold and warm latency of a full ``fill_gaps=True`` get_stats()."""
+    rows = len(pippy.get_stats(fill_gaps=True, use_cache=False))
+
+    def warm_disk():
+        memory_cache.clear()
+
+    query = lambda: pippy.get_stats(fill_gaps=True)  # noqa: E731
+    arrow = lambda: pippy.get_stats(  # noqa: E731
+        fill_gaps=True, format="arrow"
+    )
+    return {
+        "get_stats_cold": _result(
+            _time(query, repeat, _clear_cache), rows, "rows/s"
+        ),
+        "get_stats_cold_arrow": _result(
+            _time(arrow, repeat, _clear_cache), rows, "rows/s"
+        ),
+        "get_stats_warm_disk": _result(
+            _time(query, repeat, warm_disk), rows, "rows/s"
+        ),
+        "get_stats_warm_memory": _result(_time(query, repeat), rows, "rows/s"),
+    }
+
+
+def bench_parse(repeat):
+    """
+    Parsing the same table from JSON, CSV and Arrow, and building frames.
+    """
+    url = f"{get_base_url()}/pip"
+    bodies = {
+        format: requests.get(
+            url, params={"fill_gaps": "true", "format": format}
+        ).content
+        for format in ("json", "csv", "arrow")
+    }
+    records = json.loads(bodies["json"])
+    table = read_arrow(bodies["arrow"])
+    rows = len(records)
+    megabytes = len(bodies["json"]) / 1e6
+    return {
+        "parse_json": _result(
+            _time(lambda: json.loads(bodies["json"]), repeat),
+            megabytes,
+            "MB/s",
+        ),
+        "parse_csv": _result(
+            _time(lambda: pd.read_csv(io.BytesIO(bodies["csv"])), repeat),
+            rows,
+            "rows/s",
+        ),
+        "build_frame": _result(
+            _time(lambda: frame_from_records(records), repeat),
+            rows,
+            "rows/s",
+        ),
+        "build_frame_compact": _result(
+            _time(lambda: frame_from_records(records, SCHEMA), repeat),
+            rows,
+            "rows/s",
+        ),
+        "parse_arrow": _result(
+            _time(lambda: read_arrow(bodies["arrow"]), repeat),
+            len(bodies["arrow"]) / 1e6,
+            "MB/s",
+        ),
+        "build_frame_arrow": _result(
+            _time(lambda: frame_from_arrow(table), repeat),
+            rows,
+            "rows/s",
+        ),
+    }
+
+
+def bench_cache(repeat):
+    """Throughput of writing a frame to the disk cache and reading it back."""
+    df = pippy.get_stats(fill_gaps=True, use_cache=False)
+    key = "bench/frame"
+    cache_frame(key, df, None)
+    size = sum(
+        path.stat().st_size for path in cache.CACHE_DIR.glob("bench/frame.*")
+    )
+    megabytes = size / 1e6
+    return {
+        "cache_write": _result(
+            _time(lambda: cache_frame(key, df, None), repeat),
+            megabytes,
+            "MB/s",
+        ),
+        "cache_read": _result(
+            _time(lambda: _read_entry(key), repeat), megabytes, "MB/s"
+        ),
+    }
+
+
+def bench_fanout(repeat, countries):
+    """Throughput of many small queries run concurrently."""
+    queries = [
+        {"country": country[0], "use_cache": False}
+        for country in scaled_countries(countries)
+    ]
+    return {
+        "fanout": _result(
+            _time(lambda: pippy.get_stats_many(queries), repeat),
+            len(queries),
+            "queries/s",
+        )
+    }
+
+
+def run(size="full", repeat=5):
+    """
+    Run every benchmark.
+
+    Args:
+        size (str): 'full' for production-sized payloads or 'quick' for a
+            smoke test. Defaults to 'full'.
+        repeat (int): Timed runs of each benchmark. Defaults to 5.
+
+    Returns:
+        dict: ``meta`` describing the environment and ``results`` mapping
+            benchmark names to their timings in seconds.
+    """
+    sizes = SIZES[size]
+    original = get_base_url(check=False)
+    original_dir = cache.CACHE_DIR
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        pippy.configure_cache(directory=directory)
+        try:
+            with _Server(sizes["countries"], sizes["years"]) as server:
+                pippy.set_server(server.url)
+                results.update(bench_get_stats(repeat))
+                results.update(bench_parse(repeat))
+                results.update(bench_cache(repeat))
+            with _Server(
+                sizes["fanout"], sizes["years"], FANOUT_DELAY
+            ) as server:
+                pippy.set_server(server.url)
+                results.update(bench_fanout(repeat, sizes["fanout"]))
+        finally:
+            pippy.set_server(original, lazy=True)
+            pippy.configure_cache(directory=original_dir)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "size": size,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "pyarrow": _version("pyarrow"),
+            "pippy": pippy.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def _version(module):
+    try:
+        return __import__(module).__version__
+    except ImportError:
+        return None
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare two runs benchmark by benchmark.
+
+    Args:
+        baseline (dict): Results of run() to compare against.
+        current (dict): Results of run() to check.
+        threshold (float): Relative increase of the median time that counts
+            as a regression. Defaults to REGRESSION_THRESHOLD.
+
+    Returns:
+        list: ``(name, baseline median, current median, ratio, status)``
+            for every benchmark in both runs, where status is 'regression',
+            'improvement' or 'ok'.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"]
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append((name, before["median"], result["median"], ratio, status))
+    return rows
+
+
+def _print_results(report):
+    print(f"{'benchmark':<24}{'median':>12}{'min':>12}  throughput")
+    for name, result in report["results"].items():
+        throughput = ""
+        if "throughput" in result:
+            throughput = f"{result['throughput']:,.1f} {result['unit']}"
+        print(
+            f"{name:<24}{result['median'] * 1e3:>10.2f}ms"
+            f"{result['min'] * 1e3:>10.2f}ms  {throughput}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.bench", description=__doc__.split("\n")[1]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", help="write the results to this file")
+    run_parser.add_argument("--size", choices=sorted(SIZES), default="full")
+    run_parser.add_argument("--repeat", type=int, default=5)
+    compare_parser = commands.add_parser(
+        "compare", help="compare two result files"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=REGRESSION_THRESHOLD
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args.size, args.repeat)
+        _print_results(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["meta"]["size"] != current["meta"]["size"]:
+        print(
+            "warning: the runs used different payload sizes",
+            file=sys.stderr,
+        )
+    rows = compare(baseline, current, args.threshold)
+    print(f"{'benchmark':<24}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, before, after, ratio, status in rows:
+        flag = "" if status == "ok" else f"  {status.upper()}"
+        print(
+            f"{name:<24}{before * 1e3:>10.2f}ms{after * 1e3:>10.2f}ms"
+            f"{ratio:>8.2f}{flag}"
+        )
+    return 1 if any(row[4] == "regression" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
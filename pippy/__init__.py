@@ -1,4 +1,6 @@
-from .stats import get_stats, get_wb
+from .stats import get_stats, get_wb, get_stats_many, iter_stats
+from .curve import get_poverty_curve
+from .aggregate import aggregate_stats
 from .auxiliary import (
     get_aux,
     get_countries,
@@ -6,9 +8,26 @@ from .auxiliary import (
     get_cpi,
     get_dictionary,
     get_gdp,
+    get_country_lookup,
+    get_aux_indexed,
+    enrich_stats,
+)
+from .aio import (
+    get_stats_async,
+    get_wb_async,
+    get_aux_async,
+    get_countries_async,
+    get_regions_async,
+    get_cpi_async,
+    get_dictionary_async,
+    get_gdp_async,
 )
 from .utils import check_api, get_versions, get_pip_info
-from .exceptions import PIPAPIError
+from .exceptions import PIPAPIError, CircuitOpenError
 from .server import set_server
+from .session import configure_session
+from .resilience import configure_retries
+from .cache import configure_cache
+from . import metrics
 
 __version__ = "0.1.0"
@@ -0,0 +1,196 @@
+"""
+Population-weighted aggregation of country-level statistics.
+
+The ``pip-grp`` endpoint behind get_wb() only aggregates to the World Bank
+regions. aggregate_stats() computes the same kind of aggregates locally for
+any grouping of countries (income groups, lending categories, a portfolio)
+from the country rows get_stats() returns. Rows are mapped to integer group
+codes once and every measure is reduced with ``numpy.bincount``, so the cost
+is a few vectorized passes over the data whatever the number of groups.
+"""
+
+from .exceptions import PIPAPIError
+from .lazy import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+MEASURES = [
+    "headcount",
+    "poverty_gap",
+    "poverty_severity",
+    "watts",
+    "mean",
+]
+
+
+def aggregate_stats(
+    df, groups="region_code", pop=None, measures=None, total=None
+):
+    """
+    Aggregate country-level statistics to groups of countries.
+
+    Each measure is averaged over the countries of a group, weighted by
+    population, separately for each reporting year (and poverty line, if
+    the frame holds several). Countries with a missing value for a measure
+    are left out of that measure's average. Only measures whose group value
+    is such an average are in MEASURES: the median, Gini index and other
+    features of a group's distribution can't be derived from country rows. To reproduce get_wb(), pass the
+    output of ``get_stats(fill_gaps=True)``, which has a row for every
+    country and year.
+
+    Args:
+        df (pandas.DataFrame): Country-level rows from get_stats(). Where a
+            country and year have several rows, the national one is used,
+            or else the first.
+        groups (str, dict or pandas.Series): A column of ``df`` to group by,
+            or a mapping of country codes to group codes. Countries the
+            mapping leaves out are dropped. Defaults to 'region_code'.
+        pop (pandas.DataFrame, optional): Population by ``country_code`` and
+            ``year`` in a ``pop`` column, e.g. ``get_aux('pop')``. Defaults
+            to the ``reporting_pop`` column of ``df``.
+        measures (list, optional): Columns to aggregate. Defaults to those
+            of MEASURES that ``df`` has.
+        total (str, optional): Also aggregate all countries into a group
+            with this code, e.g. 'WLD'.
+
+    Returns:
+        pandas.DataFrame: One row per group, year and poverty line with the
+            group code (in a column named after ``groups`` if it is a
+            column, else ``group_code``), ``reporting_year``,
+            ``poverty_line``, ``reporting_pop``, the measures and
+            ``pop_in_poverty`` when ``headcount`` is aggregated.
+
+    Raises:
+        PIPAPIError: If a required column is missing or a country has no
+            population.
+    """
+    for column in ("country_code", "reporting_year"):
+        if column not in df.columns:
+            raise PIPAPIError(f"Country-level data needs a {column} column")
+    if measures is None:
+        measures = [m for m in MEASURES if m in df.columns]
+    missing = [m for m in measures if m not in df.columns]
+    if missing:
+        raise PIPAPIError(f"Unknown measures: {', '.join(missing)}")
+
+    df = _one_row_per_country(df)
+    weights = _population(df, pop)
+    if isinstance(groups, str):
+        if groups not in df.columns:
+            raise PIPAPIError(f"Unknown grouping column {groups!r}")
+        name = groups
+        labels = df[groups].to_numpy(dtype=object)
+    else:
+        name = "group_code"
+        mapping = pd.Series(groups, dtype=object)
+        labels = df["country_code"].map(mapping).to_numpy(dtype=object)
+    if total is not None:
+        labels = np.concatenate(
+            [labels, np.full(len(df), total, dtype=object)]
+        )
+        df = pd.concat([df, df], ignore_index=True)
+        weights = np.concatenate([weights, weights])
+    keep = pd.notna(labels)
+    df = df[keep]
+    labels = labels[keep]
+    weights = weights[keep]
+
+    keys = {name: labels, "reporting_year": df["reporting_year"].to_numpy()}
+    if "poverty_line" in df.columns:
+        keys["poverty_line"] = df["poverty_line"].to_numpy(dtype=float)
+    codes, result = _group_codes(keys)
+    size = len(result)
+
+    result["reporting_pop"] = np.bincount(codes, weights, minlength=size)
+    for measure in measures:
+        values = df[measure].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        covered = np.bincount(codes[present], weights[present], minlength=size)
+        total_value = np.bincount(
+            codes[present], values[present] * weights[present], minlength=size
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result[measure] = np.where(
+                covered > 0, total_value / covered, np.nan
+            )
+    if "headcount" in measures:
+        result["pop_in_poverty"] = (
+            result["headcount"] * result["reporting_pop"]
+        )
+    return result
+
+
+def _one_row_per_country(df):
+    """Keep one row per country, year and poverty line, preferring national."""
+    keys = ["country_code", "reporting_year"]
+    if "poverty_line" in df.columns:
+        keys.append("poverty_line")
+    if not df.duplicated(keys).any():
+        return df
+    if "reporting_level" in df.columns:
+        national = (df["reporting_level"] == "national").to_numpy()
+        df = df.iloc[np.argsort(~national, kind="stable")]
+    return df.drop_duplicates(keys).sort_index()
+
+
+def _population(df, pop):
+    """The population weight of every row of ``df``."""
+    if pop is None:
+        if "reporting_pop" not in df.columns:
+            raise PIPAPIError("Pass pop= or include the reporting_pop column")
+        weights = df["reporting_pop"].to_numpy(dtype=float)
+    else:
+        if "data_level" in pop.columns:
+            pop = pop[pop["data_level"] == "national"]
+        lookup = pd.Series(
+            pop["pop"].to_numpy(dtype=float),
+            index=pd.MultiIndex.from_arrays(
+                [
+                    pop["country_code"].astype(str),
+                    pop["year"].astype(int),
+                ]
+            ),
+        )
+        lookup = lookup[~lookup.index.duplicated()]
+        index = pd.MultiIndex.from_arrays(
+            [
+                df["country_code"].astype(str),
+                df["reporting_year"].astype(int),
+            ]
+        )
+        weights = lookup.reindex(index).to_numpy()
+    unknown = np.isnan(weights)
+    if unknown.any():
+        rows = df[unknown]
+        raise PIPAPIError(
+            f"No population for {rows['country_code'].iloc[0]} in "
+            f"{rows['reporting_year'].iloc[0]}"
+        )
+    return weights
+
+
+def _group_codes(keys):
+    """
+    Number the distinct combinations of the key arrays.
+
+    Returns the code of every row and a frame with the key values of every
+    code, sorted by year, then poverty line, then group.
+    """
+    factors = {}
+    for name, values in keys.items():
+        factors[name] = pd.factorize(values, sort=True)
+    order = ["reporting_year", "poverty_line"]
+    order = [k for k in order if k in keys] + [
+        k for k in keys if k not in order
+    ]
+    flat = np.ravel_multi_index(
+        [factors[k][0] for k in order],
+        [len(factors[k][1]) for k in order],
+    )
+    unique, codes = np.unique(flat, return_inverse=True)
+    positions = np.unravel_index(unique, [len(factors[k][1]) for k in order])
+    result = pd.DataFrame(
+        {k: np.asarray(factors[k][1])[p] for k, p in zip(order, positions)}
+    )
+    return codes.reshape(-1), result[list(keys)]
@@ -0,0 +1,223 @@
+"""
+asyncio versions of the data functions.
+
+Each coroutine accepts the same arguments as its synchronous counterpart
+and shares its parameter handling and cache. The HTTP round trip and the
+DataFrame construction run on a worker pool that reuses the pooled HTTP
+session (and its retries and circuit breaker), so the event loop is never
+blocked. A semaphore caps how many requests are in flight; by default one
+semaphore of ASYNC_CONCURRENCY slots is shared per event loop.
+
+Each call holds a worker thread for its whole round trip, so the pool
+grows with the number of calls the semaphores let through: the semaphore
+passed in, not the pool, is what limits concurrency.
+"""
+
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from .constants import ASYNC_CONCURRENCY
+from . import auxiliary, stats
+
+_lock = threading.Lock()
+_config = {"max_concurrency": ASYNC_CONCURRENCY, "executor": None}
+_workers = {"size": 0, "busy": 0}
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def configure_async(max_concurrency=None):
+    """
+    Configure the default concurrency limit of the async API.
+
+    Args:
+        max_concurrency (int, optional): Maximum number of requests run at
+            once when no semaphore is passed explicitly.
+    """
+    with _lock:
+        if max_concurrency is not None:
+            _config["max_concurrency"] = max_concurrency
+        executor = _config["executor"]
+        _config["executor"] = None
+        _workers["size"] = 0
+        _semaphores.clear()
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def _acquire_worker():
+    """
+    Reserve a worker thread, replacing the pool with a larger one if every
+    thread is busy. Calls already running finish on the old pool.
+    """
+    retired = None
+    with _lock:
+        _workers["busy"] += 1
+        if _workers["busy"] > _workers["size"]:
+            retired = _config["executor"]
+            _workers["size"] = max(
+                _config["max_concurrency"], 2 * _workers["size"]
+            )
+            _config["executor"] = ThreadPoolExecutor(
+                max_workers=_workers["size"],
+                thread_name_prefix="pippy-async",
+            )
+        executor = _config["executor"]
+    if retired is not None:
+        retired.shutdown(wait=False)
+    return executor
+
+
+def _release_worker():
+    with _lock:
+        _workers["busy"] -= 1
+
+
+def _default_semaphore():
+    loop = asyncio.get_running_loop()
+    with _lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            semaphore = _semaphores[loop] = asyncio.Semaphore(
+                _config["max_concurrency"]
+            )
+        return semaphore
+
+
+async def _run(func, semaphore, **kwargs):
+    async with semaphore or _default_semaphore():
+        loop = asyncio.get_running_loop()
+        executor = _acquire_worker()
+        try:
+            return await loop.run_in_executor(
+                executor, functools.partial(func, **kwargs)
+            )
+        finally:
+            _release_worker()
+
+
+async def get_stats_async(semaphore=None, **kwargs):
+    """
+    Retrieve poverty and inequality statistics without blocking the loop.
+
+    Args:
+        semaphore (asyncio.Semaphore, optional): Limits how many requests
+            run at once. Defaults to a shared per-loop semaphore.
+        **kwargs: Keyword arguments accepted by get_stats().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the requested statistics.
+
+    Raises:
+        PIPAPIError: If the API request fails or returns unexpected data.
+    """
+    return await _run(stats.get_stats, semaphore, **kwargs)
+
+
+async def get_wb_async(semaphore=None, **kwargs):
+    """
+    Retrieve World Bank global/regional statistics without blocking the loop.
+
+    Args:
+        semaphore (asyncio.Semaphore, optional): Limits how many requests
+            run at once. Defaults to a shared per-loop semaphore.
+        **kwargs: Keyword arguments accepted by get_wb().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the World Bank
+            global/regional statistics.
+
+    Raises:
+        PIPAPIError: If the API request fails or returns unexpected data.
+    """
+    return await _run(stats.get_wb, semaphore, **kwargs)
+
+
+async def get_aux_async(table=None, semaphore=None, **kwargs):
+    """
+    Retrieve auxiliary data without blocking the loop.
+
+    Args:
+        table (str, optional): Name of the auxiliary table to retrieve.
+        semaphore (asyncio.Semaphore, optional): Limits how many requests
+            run at once. Defaults to a shared per-loop semaphore.
+        **kwargs: Keyword arguments accepted by get_aux().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the requested auxiliary data.
+
+    Raises:
+        PIPAPIError: If the API request fails or returns unexpected data.
+    """
+    return await _run(auxiliary.get_aux, semaphore, table=table, **kwargs)
+
+
+async def get_countries_async(semaphore=None, **kwargs):
+    """
+    Retrieve a list of countries without blocking the loop.
+
+    Args:
+        semaphore (asyncio.Semaphore, optional): Limits concurrent requests.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the list of countries.
+    """
+    return await get_aux_async("countries", semaphore, **kwargs)
+
+
+async def get_regions_async(semaphore=None, **kwargs):
+    """
+    Retrieve a list of regions without blocking the loop.
+
+    Args:
+        semaphore (asyncio.Semaphore, optional): Limits concurrent requests.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the list of regions.
+    """
+    return await get_aux_async("regions", semaphore, **kwargs)
+
+
+async def get_cpi_async(semaphore=None, **kwargs):
+    """
+    Retrieve Consumer Price Index (CPI) data without blocking the loop.
+
+    Args:
+        semaphore (asyncio.Semaphore, optional): Limits concurrent requests.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the CPI data.
+    """
+    return await get_aux_async("cpi", semaphore, **kwargs)
+
+
+async def get_dictionary_async(semaphore=None, **kwargs):
+    """
+    Retrieve the data dictionary without blocking the loop.
+
+    Args:
+        semaphore (asyncio.Semaphore, optional): Limits concurrent requests.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the data dictionary.
+    """
+    return await get_aux_async("dictionary", semaphore, **kwargs)
+
+
+async def get_gdp_async(semaphore=None, **kwargs):
+    """
+    Retrieve Gross Domestic Product (GDP) data without blocking the loop.
+
+    Args:
+        semaphore (asyncio.Semaphore, optional): Limits concurrent requests.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        pandas.DataFrame: A DataFrame containing the GDP data.
+    """
+    return await get_aux_async("gdp", semaphore, **kwargs)
@@ -1,8 +1,54 @@
-import requests
-import pandas as pd
+import threading
+from datetime import datetime
 from io import StringIO
+from types import MappingProxyType
+from .cache import (
+    _protect,
+    cache_frame,
+    get_cached_frame,
+    is_cached,
+    make_cache_key,
+)
+from .coalesce import SingleFlight
 from .exceptions import PIPAPIError
-from .server import current_server
+from .logger import pippy_logger
+from .metrics import timed
+from .server import get_base_url
+from .lazy import LazyModule
+from .schema import (
+    apply_schema,
+    csv_dtypes,
+    frame_from_records,
+    resolve_schema,
+    schema_key,
+)
+from .session import http_get
+from .snapshot import get_snapshot
+from .utils import get_current_release
+from .wire import (
+    arrow_rejected,
+    frame_from_arrow,
+    is_arrow,
+    read_arrow,
+    wire_params,
+)
+
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+
+# Tables get_stats(enrich=True) joins to the survey rows.
+ENRICH_TABLES = ("gdp", "cpi")
+
+# Columns aux tables are keyed on, rather than values to join.
+_KEY_COLUMNS = ("country_code", "year", "data_level")
+
+# Downloads of aux tables, keyed on their cache key.
+aux_flights = SingleFlight()
+
+# Lookups derived from cached tables, keyed on the table's cache key and
+# the kind of lookup. They are only used while the table itself is cached.
+_derived_lock = threading.Lock()
+_derived = {}
 
 
 def get_aux(
@@ -12,61 +58,340 @@ def get_aux(
     release_version=None,
     format="json",
     assign_tb=False,
+    compact=False,
+    offline=False,
+    use_cache=True,
 ):
     """
     Retrieve auxiliary data from the World Bank's PIP API.
 
+    Tables are cached in memory and on disk, keyed on the data release they
+    come from like get_stats() results, so repeated calls don't download
+    them again.
+
     Args:
         table (str, optional): Name of the auxiliary table to retrieve.
         version (str, optional): Version of the data to retrieve.
         ppp_version (str, optional): Version of PPP to use.
         release_version (str, optional): Release version of the data.
-        format (str): Format of the returned data. Defaults to 'json'.
+        format (str): Format of the returned data: 'json', 'csv' or
+            'arrow' for a DataFrame (Arrow falls back to JSON when it isn't
+            available, as in get_stats()), anything else for the raw
+            response body. Defaults to 'json'.
         assign_tb (bool): Whether to assign the data to a global variable. Defaults to False.
+        compact (bool or dict): Use compact dtypes (categorical codes,
+            int16 years, float32 values), or a schema of your own mapping
+            columns to dtypes. Defaults to False.
+        offline (bool): Answer the query from the local snapshot (see
+            pippy.snapshot) instead of the API. Defaults to False.
+        use_cache (bool): Use cached data if available. Defaults to True.
 
     Returns:
-        pandas.DataFrame: A DataFrame containing the requested auxiliary data.
+        pandas.DataFrame: A DataFrame containing the requested auxiliary data,
+            or a list of the table names if no table is given.
 
     Raises:
         PIPAPIError: If the API request fails or returns unexpected data.
     """
+    if offline:
+        df = get_snapshot().query_aux(
+            table, ppp_version=ppp_version, release_version=release_version
+        )
+        schema = resolve_schema(compact)
+        return apply_schema(df, schema) if schema and table else df
+
     if table is None:
-        response = requests.get(f"{current_server}/aux")
-        return response.json()
+        try:
+            response = http_get(f"{get_base_url()}/aux")
+            response.raise_for_status()
+            return response.json()
+        except requests.RequestException as e:
+            raise PIPAPIError(f"API request failed: {str(e)}")
+        except ValueError as e:
+            raise PIPAPIError(f"Failed to parse API response: {str(e)}")
 
     params = {
         k: v
         for k, v in locals().items()
-        if v is not None and k not in ["assign_tb"]
+        if v is not None
+        and k not in ["assign_tb", "compact", "offline", "use_cache"]
     }
+    schema = resolve_schema(compact)
+
+    if format not in ("json", "csv", "arrow"):
+        return _download_aux(params, schema)  # For RDS format
+
+    if use_cache:
+        cache_key = _aux_cache_key(params, schema)
+        df = get_cached_frame(cache_key)
+        if df is None:
+            df = _protect(
+                aux_flights.do(
+                    cache_key,
+                    lambda: _download_aux(params, schema, cache_key),
+                )
+            )
+        else:
+            pippy_logger.debug("Using cached data")
+    else:
+        df = _download_aux(params, schema)
+
+    if assign_tb:
+        global aux_data
+        if "aux_data" not in globals():
+            aux_data = {}
+        aux_data[table] = df
+
+    return df
 
+
+def _download_aux(params, schema, cache_key=None):
+    """Request an aux table from the API, caching it if given a key."""
+    url = f"{get_base_url()}/aux"
+    params = wire_params(params)
     try:
-        response = requests.get(f"{current_server}/aux", params=params)
+        response = http_get(url, params=params)
+        if arrow_rejected(params, response):
+            params = dict(params, format="json")
+            response = http_get(url, params=params)
         response.raise_for_status()
     except requests.RequestException as e:
         raise PIPAPIError(f"API request failed: {str(e)}")
 
-    if format == "json":
-        data = response.json()
-        df = (
-            pd.DataFrame(data)
-            if isinstance(data, list)
-            else pd.DataFrame([data])
-        )
+    format = params.get("format", "json")
+    if is_arrow(response):
+        try:
+            with timed(
+                "parse", endpoint="aux", table=params["table"], format="arrow"
+            ):
+                table = read_arrow(response.content)
+        except ValueError as e:
+            raise PIPAPIError(f"Failed to parse API response: {str(e)}")
+        with timed("build", endpoint="aux", table=params["table"]) as details:
+            df = frame_from_arrow(table, schema)
+            details["rows"] = len(df)
+    elif format in ("json", "arrow"):
+        try:
+            with timed("parse", endpoint="aux", table=params["table"]):
+                data = response.json()
+        except ValueError as e:
+            raise PIPAPIError(f"Failed to parse API response: {str(e)}")
+        with timed("build", endpoint="aux", table=params["table"]) as details:
+            df = frame_from_records(data, schema)
+            details["rows"] = len(df)
     elif format == "csv":
         try:
-            df = pd.read_csv(StringIO(response.text))
+            df = pd.read_csv(StringIO(response.text), dtype=csv_dtypes(schema))
         except pd.errors.EmptyDataError:
             raise PIPAPIError("API returned an empty CSV")
+        if schema:
+            df = apply_schema(df, schema)
     else:
-        return response.content  # For RDS format
+        return response.content
 
-    if assign_tb:
-        global aux_data
-        if "aux_data" not in globals():
-            aux_data = {}
-        aux_data[table] = df
+    if cache_key is not None:
+        cache_frame(cache_key, df, _aux_expiry_hours(params))
+    return df
+
+
+def _aux_release(params):
+    """The release an aux query is answered from, or None if unknown."""
+    if "release_version" in params:
+        return params["release_version"]
+    try:
+        return get_current_release(params.get("ppp_version"))
+    except PIPAPIError as e:
+        pippy_logger.debug("Caching without a release: %s", e)
+        return None
+
+
+def _aux_expiry_hours(params):
+    """Tables of a known release never change."""
+    return None if _aux_release(params) is not None else 24
+
+
+def _aux_cache_key(params, schema=None):
+    """Key an aux query on its table, release and schema."""
+    release = _aux_release(params)
+    if release is not None:
+        params = dict(params, release_version=release)
+    if schema is not None:
+        params = dict(params, compact=schema_key(schema))
+    if params.get("format") == "arrow":
+        # Arrow and JSON responses give the same frame; share the entries.
+        params = dict(params, format="json")
+    return make_cache_key("aux", get_base_url(check=False), "aux", params)
+
+
+def _derive(table, kind, build, **kwargs):
+    """
+    Build a structure from a cached aux table once per table and release.
+
+    The structure is built again once the table leaves the cache, whether
+    it expired, was invalidated or the cache was reconfigured; uncached and
+    offline queries are built every time.
+    """
+    if not kwargs.get("use_cache", True) or kwargs.get("offline"):
+        return build(get_aux(table, **kwargs))
+    params = {
+        k: v
+        for k, v in kwargs.items()
+        if v is not None and k in ("version", "ppp_version", "release_version")
+    }
+    params["table"] = table
+    params["format"] = kwargs.get("format", "json")
+    schema = resolve_schema(kwargs.get("compact", False))
+    table_key = _aux_cache_key(params, schema)
+    with _derived_lock:
+        derived = _derived.get((table_key, kind))
+    if derived is not None and is_cached(table_key):
+        return derived
+    value = build(get_aux(table, **kwargs))
+    with _derived_lock:
+        held = list(_derived)
+    # Drop what was derived from tables that have left the cache.
+    gone = [key for key in held if not is_cached(key[0])]
+    with _derived_lock:
+        for key in gone:
+            _derived.pop(key, None)
+        _derived[(table_key, kind)] = value
+    return value
+
+
+def get_country_lookup(column="region_code", **kwargs):
+    """
+    Map country codes to a column of the countries table.
+
+    The mapping is built once per release and shared, so lookups in a loop
+    cost a dict access.
 
+    Args:
+        column (str): Column of the countries table to map to. Defaults to
+            'region_code'.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        Mapping: A read-only ``country_code -> value`` mapping.
+
+    Raises:
+        PIPAPIError: If the API request fails or the table has no such
+            column.
+    """
+
+    def build(countries):
+        if column not in countries.columns:
+            raise PIPAPIError(f"The countries table has no {column} column")
+        return MappingProxyType(
+            dict(
+                zip(
+                    countries["country_code"].astype(str),
+                    countries[column].tolist(),
+                )
+            )
+        )
+
+    return _derive("countries", ("lookup", column), build, **kwargs)
+
+
+def get_aux_indexed(table, data_level="national", **kwargs):
+    """
+    Retrieve an auxiliary table indexed for fast lookups.
+
+    Tables with a ``year`` column are indexed by ``(country_code, year)``,
+    others by ``country_code``; the index is sorted and built once per
+    release.
+
+    Args:
+        table (str): Name of the auxiliary table, e.g. 'gdp'.
+        data_level (str, optional): Keep the rows of this data level
+            (national, urban or rural) if the table has several, or None to
+            keep them all and add ``data_level`` to the index. Defaults to
+            'national'.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        pandas.DataFrame: The table, indexed by country (and year).
+
+    Raises:
+        PIPAPIError: If the API request fails or the table has no
+            ``country_code`` column.
+    """
+
+    def build(df):
+        if "country_code" not in df.columns:
+            raise PIPAPIError(f"The {table} table isn't keyed on countries")
+        keys = [c for c in _KEY_COLUMNS if c in df.columns]
+        if data_level is not None and "data_level" in keys:
+            df = df[df["data_level"] == data_level]
+            keys.remove("data_level")
+        df = df.set_index(keys).sort_index()
+        return df[~df.index.duplicated()]
+
+    return _protect(_derive(table, ("indexed", data_level), build, **kwargs))
+
+
+def _lookup(aux, keys, df):
+    """
+    Look up the rows of ``aux`` for ``keys``. Tables with data levels are
+    matched on the reporting level, falling back to the national row.
+    """
+    if "data_level" not in aux.index.names:
+        if len(keys) == 1:
+            return aux.reindex(pd.Index(keys[0]))
+        return aux.reindex(pd.MultiIndex.from_arrays(keys))
+    national = pd.Series("national", index=df.index)
+    level = (
+        df["reporting_level"].astype(str)
+        if "reporting_level" in df.columns
+        else national
+    )
+    joined = aux.reindex(pd.MultiIndex.from_arrays(keys + [level]))
+    fallback = aux.reindex(pd.MultiIndex.from_arrays(keys + [national]))
+    return joined.reset_index(drop=True).fillna(
+        fallback.reset_index(drop=True)
+    )
+
+
+def enrich_stats(df, tables=ENRICH_TABLES, **kwargs):
+    """
+    Join columns of auxiliary tables to survey rows from get_stats().
+
+    Rows are matched on country, reporting year and (where the table has
+    data levels) reporting level. The tables come from the aux cache, so
+    enriching doesn't cost a request once they have been fetched. Value
+    columns keep their names, except that a ``value`` column is named
+    after its table, and a column ``df`` already has gets an ``_aux``
+    suffix.
+
+    Args:
+        df (pandas.DataFrame): Rows from get_stats().
+        tables (str or iterable): Aux tables to join. Defaults to
+            ENRICH_TABLES.
+        **kwargs: Additional keyword arguments to pass to get_aux().
+
+    Returns:
+        pandas.DataFrame: ``df`` with the joined columns.
+
+    Raises:
+        PIPAPIError: If ``df`` isn't keyed on countries and years or a table
+            can't be retrieved.
+    """
+    if isinstance(tables, str):
+        tables = [tables]
+    for column in ("country_code", "reporting_year"):
+        if column not in df.columns:
+            raise PIPAPIError(f"Can't enrich rows without {column}")
+    for table in tables:
+        aux = get_aux_indexed(table, data_level=None, **kwargs)
+        aux = aux.rename(columns={"value": table})
+        aux = aux.rename(
+            columns={c: f"{c}_aux" for c in aux.columns if c in df.columns}
+        )
+        keys = [df["country_code"].astype(str)]
+        if "year" in aux.index.names:
+            keys.append(df["reporting_year"].astype(int))
+        joined = _lookup(aux, keys, df)
+        df = df.assign(**{c: joined[c].to_numpy() for c in joined.columns})
     return df
 
 
@@ -0,0 +1,522 @@
+"""
+Storage backends for the cache.
+
+pippy.cache turns frames and API responses into entries -- an Arrow IPC
+file or a JSON document carrying its own expiry -- and hands them to a
+backend, which stores them as bytes under keys such as
+``stats/api.worldbank.org-pip-v1/ab/ab12...``. Expiry, sweeps, the memory
+tier and metrics are handled by pippy.cache for every backend alike.
+
+- ``FilesystemBackend`` (in pippy.cache, the default) keeps one file per
+  entry under the cache directory and memory-maps Arrow entries on read.
+- ``MemoryBackend`` keeps entries in process memory, for read-only or
+  throwaway environments.
+- ``SQLiteBackend`` keeps every entry in one SQLite database in WAL mode,
+  which many processes can read and write at once and which behaves much
+  better than thousands of small files on network filesystems.
+- ``RemoteBackend`` stores entries in a remote key-value store such as
+  Redis, shared by every machine that points at it.
+
+Other stores can be plugged in by subclassing CacheBackend and passing an
+instance to configure_cache(backend=...).
+"""
+
+import math
+import os
+import socket
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+from .constants import CACHE_LOCK_STALE, SQLITE_BUSY_TIMEOUT, STALE_GRACE_HOURS
+
+
+class Entry(NamedTuple):
+    """What a backend knows about a stored entry, for sweeps and purges."""
+
+    key: str
+    size: int
+    # None if the entry can't be read.
+    expiry: datetime
+    # When the entry was last read and when it was written, as timestamps.
+    accessed: float
+    written: float
+
+
+class CacheBackend:
+    """
+    Base class of cache backends.
+
+    Subclasses implement get(), set(), delete(), expiry() and entries();
+    patch(), lock(), vacuum(), last_swept() and mark_swept() are optional.
+    """
+
+    #: Name used in cache_info() and by configure_cache(backend=...).
+    name = None
+
+    #: Whether writers sweep the backend for expired entries and enforce
+    #: the size budget. Stores that expire and evict entries themselves
+    #: turn this off.
+    sweep = True
+
+    @property
+    def location(self):
+        """Where the entries live, for cache_info()."""
+        return self.name
+
+    def get(self, key):
+        """
+        Return the stored value of ``key`` and mark it as used.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            bytes-like or None: The value, or None if there is none.
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, expiry):
+        """
+        Store a value, replacing any previous one.
+
+        Args:
+            key (str): The cache key.
+            value (bytes-like): The serialized entry.
+            expiry (datetime): When the entry expires; ``datetime.max``
+                for entries that never do.
+
+        Returns:
+            int: The number of bytes stored.
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Remove ``key`` if present."""
+        raise NotImplementedError
+
+    def patch(self, key, edits, expiry):
+        """
+        Overwrite parts of a stored value and set a new expiry.
+
+        This implementation stores the whole value again; backends that can
+        write part of a value in place override it.
+
+        Args:
+            key (str): The cache key.
+            edits (list): ``(offset, data)`` pairs; each ``data`` replaces
+                as many bytes of the value at ``offset``.
+            expiry (datetime): When the entry expires.
+
+        Returns:
+            bool: False if there is no value to patch.
+        """
+        value = self.get(key)
+        if value is None:
+            return False
+        value = bytearray(value)
+        for offset, data in edits:
+            value[offset : offset + len(data)] = data
+        self.set(key, value, expiry)
+        return True
+
+    def expiry(self, key):
+        """
+        Return when ``key`` expires without loading it.
+
+        Returns:
+            datetime or None: The expiry, or None if there is no readable
+                entry.
+        """
+        raise NotImplementedError
+
+    def entries(self):
+        """Yield an Entry for every stored entry."""
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, key, timeout):
+        """
+        Hold a lock for refilling ``key`` shared by every process using
+        the backend, waiting up to ``timeout`` seconds for it.
+
+        Yields:
+            bool: Whether the lock is held. Backends that can't lock yield
+                False and callers go ahead without it.
+        """
+        yield False
+
+    def vacuum(self):
+        """Reclaim space after a sweep; called by pippy.cache.cleanup()."""
+
+    def last_swept(self):
+        """
+        Return when any process last swept the backend, as a timestamp, or
+        None if that isn't recorded; then each process sweeps on its first
+        write.
+        """
+        return None
+
+    def mark_swept(self):
+        """Record that the backend was just swept, for last_swept()."""
+
+    def close(self):
+        """Release connections or other resources held by the backend."""
+
+
+def _timestamp(expiry):
+    """``expiry`` as a timestamp, or None for entries that never expire."""
+    return None if expiry == datetime.max else expiry.timestamp()
+
+
+def _datetime(timestamp):
+    return (
+        datetime.max
+        if timestamp is None
+        else datetime.fromtimestamp(timestamp)
+    )
+
+
+def _process_alive(pid):
+    """Whether a process of this machine is running, if that can be told."""
+    if os.name == "nt":
+        # os.kill() would terminate the process rather than probe it.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # It exists but belongs to another user.
+        return True
+    return True
+
+
+class _Stored(NamedTuple):
+    value: bytes
+    expiry: datetime
+    accessed: float
+    written: float
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Keep entries in process memory.
+
+    Nothing touches the disk, so this works with read-only home
+    directories, but entries are lost when the process exits. The memory
+    tier of pippy.cache sits in front of it as for any other backend.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries[key] = entry._replace(accessed=time.time())
+        return entry.value
+
+    def set(self, key, value, expiry):
+        value = bytes(value)
+        now = time.time()
+        with self._lock:
+            self._entries[key] = _Stored(value, expiry, now, now)
+        return len(value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def expiry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry.expiry if entry is not None else None
+
+    def entries(self):
+        with self._lock:
+            items = list(self._entries.items())
+        for key, entry in items:
+            yield Entry(
+                key,
+                len(entry.value),
+                entry.expiry,
+                entry.accessed,
+                entry.written,
+            )
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Keep every entry in one SQLite database.
+
+    The database runs in WAL mode, so readers never block the writer and
+    any number of processes (and threads; each gets its own connection)
+    can share it. Writers wait up to SQLITE_BUSY_TIMEOUT seconds for each
+    other. Reads only record their access time once a minute, so busy
+    readers don't contend for the write lock. Refill locks record the host
+    and process holding them, and are only taken over once that process
+    has exited (or, for a process on another machine, after
+    CACHE_LOCK_STALE seconds), however long a refill takes.
+
+    Args:
+        path (str or Path): The database file, created if missing.
+    """
+
+    name = "sqlite"
+
+    # Reads within this many seconds of the recorded access time don't
+    # update it; eviction order doesn't need more precision.
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser()
+        self._local = threading.local()
+
+    @property
+    def location(self):
+        return str(self.path)
+
+    def _connection(self):
+        # Connections can't be shared with a forked child, so each process
+        # and thread opens its own.
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            str(self.path),
+            timeout=SQLITE_BUSY_TIMEOUT,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        # auto_vacuum only takes effect before the first table exists.
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expiry REAL, "
+            "accessed REAL NOT NULL, written REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS lock_holders (key TEXT PRIMARY KEY, "
+            "taken REAL NOT NULL, host TEXT NOT NULL, pid INTEGER NOT NULL)"
+        )
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.ACCESS_RESOLUTION:
+            connection.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+        return row[0]
+
+    def set(self, key, value, expiry):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+            (key, memoryview(value), _timestamp(expiry), now, now),
+        )
+        return len(memoryview(value))
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def patch(self, key, edits, expiry):
+        connection = self._connection()
+        if not hasattr(connection, "blobopen"):  # Python < 3.11
+            return super().patch(key, edits, expiry)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT rowid FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                with connection.blobopen("entries", "value", row[0]) as blob:
+                    for offset, data in edits:
+                        blob.seek(offset)
+                        blob.write(data)
+                connection.execute(
+                    "UPDATE entries SET expiry = ?, written = ? WHERE key = ?",
+                    (_timestamp(expiry), time.time(), key),
+                )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return row is not None
+
+    def expiry(self, key):
+        row = (
+            self._connection()
+            .execute("SELECT expiry FROM entries WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return _datetime(row[0]) if row is not None else None
+
+    def entries(self):
+        rows = self._connection().execute(
+            "SELECT key, length(value), expiry, accessed, written FROM entries"
+        )
+        for key, size, expiry, accessed, written in rows.fetchall():
+            yield Entry(key, size, _datetime(expiry), accessed, written)
+
+    @contextmanager
+    def lock(self, key, timeout):
+        connection = self._connection()
+        host, pid = socket.gethostname(), os.getpid()
+        deadline = time.monotonic() + timeout
+        while True:
+            taken = connection.execute(
+                "INSERT OR IGNORE INTO lock_holders VALUES (?, ?, ?, ?)",
+                (key, time.time(), host, pid),
+            ).rowcount
+            if taken:
+                break
+            self._release_abandoned(connection, key, host)
+            if time.monotonic() > deadline:
+                yield False
+                return
+            time.sleep(0.01)
+        try:
+            yield True
+        finally:
+            connection.execute(
+                "DELETE FROM lock_holders WHERE key = ? AND host = ? "
+                "AND pid = ?",
+                (key, host, pid),
+            )
+
+    @staticmethod
+    def _release_abandoned(connection, key, host):
+        """
+        Remove the lock on ``key`` if its holder has died: a process on
+        this machine that is gone, or a lock older than CACHE_LOCK_STALE
+        seconds, since processes elsewhere can't be checked.
+        """
+        row = connection.execute(
+            "SELECT taken, host, pid FROM lock_holders WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return
+        taken, holder_host, holder_pid = row
+        if time.time() - taken < CACHE_LOCK_STALE and (
+            holder_host != host or _process_alive(holder_pid)
+        ):
+            return
+        connection.execute(
+            "DELETE FROM lock_holders WHERE key = ? AND taken = ? "
+            "AND host = ? AND pid = ?",
+            (key, taken, holder_host, holder_pid),
+        )
+
+    def vacuum(self):
+        connection = self._connection()
+        connection.execute("PRAGMA incremental_vacuum")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid == os.getpid():
+            connection.close()
+        self._local = threading.local()
+
+
+class RemoteBackend(CacheBackend):
+    """
+    Store entries in a remote key-value store.
+
+    ``client`` needs four methods of the redis-py client: ``get(key)``,
+    ``set(key, value, ex=None)``, ``delete(key)`` and
+    ``scan_iter(match=None)``, so ``redis.Redis`` works as is and other
+    stores only need a small adapter. pippy.testing.StubKeyValueStore is
+    an in-memory stand-in.
+
+    Each value is prefixed with its expiry and write time, and the store
+    is asked to drop it STALE_GRACE_HOURS after it expires, so there is
+    nothing for pippy to sweep; the store's own eviction policy bounds its
+    size. Access times aren't tracked.
+
+    Args:
+        client: The key-value store client.
+        prefix (str): Prepended to every key, so several caches (or other
+            data) can share a store. Defaults to ``"pippy:"``.
+    """
+
+    name = "remote"
+    sweep = False
+
+    _HEADER = struct.Struct("<dd")
+
+    def __init__(self, client, prefix="pippy:"):
+        self.client = client
+        self.prefix = prefix
+
+    @property
+    def location(self):
+        return f"{type(self.client).__name__} ({self.prefix}*)"
+
+    def _read(self, key):
+        """Return ``(expiry, written, value)`` for ``key``, or None."""
+        raw = self.client.get(self.prefix + key)
+        if raw is None or len(raw) < self._HEADER.size:
+            return None
+        expiry, written = self._HEADER.unpack_from(raw)
+        expiry = _datetime(None if math.isinf(expiry) else expiry)
+        return expiry, written, memoryview(raw)[self._HEADER.size :]
+
+    def get(self, key):
+        stored = self._read(key)
+        return stored[2] if stored is not None else None
+
+    def set(self, key, value, expiry):
+        timestamp = _timestamp(expiry)
+        ttl = None
+        if timestamp is not None:
+            keep_until = expiry + timedelta(hours=STALE_GRACE_HOURS)
+            ttl = max(
+                math.ceil((keep_until - datetime.now()).total_seconds()), 1
+            )
+        header = self._HEADER.pack(
+            math.inf if timestamp is None else timestamp, time.time()
+        )
+        raw = header + bytes(value)
+        self.client.set(self.prefix + key, raw, ex=ttl)
+        return len(raw)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def expiry(self, key):
+        stored = self._read(key)
+        return stored[0] if stored is not None else None
+
+    def entries(self):
+        for name in self.client.scan_iter(match=self.prefix + "*"):
+            if isinstance(name, bytes):
+                name = name.decode()
+            key = name[len(self.prefix) :]
+            stored = self._read(key)
+            if stored is None:
+                continue
+            expiry, written, value = stored
+            yield Entry(key, len(value), expiry, written, written)
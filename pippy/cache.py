@@ -1,31 +1,378 @@
+import argparse
+import hashlib
 import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import NamedTuple
+from .backends import CacheBackend, Entry, MemoryBackend, SQLiteBackend
+from .constants import (
+    CACHE_BACKEND,
+    CACHE_COMPRESSION,
+    CACHE_MAX_BYTES,
+    CACHE_SWEEP_INTERVAL,
+    CACHE_LOCKING,
+    CACHE_LOCK_STRIPES,
+    CACHE_LOCK_TIMEOUT,
+    STALE_GRACE_HOURS,
+    NEGATIVE_CACHE_HOURS,
+    MEMORY_CACHE_MAX_ENTRIES,
+    MEMORY_CACHE_MAX_BYTES,
+)
+from .lazy import LazyModule
+from .metrics import record, timed
 
-CACHE_DIR = Path.home() / ".pippy_cache"
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
+pd = LazyModule("pandas")
 
-def cache_response(key, data, expiry_hours=24):
+CACHE_DIR = Path(
+    os.environ.get("PIPPY_CACHE_DIR", Path.home() / ".pippy_cache")
+).expanduser()
+CACHE_MAX_BYTES = int(os.environ.get("PIPPY_CACHE_MAX_BYTES", CACHE_MAX_BYTES))
+CACHE_LOCKING = os.environ.get(
+    "PIPPY_CACHE_LOCKING", "1" if CACHE_LOCKING else ""
+).lower() not in ("", "0", "false", "no")
+CACHE_BACKEND = os.environ.get("PIPPY_CACHE_BACKEND", CACHE_BACKEND)
+
+# Schema metadata key holding pippy's own entry metadata in Arrow files.
+_META_KEY = b"pippy"
+# Its value is padded to a multiple of this many bytes, so that
+# renew_entry() can usually overwrite it in place.
+_META_SLOT = 256
+
+# File in the cache directory whose modification time records the last
+# sweep, so that processes sharing the directory don't each sweep it.
+_SWEEP_MARKER = ".last_sweep"
+
+# Running estimate of the disk usage plus lookup counters for cache_info().
+_usage_lock = threading.Lock()
+_usage = {"bytes": None, "last_sweep": None, "hits": 0, "misses": 0}
+
+# The backend in use, created from CACHE_BACKEND on first use.
+_backend_lock = threading.Lock()
+_backend = None
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU cache of DataFrames held in process memory.
+
+    The cache is bounded both by entry count and by the approximate memory
+    footprint of the frames it holds; the least recently used entries are
+    evicted first. Frames are copied on the way in and out (a cheap
+    shallow copy when pandas copy-on-write is active), so callers can't
+    modify a cached frame in place.
+
+    Args:
+        max_entries (int): Maximum number of frames kept.
+        max_bytes (int): Maximum approximate total size of the frames.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached frame for ``key``, or None if missing or expired.
+        """
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """
+        Return ``(frame, expiry, validators)`` for ``key``, or None if
+        missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and datetime.now() >= entry[1]:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df, expiry, _, validators = entry
+        return _protect(df), expiry, validators
+
+    def renew(self, key, expiry, validators=None):
+        """Give ``key``, if held, a new expiry and validators."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                df, _, nbytes, _ = entry
+                self._entries[key] = (df, expiry, nbytes, validators or {})
+
+    def __contains__(self, key):
+        """Whether ``key`` holds an unexpired frame; not counted as a hit."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and datetime.now() < entry[1]
+
+    def put(self, key, df, expiry, validators=None):
+        """
+        Store a frame until ``expiry`` (a datetime), evicting LRU entries.
+        """
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            self.discard(key)
+            return
+        df = _protect(df)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (df, expiry, nbytes, validators or {})
+            self._bytes += nbytes
+            while (
+                len(self._entries) > self.max_entries
+                or self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, key):
+        """Remove ``key`` if present."""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Report the size and effectiveness of the cache.
+
+        Returns:
+            dict: ``entries``, ``bytes``, ``hits`` and ``misses``.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+
+def _protect(df):
+    """Return a copy of ``df`` that doesn't share mutable state with it."""
+    # pandas 2.2 also accepts "warn", which doesn't turn copy-on-write on.
+    copy_on_write = (
+        int(pd.__version__.split(".")[0]) >= 3
+        or getattr(pd.options.mode, "copy_on_write", False) is True
+    )
+    return df.copy(deep=not copy_on_write)
+
+
+memory_cache = MemoryCache(MEMORY_CACHE_MAX_ENTRIES, MEMORY_CACHE_MAX_BYTES)
+
+
+def _normalize(value):
+    """Render a query parameter value in one canonical string form."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value).strip()
+
+
+def server_slug(base_url):
+    """
+    Turn a server base URL into the directory name used for its entries.
+
+    Args:
+        base_url (str): The server base URL.
+
+    Returns:
+        str: A filesystem-safe name such as ``api.worldbank.org-pip-v1``.
+    """
+    stripped = re.sub(r"^https?://", "", base_url.rstrip("/"))
+    return re.sub(r"[^A-Za-z0-9.]+", "-", stripped)
+
+
+def make_cache_key(namespace, base_url, endpoint, params):
+    """
+    Build a canonical cache key for an API request.
+
+    The key hashes the server, endpoint and the normalized query
+    parameters, so any argument that changes the response changes the key,
+    while equivalent spellings (``2019`` and ``"2019"``, reordered params,
+    ``None`` values) share one. Keys are laid out as
+    ``<namespace>/<server>/<shard>/<hash>`` so no directory grows too big.
+
+    Args:
+        namespace (str): Kind of data, e.g. ``"stats"``.
+        base_url (str): The server base URL.
+        endpoint (str): The API endpoint, e.g. ``"pip"``.
+        params (dict): The query parameters sent to the API.
+
+    Returns:
+        str: The cache key.
+    """
+    canonical = json.dumps(
+        {
+            "server": base_url.rstrip("/"),
+            "endpoint": endpoint,
+            "params": sorted(
+                (str(k), _normalize(v))
+                for k, v in params.items()
+                if v is not None
+            ),
+        },
+        separators=(",", ":"),
+    )
+    digest = hashlib.sha256(canonical.encode()).hexdigest()
+    return f"{namespace}/{server_slug(base_url)}/{digest[:2]}/{digest}"
+
+
+def _pyarrow():
+    """Return the pyarrow module, or None if it is not installed."""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _expiry(expiry_hours):
+    if expiry_hours is None:
+        return datetime.max
+    return datetime.now() + timedelta(hours=expiry_hours)
+
+
+class CacheEntry(NamedTuple):
+    """A cached frame with its expiry and the HTTP validators it came with."""
+
+    data: object
+    expiry: datetime
+    validators: dict
+
+    @property
+    def fresh(self):
+        return datetime.now() < self.expiry
+
+
+def get_backend():
+    """
+    Return the cache backend in use.
+
+    It is created on first use from configure_cache(backend=...) or the
+    ``PIPPY_CACHE_BACKEND`` environment variable, and is a
+    FilesystemBackend unless configured otherwise.
+
+    Returns:
+        CacheBackend: The backend.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _make_backend(CACHE_BACKEND)
+        return _backend
+
+
+def _make_backend(backend):
+    if isinstance(backend, CacheBackend):
+        return backend
+    name = str(backend).strip().lower()
+    if name == "filesystem":
+        return FilesystemBackend()
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend(CACHE_DIR / "cache.sqlite3")
+    raise ValueError(
+        f"Invalid cache backend: {backend}. Choose from filesystem, memory "
+        "and sqlite, or pass a CacheBackend"
+    )
+
+
+def _is_arrow(value):
+    """Whether a stored value is an Arrow IPC file rather than JSON."""
+    return bytes(memoryview(value)[:6]) == b"ARROW1"
+
+
+def _json_value(data, expiry, validators=None):
+    return json.dumps(
+        {
+            "data": data,
+            "expiry": expiry.isoformat(),
+            "validators": validators or {},
+        }
+    ).encode()
+
+
+def _arrow_meta(expiry, validators=None):
+    return json.dumps(
+        {"expiry": expiry.isoformat(), "validators": validators or {}}
+    ).encode()
+
+
+def _arrow_value(pa, df, expiry, validators=None):
+    table = pa.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    meta = _arrow_meta(expiry, validators)
+    metadata[_META_KEY] = meta.ljust(-(-len(meta) // _META_SLOT) * _META_SLOT)
+    table = table.replace_schema_metadata(metadata)
+    options = pa.ipc.IpcWriteOptions(compression=CACHE_COMPRESSION)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def _store(key, value, expiry):
+    """Write an entry to the backend. Returns its size in bytes."""
+    backend = get_backend()
+    size = backend.set(key, value, expiry)
+    _record_write(backend, size)
+    return size
+
+
+def _remove(key):
+    memory_cache.discard(key)
+    get_backend().delete(key)
+
+
+def cache_response(key, data, expiry_hours=24, validators=None):
     """
     Cache the API response data.
 
     Args:
         key (str): The cache key.
         data (dict): The data to cache.
-        expiry_hours (int): Number of hours before the cache expires. Defaults to 24.
-    """
-    CACHE_DIR.mkdir(exist_ok=True)
-    cache_file = CACHE_DIR / f"{key}.json"
-    with cache_file.open("w") as f:
-        json.dump(
-            {
-                "data": data,
-                "expiry": (
-                    datetime.now() + timedelta(hours=expiry_hours)
-                ).isoformat(),
-            },
-            f,
-        )
+        expiry_hours (int): Number of hours before the cache expires, or
+            None for data that never changes. Defaults to 24.
+        validators (dict, optional): ``ETag``/``Last-Modified`` headers of
+            the response, used to revalidate the entry once it expires.
+    """
+    expiry = _expiry(expiry_hours)
+    _store(key, _json_value(data, expiry, validators), expiry)
 
 
 def get_cached_response(key):
@@ -38,10 +385,807 @@ def get_cached_response(key):
     Returns:
         dict or None: The cached data if available and not expired, None otherwise.
     """
-    cache_file = CACHE_DIR / f"{key}.json"
-    if cache_file.exists():
-        with cache_file.open("r") as f:
-            cached = json.load(f)
-        if datetime.now() < datetime.fromisoformat(cached["expiry"]):
-            return cached["data"]
+    value = get_backend().get(key)
+    if value is None or _is_arrow(value):
+        return None
+    try:
+        cached = json.loads(bytes(value))
+        expiry = datetime.fromisoformat(cached["expiry"])
+    except (ValueError, KeyError, TypeError):
+        _remove(key)
+        return None
+    if datetime.now() < expiry:
+        return cached["data"]
     return None
+
+
+def cache_frame(key, df, expiry_hours=24, validators=None):
+    """
+    Cache a DataFrame in columnar form.
+
+    With pyarrow installed the frame is stored as a compressed Arrow IPC
+    file, which keeps its dtypes and can be memory-mapped on read. Without
+    pyarrow it falls back to the JSON format used by cache_response().
+
+    Args:
+        key (str): The cache key.
+        df (pandas.DataFrame): The data to cache.
+        expiry_hours (int): Number of hours before the cache expires, or
+            None for data that never changes. Defaults to 24.
+        validators (dict, optional): ``ETag``/``Last-Modified`` headers of
+            the response, used to revalidate the entry once it expires.
+    """
+    with timed("cache_write", key=key) as details:
+        expiry = _expiry(expiry_hours)
+        memory_cache.put(key, df, expiry, validators)
+        pa = _pyarrow()
+        if pa is None:
+            records = df.to_dict(orient="records")
+            value = _json_value(records, expiry, validators)
+        else:
+            value = _arrow_value(pa, df, expiry, validators)
+        details["bytes"] = _store(key, value, expiry)
+
+
+def renew_entry(key, expiry_hours=24, validators=None):
+    """
+    Give a cached entry a new expiry and validators without writing its
+    data again, e.g. after a ``304 Not Modified`` answer.
+
+    Arrow entries keep this metadata in a padded slot, which is overwritten
+    in place where the backend supports it. JSON entries, written when
+    pyarrow isn't installed, are stored again.
+
+    Args:
+        key (str): The cache key.
+        expiry_hours (int): Number of hours before the entry expires, or
+            None for data that never changes. Defaults to 24.
+        validators (dict, optional): ``ETag``/``Last-Modified`` headers to
+            store with the entry.
+
+    Returns:
+        bool: Whether the entry was renewed. If not (there is no entry, or
+            the new metadata doesn't fit in the old one's slot), cache the
+            data again with cache_frame().
+    """
+    expiry = _expiry(expiry_hours)
+    memory_cache.renew(key, expiry, validators)
+    backend = get_backend()
+    value = backend.get(key)
+    if value is None:
+        return False
+    if not _is_arrow(value):
+        try:
+            data = json.loads(bytes(value))["data"]
+        except (ValueError, KeyError, TypeError):
+            return False
+        _store(key, _json_value(data, expiry, validators), expiry)
+        return True
+    pa = _pyarrow()
+    if pa is None:
+        return False
+    try:
+        edits = _meta_edits(pa, value, _arrow_meta(expiry, validators))
+    except (OSError, ValueError, KeyError):
+        return False
+    return edits is not None and backend.patch(key, edits, expiry)
+
+
+def _meta_edits(pa, value, meta):
+    """
+    Return the ``(offset, bytes)`` edits that put ``meta`` in place of the
+    pippy metadata of an Arrow entry, or None if it doesn't fit.
+    """
+    reader = pa.ipc.open_file(pa.py_buffer(value))
+    old = reader.schema.metadata[_META_KEY]
+    if len(meta) > len(old):
+        return None
+    # The schema, metadata included, is written twice: in the first message
+    # of the file and in the footer at its end, next to a 24-byte block per
+    # record batch.
+    span = (
+        reader.schema.serialize().size + 24 * reader.num_record_batches + 256
+    )
+    view = memoryview(value)
+    head = bytes(view[:span]).find(old)
+    tail_start = max(len(view) - span, 0)
+    tail = bytes(view[tail_start:]).rfind(old)
+    if head < 0 or tail < 0 or tail_start + tail <= head:
+        return None
+    meta = meta.ljust(len(old))
+    return [(head, meta), (tail_start + tail, meta)]
+
+
+@contextmanager
+def _atomic_write(path):
+    """
+    Yield a temporary file name in the directory of ``path`` and move it
+    into place once written, so readers never see a partial file and
+    concurrent writers replace each other's files whole.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = str(
+        path.with_name(
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+    )
+    try:
+        yield temp
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def cache_lock(key):
+    """
+    Hold a cross-process lock for refilling ``key``.
+
+    Only active when locking is enabled with configure_cache(locking=True)
+    or the ``PIPPY_CACHE_LOCKING`` environment variable, and with backends
+    that can lock: the filesystem backend (on platforms with ``fcntl``),
+    whose keys share CACHE_LOCK_STRIPES lock files so unrelated keys
+    occasionally wait for each other, and the SQLite backend. If the lock
+    can't be taken within CACHE_LOCK_TIMEOUT seconds, the caller goes
+    ahead without it.
+
+    Args:
+        key (str): The cache key.
+
+    Yields:
+        bool: Whether the lock is held. If it is, another process may have
+            filled the key while this one waited, so check the cache again.
+    """
+    if not CACHE_LOCKING:
+        yield False
+        return
+    with get_backend().lock(key, CACHE_LOCK_TIMEOUT) as locked:
+        yield locked
+
+
+def get_cached_frame(key):
+    """
+    Retrieve a cached DataFrame.
+
+    Frames are served from the in-process memory tier when possible. The
+    filesystem backend memory-maps Arrow entries rather than reading them
+    into a buffer, and entries written in the older JSON format are
+    converted to Arrow on first read when pyarrow is available.
+
+    Args:
+        key (str): The cache key.
+
+    Returns:
+        pandas.DataFrame or None: The cached data if available and not expired, None otherwise.
+    """
+    entry = get_cached_entry(key)
+    return entry.data if entry is not None and entry.fresh else None
+
+
+def is_cached(key):
+    """
+    Check for a fresh entry without loading it or counting a lookup.
+
+    Args:
+        key (str): The cache key.
+
+    Returns:
+        bool: True if get_cached_frame() would return a frame.
+    """
+    if key in memory_cache:
+        return True
+    expiry = get_backend().expiry(key)
+    return expiry is not None and datetime.now() < expiry
+
+
+def get_cached_entry(key):
+    """
+    Retrieve a cached DataFrame even if it has expired.
+
+    Expired entries are kept for STALE_GRACE_HOURS so they can be
+    revalidated with the server or served while a refresh is under way.
+
+    Args:
+        key (str): The cache key.
+
+    Returns:
+        CacheEntry or None: The cached entry, or None if there is none.
+    """
+    start = time.perf_counter()
+    hit = memory_cache.get_entry(key)
+    if hit is not None:
+        entry = CacheEntry(*hit)
+        tier = "memory"
+    else:
+        entry = _read_entry(key)
+        tier = "disk"
+    fresh = entry is not None and entry.fresh
+    with _usage_lock:
+        _usage["hits" if fresh else "misses"] += 1
+    record(
+        "cache_hit" if fresh else "cache_miss",
+        time.perf_counter() - start,
+        tier=tier,
+        key=key,
+    )
+    return entry
+
+
+def _read_entry(key):
+    value = get_backend().get(key)
+    if value is None:
+        return None
+    pa = _pyarrow()
+    if not _is_arrow(value):
+        return _migrate_json(pa, key, value)
+    if pa is None:
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.py_buffer(value))
+        meta = json.loads(reader.schema.metadata[_META_KEY])
+        df = reader.read_all().to_pandas()
+        expiry = datetime.fromisoformat(meta["expiry"])
+    except (OSError, ValueError, KeyError, TypeError):
+        # pyarrow's ArrowInvalid, raised for truncated files, is a
+        # ValueError.
+        _remove(key)
+        return None
+    entry = CacheEntry(df, expiry, meta.get("validators", {}))
+    if entry.fresh:
+        memory_cache.put(key, df, entry.expiry, entry.validators)
+    return entry
+
+
+def _migrate_json(pa, key, value):
+    """Load a JSON entry as a DataFrame, rewriting it as Arrow if possible."""
+    try:
+        cached = json.loads(bytes(value))
+        entry = CacheEntry(
+            cached["data"],
+            datetime.fromisoformat(cached["expiry"]),
+            cached.get("validators", {}),
+        )
+    except (ValueError, KeyError, TypeError):
+        _remove(key)
+        return None
+    # Expired entries are only worth keeping if they can be revalidated.
+    if entry.data is None or not (entry.fresh or entry.validators):
+        return None
+
+    data = entry.data
+    df = pd.DataFrame(data) if isinstance(data, list) else pd.DataFrame([data])
+    entry = entry._replace(data=df)
+    if pa is not None:
+        value = _arrow_value(pa, df, entry.expiry, entry.validators)
+        _store(key, value, entry.expiry)
+    if entry.fresh:
+        memory_cache.put(key, df, entry.expiry, entry.validators)
+    return entry
+
+
+def cache_not_found(key, message, expiry_hours=NEGATIVE_CACHE_HOURS):
+    """
+    Remember that a request was answered with 404 Not Found.
+
+    Args:
+        key (str): The cache key.
+        message (str): The error message to raise on later lookups.
+        expiry_hours (float): Number of hours to remember the miss.
+            Defaults to NEGATIVE_CACHE_HOURS.
+    """
+    cache_response(f"{key}.miss", {"message": message}, expiry_hours)
+
+
+def get_cached_not_found(key):
+    """
+    Check whether a request is known to return 404 Not Found.
+
+    Args:
+        key (str): The cache key.
+
+    Returns:
+        str or None: The cached error message, or None if not cached.
+    """
+    cached = get_cached_response(f"{key}.miss")
+    return cached["message"] if cached else None
+
+
+def migrate_cache():
+    """
+    Move get_stats() entries written by older versions to current cache keys.
+
+    Older versions of pippy named each entry after some of the query
+    arguments, and those files are never looked up now. Fresh entries whose
+    query can be recovered from the name and rows are stored again under
+    the key get_stats() uses (as Arrow if pyarrow is installed); every old
+    file is then removed. Does nothing with backends other than the filesystem one,
+    which older versions never wrote to.
+
+    Returns:
+        int: The number of entries moved.
+    """
+    if not isinstance(get_backend(), FilesystemBackend):
+        return 0
+    if not CACHE_DIR.exists():
+        return 0
+    # Imported here: pippy.stats imports this module.
+    from .stats import _legacy_stats_key
+
+    pa = _pyarrow()
+    moved = 0
+    for json_file in CACHE_DIR.glob("stats_*.json"):
+        try:
+            cached = json.loads(json_file.read_bytes())
+            data = cached["data"]
+            expiry = datetime.fromisoformat(cached["expiry"])
+            key = None
+            if datetime.now() < expiry:
+                key = _legacy_stats_key(json_file.stem, data)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            key = None
+        if key is not None:
+            rows = data if isinstance(data, list) else [data]
+            if pa is None:
+                value = _json_value(rows, expiry)
+            else:
+                value = _arrow_value(pa, pd.DataFrame(rows), expiry)
+            _store(key, value, expiry)
+            moved += 1
+        _unlink(json_file)
+    return moved
+
+
+def invalidate(key):
+    """
+    Remove a cache entry in any format.
+
+    Args:
+        key (str): The cache key.
+    """
+    memory_cache.discard(key)
+    backend = get_backend()
+    backend.delete(key)
+    backend.delete(f"{key}.miss")
+
+
+def configure_cache(
+    directory=None, max_bytes=None, locking=None, backend=None
+):
+    """
+    Configure where the cache lives and how large it may grow.
+
+    The defaults come from the ``PIPPY_CACHE_DIR``,
+    ``PIPPY_CACHE_MAX_BYTES``, ``PIPPY_CACHE_LOCKING`` and
+    ``PIPPY_CACHE_BACKEND`` environment variables, falling back to
+    ``~/.pippy_cache``, CACHE_MAX_BYTES, CACHE_LOCKING and CACHE_BACKEND.
+
+    Args:
+        directory (str or Path, optional): The cache directory.
+        max_bytes (int, optional): Size budget; least recently used entries
+            are evicted once it is exceeded.
+        locking (bool, optional): Lock keys across processes while they
+            are refilled, so processes sharing the cache don't download the
+            same data at once. See cache_lock().
+        backend (str or CacheBackend, optional): Where entries are stored:
+            ``"filesystem"`` (one file per entry in the cache directory),
+            ``"memory"``, ``"sqlite"`` (a ``cache.sqlite3`` database in
+            the cache directory) or a CacheBackend instance, such as a
+            RemoteBackend or an SQLiteBackend elsewhere.
+
+    Changing the directory or backend empties the memory tier and resets
+    the hit and miss counters reported by cache_info().
+
+    Raises:
+        ValueError: If ``backend`` is not a known backend name.
+    """
+    global CACHE_DIR, CACHE_MAX_BYTES, CACHE_LOCKING, CACHE_BACKEND, _backend
+    if max_bytes is not None:
+        CACHE_MAX_BYTES = max_bytes
+    if locking is not None:
+        CACHE_LOCKING = locking
+    with _usage_lock:
+        if directory is not None:
+            CACHE_DIR = Path(directory).expanduser()
+        if directory is not None or backend is not None:
+            _usage["bytes"] = None
+            _usage["last_sweep"] = None
+            _usage["hits"] = _usage["misses"] = 0
+    with _backend_lock:
+        if backend is not None:
+            _backend = _make_backend(backend)
+            CACHE_BACKEND = backend
+        elif directory is not None and not isinstance(
+            CACHE_BACKEND, CacheBackend
+        ):
+            # Backends chosen by name live in the cache directory.
+            _backend = None
+    if directory is not None or backend is not None:
+        memory_cache.clear()
+
+
+class FilesystemBackend(CacheBackend):
+    """
+    Keep one file per entry under CACHE_DIR: ``<key>.arrow`` for Arrow
+    entries and ``<key>.json`` for JSON ones.
+
+    Files are written to a temporary name and moved into place, so
+    processes sharing the directory never see partial files. Arrow files
+    are memory-mapped on read, and a file's access time records when the
+    entry was last used. Arrow files are ignored when pyarrow isn't
+    installed.
+    """
+
+    name = "filesystem"
+
+    @property
+    def location(self):
+        return str(CACHE_DIR)
+
+    def get(self, key):
+        pa = _pyarrow()
+        for suffix in (".arrow", ".json") if pa is not None else (".json",):
+            path = CACHE_DIR / f"{key}{suffix}"
+            try:
+                if suffix == ".arrow":
+                    with pa.memory_map(str(path), "r") as source:
+                        value = source.read_buffer()
+                else:
+                    value = path.read_bytes()
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError):
+                # Read as a corrupt entry, which removes it.
+                value = b""
+            _touch(path)
+            return value
+        return None
+
+    def set(self, key, value, expiry):
+        suffix, other = (
+            (".arrow", ".json") if _is_arrow(value) else (".json", ".arrow")
+        )
+        with _atomic_write(CACHE_DIR / f"{key}{suffix}") as temp:
+            with open(temp, "wb") as f:
+                f.write(value)
+        # Drop the entry's other format, e.g. a JSON entry rewritten as Arrow.
+        _unlink(CACHE_DIR / f"{key}{other}")
+        return len(memoryview(value))
+
+    def delete(self, key):
+        for suffix in (".arrow", ".json"):
+            _unlink(CACHE_DIR / f"{key}{suffix}")
+
+    def expiry(self, key):
+        for suffix in (".arrow", ".json"):
+            path = CACHE_DIR / f"{key}{suffix}"
+            if path.exists():
+                return _entry_expiry(path)
+        return None
+
+    def patch(self, key, edits, expiry):
+        if not hasattr(os, "pwrite"):  # Windows
+            return super().patch(key, edits, expiry)
+        # Only the edited bytes are written, in place. They are a few
+        # hundred bytes of metadata; a reader that catches them half
+        # written reads a corrupt entry, which counts as a miss.
+        for suffix in (".arrow", ".json"):
+            try:
+                fd = os.open(CACHE_DIR / f"{key}{suffix}", os.O_WRONLY)
+            except FileNotFoundError:
+                continue
+            except OSError:
+                return False
+            try:
+                for offset, data in edits:
+                    os.pwrite(fd, data, offset)
+            finally:
+                os.close(fd)
+            return True
+        return False
+
+    def last_swept(self):
+        try:
+            return (CACHE_DIR / _SWEEP_MARKER).stat().st_mtime
+        except OSError:
+            return None
+
+    def mark_swept(self):
+        try:
+            (CACHE_DIR / _SWEEP_MARKER).touch()
+        except OSError:
+            pass
+
+    def entries(self):
+        for path in _entry_files():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            yield Entry(
+                _entry_key(path),
+                stat.st_size,
+                _entry_expiry(path),
+                stat.st_atime,
+                stat.st_mtime,
+            )
+
+    @contextmanager
+    def lock(self, key, timeout):
+        if fcntl is None:
+            yield False
+            return
+        stripe = int(hashlib.sha256(key.encode()).hexdigest(), 16)
+        path = CACHE_DIR / ".locks" / f"{stripe % CACHE_LOCK_STRIPES}.lock"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a") as f:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        yield False
+                        return
+                    time.sleep(0.01)
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def vacuum(self):
+        _remove_abandoned_writes()
+
+
+def _touch(path):
+    """Mark an entry as used; eviction order follows the access time."""
+    try:
+        os.utime(path, (time.time(), path.stat().st_mtime))
+    except OSError:
+        pass
+
+
+def _unlink(path):
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def _record_write(backend, size):
+    """Account for a new entry and clean up if the cache is due for it."""
+    if not backend.sweep:
+        return
+    with _usage_lock:
+        if _usage["bytes"] is not None:
+            _usage["bytes"] += size
+        over_budget = (
+            _usage["bytes"] is not None and _usage["bytes"] > CACHE_MAX_BYTES
+        )
+        last_sweep = _usage["last_sweep"]
+    if (
+        not over_budget
+        and last_sweep is not None
+        and time.monotonic() - last_sweep <= CACHE_SWEEP_INTERVAL
+    ):
+        return
+    if not over_budget:
+        # Another process may have swept the cache a moment ago; a new
+        # process shouldn't walk every entry on its first write.
+        swept = backend.last_swept()
+        if swept is not None:
+            since_sweep = time.time() - swept
+            if 0 <= since_sweep <= CACHE_SWEEP_INTERVAL:
+                with _usage_lock:
+                    _usage["last_sweep"] = time.monotonic() - since_sweep
+                return
+    cleanup()
+
+
+def _entry_files():
+    if not CACHE_DIR.exists():
+        return
+    for path in CACHE_DIR.rglob("*"):
+        if path.suffix in (".arrow", ".json") and path.is_file():
+            yield path
+
+
+def _entry_key(path):
+    return path.relative_to(CACHE_DIR).as_posix().rsplit(".", 1)[0]
+
+
+def _entry_expiry(path):
+    """Return when an entry file expires, or None if it can't be read."""
+    try:
+        if path.suffix == ".arrow":
+            pa = _pyarrow()
+            if pa is None:
+                return datetime.max
+            with pa.memory_map(str(path), "r") as source:
+                metadata = pa.ipc.open_file(source).schema.metadata
+            expiry = json.loads(metadata[_META_KEY])["expiry"]
+        else:
+            with path.open("r") as f:
+                expiry = json.load(f)["expiry"]
+        return datetime.fromisoformat(expiry)
+    except (OSError, ValueError, KeyError, TypeError):
+        # pyarrow's ArrowInvalid, raised for truncated files, is a ValueError.
+        return None
+
+
+def _remove_abandoned_writes():
+    """Remove temporary files left behind by writers that crashed."""
+    if not CACHE_DIR.exists():
+        return
+    # Writes take milliseconds; an hour-old temporary file is abandoned.
+    cutoff = time.time() - 3600
+    for path in CACHE_DIR.rglob(".*.tmp"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def cleanup(max_bytes=None):
+    """
+    Remove unreadable entries and entries that expired more than
+    STALE_GRACE_HOURS ago, then evict the least recently used ones until
+    the cache fits its budget.
+
+    Writers call this automatically when the cache grows past its budget
+    and otherwise every CACHE_SWEEP_INTERVAL seconds, counted from the last
+    sweep by any process sharing the cache where the backend records it,
+    unless the backend expires and evicts entries itself.
+
+    Args:
+        max_bytes (int, optional): Budget to enforce. Defaults to the
+            configured CACHE_MAX_BYTES.
+
+    Returns:
+        dict: Number of ``expired`` and ``evicted`` entries, and the
+            remaining size in ``bytes``.
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_MAX_BYTES
+    backend = get_backend()
+    cutoff = datetime.now() - timedelta(hours=STALE_GRACE_HOURS)
+    expired = 0
+    live = []
+    for entry in list(backend.entries()):
+        if entry.expiry is None or cutoff >= entry.expiry:
+            _remove(entry.key)
+            expired += 1
+            continue
+        live.append(entry)
+
+    total = sum(entry.size for entry in live)
+    evicted = 0
+    for entry in sorted(live, key=lambda entry: entry.accessed):
+        if total <= max_bytes:
+            break
+        _remove(entry.key)
+        total -= entry.size
+        evicted += 1
+    backend.vacuum()
+    backend.mark_swept()
+
+    with _usage_lock:
+        _usage["bytes"] = total
+        _usage["last_sweep"] = time.monotonic()
+    return {"expired": expired, "evicted": evicted, "bytes": total}
+
+
+def cache_info():
+    """
+    Report the size and effectiveness of the cache.
+
+    Returns:
+        dict: The ``backend`` name, where its entries live (``directory``:
+            the cache directory, database file or store), number of
+            ``entries``, their total ``bytes``, ``max_bytes``, lookup
+            ``hits`` and ``misses`` in this process, their ``hit_ratio``
+            (None before the first lookup), and the ``memory`` tier
+            statistics.
+    """
+    backend = get_backend()
+    entries = 0
+    total = 0
+    for entry in backend.entries():
+        total += entry.size
+        entries += 1
+    with _usage_lock:
+        hits, misses = _usage["hits"], _usage["misses"]
+    lookups = hits + misses
+    return {
+        "backend": backend.name,
+        "directory": backend.location,
+        "entries": entries,
+        "bytes": total,
+        "max_bytes": CACHE_MAX_BYTES,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / lookups if lookups else None,
+        "memory": memory_cache.stats(),
+    }
+
+
+def purge(prefix=None, server=None, older_than=None):
+    """
+    Remove cache entries. With no arguments the whole cache is cleared.
+
+    Args:
+        prefix (str, optional): Only remove entries whose key starts with
+            this prefix, e.g. ``"stats/"``.
+        server (str, optional): Only remove entries fetched from this
+            server, given as a server name or base URL.
+        older_than (float or timedelta, optional): Only remove entries
+            written more than this many hours ago.
+
+    Returns:
+        int: The number of entries removed.
+    """
+    slug = None
+    if server is not None:
+        from .server import _resolve_base_url
+
+        slug = server_slug(_resolve_base_url(server))
+    if isinstance(older_than, timedelta):
+        older_than = older_than.total_seconds() / 3600
+    cutoff = None
+    if older_than is not None:
+        cutoff = time.time() - older_than * 3600
+
+    removed = 0
+    for entry in list(get_backend().entries()):
+        if prefix is not None and not entry.key.startswith(prefix):
+            continue
+        if slug is not None and entry.key.split("/")[1:2] != [slug]:
+            continue
+        if cutoff is not None and entry.written > cutoff:
+            continue
+        _remove(entry.key)
+        removed += 1
+    with _usage_lock:
+        _usage["bytes"] = None
+    return removed
+
+
+def main(argv=None):
+    """Command line interface: ``pippy-cache {info,cleanup,purge}``."""
+    parser = argparse.ArgumentParser(
+        prog="pippy-cache", description="Inspect and maintain the cache."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("info", help="show cache size and hit ratio")
+    commands.add_parser(
+        "cleanup", help="remove expired entries and enforce the budget"
+    )
+    purge_parser = commands.add_parser("purge", help="remove entries")
+    purge_parser.add_argument("--prefix", help="key prefix, e.g. stats/")
+    purge_parser.add_argument("--server", help="server name or base URL")
+    purge_parser.add_argument(
+        "--older-than", type=float, metavar="HOURS", help="minimum age"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        for name, value in cache_info().items():
+            print(f"{name}: {value}")
+    elif args.command == "cleanup":
+        result = cleanup()
+        print(
+            f"Removed {result['expired']} expired and evicted "
+            f"{result['evicted']} entries; {result['bytes']} bytes remain."
+        )
+    else:
+        removed = purge(args.prefix, args.server, args.older_than)
+        print(f"Removed {removed} entries.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is running wait for it and get its result, or its exception. Once it
+    finishes, the next call for the key runs the function again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """
+        Run ``func`` unless a call for ``key`` is already running.
+
+        Args:
+            key (hashable): Identifies calls that may share a result.
+            func (callable): Called without arguments to produce it.
+
+        Returns:
+            The return value of ``func``, from this call or the running one.
+
+        Raises:
+            Exception: Whatever ``func`` raised.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """
+        Return how many calls ran and how many were coalesced.
+
+        Returns:
+            dict: ``executed``, ``coalesced`` and ``in_flight`` counts.
+        """
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.executed = 0
+            self.coalesced = 0
+
+
+# Downloads of get_stats() queries, keyed on their cache key.
+stats_flights = SingleFlight()
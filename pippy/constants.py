@@ -5,3 +5,111 @@ SERVERS = {
 }
 
 DEFAULT_SERVER = "prod"
+
+# Seconds a successful health check is trusted before it is repeated.
+HEALTH_CHECK_TTL = 300
+
+# Connection pooling for the shared HTTP session.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# (connect, read) timeouts in seconds, per API endpoint.
+DEFAULT_TIMEOUT = (3.05, 30)
+ENDPOINT_TIMEOUTS = {
+    "health-check": (3.05, 10),
+    "pip": (3.05, 60),
+    "pip-grp": (3.05, 60),
+    "aux": (3.05, 30),
+    "versions": (3.05, 10),
+    "pip-info": (3.05, 10),
+}
+
+# Retries of failed GET requests: status codes worth retrying, and the
+# exponential backoff (with jitter) between attempts, in seconds.
+RETRIES = 3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BACKOFF_FACTOR = 0.5
+BACKOFF_MAX = 30
+# Longest Retry-After a request waits for; longer ones are not retried.
+RETRY_AFTER_MAX = 120
+
+# Consecutive failed requests after which calls to a host fail fast, and
+# seconds before a trial request is let through again.
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+
+# Maximum number of requests the async API runs at once by default.
+ASYNC_CONCURRENCY = 16
+
+# Default number of worker threads used by get_stats_many.
+BATCH_MAX_WORKERS = 8
+
+# Codec for Arrow cache files: "lz4", "zstd" or None. Uncompressed files
+# can be memory-mapped without any copy, at the cost of disk space.
+CACHE_COMPRESSION = "lz4"
+
+# Bounds of the in-process memory tier in front of the disk cache.
+MEMORY_CACHE_MAX_ENTRIES = 128
+MEMORY_CACHE_MAX_BYTES = 256 * 1024**2
+
+# Hours to remember that a query returned no rows or a 404.
+NEGATIVE_CACHE_HOURS = 1
+
+# Size budget of the on-disk cache, and how often (in seconds) writers scan
+# it for expired entries when it is within budget.
+CACHE_MAX_BYTES = 2 * 1024**3
+CACHE_SWEEP_INTERVAL = 600
+
+# Cross-process locking of cache refills: off by default, the number of
+# lock files keys are spread over, seconds to wait for a lock before
+# refilling without it, and seconds after which a lock held by a process on
+# another machine (whose liveness can't be checked) is taken over.
+CACHE_LOCKING = False
+CACHE_LOCK_STRIPES = 64
+CACHE_LOCK_TIMEOUT = 120
+CACHE_LOCK_STALE = 3600
+
+# Cache backend used unless configured otherwise: "filesystem", "memory"
+# or "sqlite". SQLite writers wait up to SQLITE_BUSY_TIMEOUT seconds for
+# each other.
+CACHE_BACKEND = "filesystem"
+SQLITE_BUSY_TIMEOUT = 30
+
+# Hours an expired cache entry is kept so it can be revalidated with the
+# server (or served stale) instead of downloaded again.
+STALE_GRACE_HOURS = 7 * 24
+
+# Seconds the latest release version of a server is trusted before
+# /versions is asked again.
+RELEASE_TTL = 3600
+
+# Seconds before /versions is asked again after it couldn't be reached;
+# meanwhile the last known release is used, or the failure is repeated.
+RELEASE_RETRY_INTERVAL = 60
+
+# Rows per DataFrame yielded by iter_stats().
+STREAM_CHUNKSIZE = 10_000
+
+# Status codes with which a server turns down ``format=arrow``; the request
+# is then repeated as JSON.
+ARROW_FALLBACK_STATUSES = (406, 415)
+
+# Client errors that only turn down ``format=arrow`` when their body names the
+# ``format`` parameter; otherwise they are about the query itself.
+ARROW_REJECTION_STATUSES = (400, 422)
+
+# Cost model of the query planner (see pippy.planner): seconds for the
+# round trip of one request, to download, parse and build one row, and to
+# read and filter one cached row.
+PLANNER_REQUEST_SECONDS = 0.3
+PLANNER_ROW_SECONDS = 30e-6
+PLANNER_CACHED_ROW_SECONDS = 1e-6
+
+# Size of an ALL query as the planner estimates it: countries (or regional
+# groups for group_by), reporting years, and rows per country and year for
+# survey years and with fill_gaps.
+PLANNER_COUNTRIES = 170
+PLANNER_GROUPS = 10
+PLANNER_YEARS = 43
+PLANNER_ROWS_PER_COUNTRY_YEAR = 0.4
+PLANNER_FILLED_ROWS_PER_COUNTRY_YEAR = 1.1
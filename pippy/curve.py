@@ -0,0 +1,190 @@
+"""
+Poverty curves: poverty measures over a grid of poverty lines.
+
+A curve needs one ``pip`` query per poverty line. get_poverty_curve() runs
+them through get_stats_many(), so they are requested concurrently and
+points that are already cached are not requested again. Only the survey
+keys and the poverty measures are kept, and the points can optionally be
+interpolated from a sparse set of fetched poverty lines.
+"""
+
+from typing import NamedTuple
+from .constants import BATCH_MAX_WORKERS
+from .exceptions import PIPAPIError
+from .lazy import LazyModule
+from .stats import get_stats_many
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+SURVEY_COLUMNS = [
+    "country_code",
+    "reporting_year",
+    "reporting_level",
+    "welfare_type",
+]
+MEASURES = ["headcount", "poverty_gap", "poverty_severity", "watts"]
+
+
+class CurveArray(NamedTuple):
+    """A poverty measure as a 2-D array indexed by survey x poverty line."""
+
+    values: object
+    surveys: object
+    povlines: object
+    measure: str
+
+
+def get_poverty_curve(
+    povlines,
+    country="all",
+    year="all",
+    fill_gaps=False,
+    welfare_type="all",
+    reporting_level="all",
+    ppp_version=None,
+    release_version=None,
+    interpolate=None,
+    output="long",
+    measure="headcount",
+    max_workers=BATCH_MAX_WORKERS,
+    use_cache=True,
+):
+    """
+    Retrieve poverty measures for every survey over many poverty lines.
+
+    Args:
+        povlines (iterable): Poverty lines in PPP dollars per day.
+        country (str): Country code or 'all' for all countries. Defaults to 'all'.
+        year (str or int): Year or 'all' for all years. Defaults to 'all'.
+        fill_gaps (bool): Whether to fill gaps in the data. Defaults to False.
+        welfare_type (str): Type of welfare measure. Defaults to 'all'.
+        reporting_level (str): Level of reporting. Defaults to 'all'.
+        ppp_version (str, optional): Version of PPP to use.
+        release_version (str, optional): Release version of the data.
+        interpolate (int, optional): Only fetch this many poverty lines,
+            spread evenly on a log scale over the requested ones, and
+            interpolate the others linearly in log(poverty line).
+        output (str): 'long' for a tidy DataFrame with one row per survey
+            and poverty line, or 'array' for a CurveArray of ``measure``.
+            Defaults to 'long'.
+        measure (str): Measure returned when ``output='array'``.
+            Defaults to 'headcount'.
+        max_workers (int): Maximum number of concurrent requests.
+            Defaults to BATCH_MAX_WORKERS.
+        use_cache (bool): Use cached data if available. Defaults to True.
+
+    Returns:
+        pandas.DataFrame or CurveArray: With ``output='long'``, the survey
+            columns, ``poverty_line``, the poverty measures and an
+            ``interpolated`` flag. With ``output='array'``, the values of
+            ``measure`` with shape (surveys, poverty lines), the survey
+            columns of each row and the poverty lines of each column.
+
+    Raises:
+        PIPAPIError: If the arguments are invalid or a query fails.
+    """
+    if output not in ("long", "array"):
+        raise PIPAPIError(f"Unknown output {output!r}")
+    if output == "array" and measure not in MEASURES:
+        raise PIPAPIError(f"Unknown measure {measure!r}")
+    povlines = np.unique(np.asarray(list(povlines), dtype=float))
+    if povlines.size == 0 or povlines[0] <= 0:
+        raise PIPAPIError("Poverty lines must be positive")
+
+    fetched = povlines
+    if interpolate is not None:
+        if interpolate < 2:
+            raise PIPAPIError("interpolate needs at least 2 poverty lines")
+        fetched = _anchors(povlines, interpolate)
+
+    queries = [
+        {
+            "country": country,
+            "year": year,
+            "povline": float(povline),
+            "fill_gaps": fill_gaps,
+            "welfare_type": welfare_type,
+            "reporting_level": reporting_level,
+            "ppp_version": ppp_version,
+            "release_version": release_version,
+            "use_cache": use_cache,
+        }
+        for povline in fetched
+    ]
+    data, failures = get_stats_many(queries, max_workers=max_workers)
+    if failures:
+        failure = failures[0]
+        raise PIPAPIError(
+            f"Query for poverty line {failure.query['povline']} failed: "
+            f"{failure.error}"
+        )
+
+    surveys, values = _to_arrays(data, fetched.size)
+    interpolated = np.zeros(povlines.size, dtype=bool)
+    if fetched.size < povlines.size:
+        values = {
+            name: _interpolate(fetched, array, povlines)
+            for name, array in values.items()
+        }
+        interpolated = ~np.isin(povlines, fetched)
+
+    if output == "array":
+        return CurveArray(values[measure], surveys, povlines, measure)
+    return _to_long(surveys, values, povlines, interpolated)
+
+
+def _anchors(povlines, count):
+    """Pick ``count`` of the poverty lines, evenly spaced on a log scale."""
+    if count >= povlines.size:
+        return povlines
+    targets = np.geomspace(povlines[0], povlines[-1], count)
+    logs = np.log(povlines)
+    nearest = np.abs(logs[:, None] - np.log(targets)[None, :]).argmin(axis=0)
+    return povlines[np.unique(nearest)]
+
+
+def _to_arrays(data, size):
+    """
+    Scatter the rows of get_stats_many() into one (surveys, povlines) array
+    per measure; ``query_id`` is the column index.
+    """
+    keys = [c for c in SURVEY_COLUMNS if c in data.columns]
+    measures = [m for m in MEASURES if m in data.columns]
+    if data.empty or not keys:
+        surveys = pd.DataFrame(columns=keys)
+        return surveys, {m: np.empty((0, size)) for m in measures}
+    codes, index = pd.MultiIndex.from_frame(data[keys]).factorize()
+    surveys = index.to_frame(index=False)
+    columns = data["query_id"].to_numpy()
+    values = {}
+    for name in measures:
+        array = np.full((len(surveys), size), np.nan)
+        array[codes, columns] = data[name].to_numpy(dtype=float)
+        values[name] = array
+    return surveys, values
+
+
+def _interpolate(anchors, array, povlines):
+    """Interpolate every row of ``array`` linearly in log(poverty line)."""
+    if anchors.size == 1:
+        return np.repeat(array, povlines.size, axis=1)
+    x = np.log(anchors)
+    target = np.log(povlines)
+    left = np.clip(np.searchsorted(x, target, side="right") - 1, 0, x.size - 2)
+    weight = (target - x[left]) / (x[left + 1] - x[left])
+    return array[:, left] * (1 - weight) + array[:, left + 1] * weight
+
+
+def _to_long(surveys, values, povlines, interpolated):
+    """Flatten the arrays into one row per survey and poverty line."""
+    rows = len(surveys) * povlines.size
+    frame = surveys.loc[surveys.index.repeat(povlines.size)]
+    frame = frame.reset_index(drop=True)
+    frame["poverty_line"] = np.tile(povlines, len(surveys))
+    for name, array in values.items():
+        frame[name] = array.reshape(rows)
+    frame["interpolated"] = np.tile(interpolated, len(surveys))
+    if values:
+        frame = frame.dropna(subset=list(values), how="all")
+    return frame.reset_index(drop=True)
@@ -7,3 +7,21 @@ class PIPAPIError(Exception):
     """
 
     pass
+
+
+class CircuitOpenError(PIPAPIError):
+    """
+    Raised instead of sending a request while the circuit breaker for the
+    API host is open, i.e. after repeated failures.
+    """
+
+    pass
+
+
+class ReplayMissError(PIPAPIError):
+    """
+    Raised when replaying recorded responses and no response was recorded
+    for a request.
+    """
+
+    pass
@@ -0,0 +1,28 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access.
+
+    pandas and requests take a noticeable fraction of a second to import,
+    so pippy defers them until a data function actually needs them. This
+    keeps ``import pippy`` cheap for short-lived scripts.
+
+    Args:
+        name (str): Fully qualified name of the module to import.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
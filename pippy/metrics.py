@@ -0,0 +1,134 @@
+"""
+Timings and counters for the work pippy does on every call.
+
+Each phase of a call is recorded as an Event:
+
+- ``ttfb``: sending a request until the response headers arrive
+  (connection setup included)
+- ``download``: reading the response body
+- ``parse``: decoding a JSON response
+- ``build``: building the DataFrame from the parsed records
+- ``cache_hit`` / ``cache_miss``: looking a key up in the cache, with the
+  tier (``memory`` or ``disk``) that answered
+- ``cache_write``: storing a frame in the cache
+- ``retry``: a request that failed transiently and is retried
+
+Events are summarized in process (see snapshot()) and passed to the
+callbacks registered with subscribe(), e.g. to forward them to a tracing
+or metrics system. Recording costs a lock and a few additions per event.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple
+from .logger import pippy_logger
+
+
+class Event(NamedTuple):
+    """One recorded phase of a call."""
+
+    name: str
+    seconds: float
+    bytes: int
+    attrs: dict
+
+
+_lock = threading.Lock()
+_subscribers = []
+_summary = {}
+
+
+def subscribe(callback):
+    """
+    Call ``callback`` with every Event recorded from now on.
+
+    Callbacks run synchronously on the thread doing the work, so they
+    should be quick; exceptions they raise are logged and ignored.
+
+    Args:
+        callback (callable): Called with one Event.
+
+    Returns:
+        callable: ``callback``, so this can be used as a decorator.
+    """
+    with _lock:
+        _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    """Stop calling ``callback``; does nothing if it isn't subscribed."""
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
+def record(name, seconds=0.0, bytes=0, **attrs):
+    """
+    Record an event.
+
+    Args:
+        name (str): The phase or counter, e.g. ``"download"``.
+        seconds (float): Time the phase took. Defaults to 0.
+        bytes (int): Bytes the phase transferred or read. Defaults to 0.
+        **attrs: Details passed on to subscribers, e.g. ``endpoint``.
+    """
+    event = Event(name, seconds, bytes, attrs)
+    with _lock:
+        totals = _summary.get(name)
+        if totals is None:
+            totals = _summary[name] = {
+                "count": 0,
+                "seconds": 0.0,
+                "max_seconds": 0.0,
+                "bytes": 0,
+            }
+        totals["count"] += 1
+        totals["seconds"] += seconds
+        totals["bytes"] += bytes
+        if seconds > totals["max_seconds"]:
+            totals["max_seconds"] = seconds
+        subscribers = list(_subscribers) if _subscribers else ()
+    for callback in subscribers:
+        try:
+            callback(event)
+        except Exception as e:
+            pippy_logger.warning("Metrics subscriber failed: %s", e)
+
+
+@contextmanager
+def timed(name, **attrs):
+    """
+    Record the time spent in a ``with`` block as an event.
+
+    The block can add to the event's details through the yielded dict, e.g.
+    ``details["bytes"] = n``. Nothing is recorded if the block raises.
+    """
+    details = dict(attrs)
+    start = time.perf_counter()
+    yield details
+    seconds = time.perf_counter() - start
+    record(name, seconds, details.pop("bytes", 0), **details)
+
+
+def snapshot():
+    """
+    Summarize the events recorded since the last reset().
+
+    Returns:
+        dict: For every event name, a dict with the ``count`` of events,
+            their total and longest ``seconds`` (``max_seconds``), their
+            ``mean_seconds`` and the total ``bytes``.
+    """
+    with _lock:
+        summary = {name: dict(totals) for name, totals in _summary.items()}
+    for totals in summary.values():
+        totals["mean_seconds"] = totals["seconds"] / totals["count"]
+    return summary
+
+
+def reset():
+    """Forget the events summarized so far."""
+    with _lock:
+        _summary.clear()
@@ -0,0 +1,255 @@
+"""
+Planning of get_stats() queries for lists of countries or years.
+
+The API takes one country and one year (or ALL) per request, so a query
+for several of them can be answered in more than one way:
+
+- ``bulk``: one request for all countries (or years), filtered locally
+- ``fanout``: targeted requests, one per country (or year), sent
+  concurrently
+- ``cached``: requests whose results are all cached already, e.g. an
+  earlier ALL query, filtered locally without touching the network
+
+Each listed dimension is either requested value by value or as ALL, which
+gives up to four candidate plans. A single country or year is requested as
+ALL too when that finds cached results. plan_query() estimates what each costs
+from the number of requests still to be sent and the rows they would
+download (see the ``PLANNER_*`` constants) and picks the cheapest.
+"""
+
+import math
+from typing import NamedTuple
+from .constants import (
+    BATCH_MAX_WORKERS,
+    PLANNER_CACHED_ROW_SECONDS,
+    PLANNER_COUNTRIES,
+    PLANNER_FILLED_ROWS_PER_COUNTRY_YEAR,
+    PLANNER_GROUPS,
+    PLANNER_REQUEST_SECONDS,
+    PLANNER_ROW_SECONDS,
+    PLANNER_ROWS_PER_COUNTRY_YEAR,
+    PLANNER_YEARS,
+)
+from .exceptions import PIPAPIError
+
+
+class Plan(NamedTuple):
+    """How a query for lists of countries or years is answered."""
+
+    strategy: str
+    requests: list
+    countries: list
+    years: list
+    cached: int
+    rows: float
+    seconds: float
+
+    def describe(self):
+        """Summarize the plan in one line, for debug output."""
+        keep = []
+        if self.countries is not None:
+            keep.append(f"{len(self.countries)} country(ies)")
+        if self.years is not None:
+            keep.append(f"{len(self.years)} year(s)")
+        first = self.requests[0]
+        return (
+            f"{self.strategy}: {len(self.requests)} request(s) like "
+            f"country={first['country']} year={first['year']} "
+            f"({self.cached} cached), ~{self.rows:,.0f} rows, "
+            f"est. {self.seconds:.2f}s; keeping "
+            f"{' and '.join(keep) or 'every row'}"
+        )
+
+
+def is_list(value):
+    """Whether a ``country`` or ``year`` argument lists several values."""
+    return isinstance(value, (list, tuple, set, frozenset))
+
+
+def normalize_countries(country):
+    """
+    Turn a list of countries into sorted unique codes. Returns None for
+    lists that include ALL and for single values, which need no filtering.
+
+    Raises:
+        PIPAPIError: If no country is given.
+    """
+    if not is_list(country):
+        return None
+    codes = {str(code).strip().upper() for code in country}
+    if not codes:
+        raise PIPAPIError("No countries given")
+    return None if "ALL" in codes else sorted(codes)
+
+
+def normalize_years(year):
+    """
+    Turn a list of years into sorted unique years. Returns None for lists
+    that include ALL and for single values, which need no filtering.
+
+    Raises:
+        PIPAPIError: If no year is given or a value isn't a year.
+    """
+    if not is_list(year):
+        return None
+    values = [str(value).strip() for value in year]
+    if not values:
+        raise PIPAPIError("No years given")
+    if any(value.upper() == "ALL" for value in values):
+        return None
+    try:
+        return sorted({int(value) for value in values})
+    except ValueError:
+        raise PIPAPIError(f"Invalid year in {list(year)}")
+
+
+def plan_query(arguments, is_cached, max_workers=BATCH_MAX_WORKERS):
+    """
+    Choose the cheapest way to answer a get_stats() query.
+
+    Args:
+        arguments (dict): get_stats() arguments; ``country`` and ``year``
+            may be lists.
+        is_cached (callable): Called with the get_stats() arguments of a
+            request; returns True if its result is cached.
+        max_workers (int): Requests sent concurrently. Defaults to
+            BATCH_MAX_WORKERS.
+
+    Returns:
+        Plan: The strategy, the get_stats() arguments of each request, the
+            countries and years to keep from their rows (None to keep all)
+            and the estimated rows and seconds.
+
+    Raises:
+        PIPAPIError: If the lists are empty or invalid, or combined with
+            ``region`` or ``group_by`` in a way the API can't answer.
+    """
+    countries = normalize_countries(arguments["country"])
+    years = normalize_years(arguments["year"])
+    if is_list(arguments["country"]) and (
+        arguments.get("region") or arguments.get("group_by")
+    ):
+        raise PIPAPIError(
+            "A list of countries can't be combined with region or group_by"
+        )
+
+    plans = []
+    for request_countries, keep_countries, widened_country in _options(
+        arguments["country"], countries, _single_country(arguments)
+    ):
+        for request_years, keep_years, widened_year in _options(
+            arguments["year"], years, _single_year(arguments)
+        ):
+            requests = _requests(
+                arguments, request_countries, request_years, is_cached
+            )
+            # Asking for ALL instead of a single value only pays off if
+            # the result is cached already.
+            if (widened_country or widened_year) and not any(
+                cached for _, _, cached in requests
+            ):
+                continue
+            plans.append(
+                _plan(requests, keep_countries, keep_years, max_workers)
+            )
+    return min(plans, key=lambda plan: (plan.seconds, len(plan.requests)))
+
+
+def _single_country(arguments):
+    """The country of a query for a single country, else None."""
+    country = arguments["country"]
+    if (
+        is_list(country)
+        or arguments.get("region")
+        or arguments.get("group_by")
+    ):
+        return None
+    code = str(country).strip().upper()
+    return None if code == "ALL" else code
+
+
+def _single_year(arguments):
+    """The year of a query for a single year, else None."""
+    year = arguments["year"]
+    if is_list(year):
+        return None
+    try:
+        return int(str(year).strip())
+    except ValueError:
+        return None
+
+
+def _options(value, listed, single):
+    """
+    The ways a dimension can be requested: value by value or as ALL. Each
+    comes with the values to keep from the rows (None to keep all) and
+    whether it widens a single value to ALL.
+    """
+    if not is_list(value):
+        options = [([value], None, False)]
+        if single is not None:
+            options.append((["all"], [single], True))
+        return options
+    if listed is None:
+        return [(["all"], None, False)]
+    return [(listed, listed, False), (["all"], listed, False)]
+
+
+def _requests(arguments, request_countries, request_years, is_cached):
+    """The requests of a candidate plan, with their rows and cache state."""
+    requests = []
+    for country in request_countries:
+        for year in request_years:
+            request = dict(arguments, country=country, year=year)
+            requests.append(
+                (request, _rows(request), bool(is_cached(request)))
+            )
+    return requests
+
+
+def _plan(requests, countries, years, max_workers):
+    pending = [rows for _, rows, cached in requests if not cached]
+    cached = [rows for _, rows, cached in requests if cached]
+    seconds = (
+        math.ceil(len(pending) / max_workers) * PLANNER_REQUEST_SECONDS
+        + sum(pending) * PLANNER_ROW_SECONDS
+        + sum(cached) * PLANNER_CACHED_ROW_SECONDS
+    )
+    first = requests[0][0]
+    if not pending:
+        strategy = "cached"
+    elif (countries is None or first["country"] == "all") and (
+        years is None or first["year"] == "all"
+    ):
+        strategy = "bulk"
+    else:
+        strategy = "fanout"
+    return Plan(
+        strategy,
+        [request for request, _, _ in requests],
+        countries,
+        years,
+        len(cached),
+        sum(pending) + sum(cached),
+        seconds,
+    )
+
+
+def _rows(request):
+    """Estimate the rows the API returns for a request."""
+    if request.get("group_by"):
+        entities = PLANNER_GROUPS
+        density = 1
+    else:
+        entities = (
+            PLANNER_COUNTRIES
+            if str(request["country"]).upper() == "ALL"
+            else 1
+        )
+        density = (
+            PLANNER_FILLED_ROWS_PER_COUNTRY_YEAR
+            if request.get("fill_gaps")
+            else PLANNER_ROWS_PER_COUNTRY_YEAR
+        )
+    years = PLANNER_YEARS if str(request["year"]).upper() == "ALL" else 1
+    return entities * years * density
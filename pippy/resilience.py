@@ -0,0 +1,259 @@
+"""
+Retries and circuit breaking for requests to the PIP API.
+
+Every pippy request is an idempotent GET, so transient failures (connection
+errors, timeouts and the statuses in RETRY_STATUSES) are retried with
+exponential backoff and full jitter, honouring ``Retry-After``. Failures
+that remain after the retries are counted per host; once
+BREAKER_FAILURE_THRESHOLD of them happen in a row, the circuit opens and
+requests to that host raise CircuitOpenError without being sent until
+BREAKER_RESET_TIMEOUT has passed and a trial request succeeds.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+from .constants import (
+    RETRIES,
+    RETRY_STATUSES,
+    BACKOFF_FACTOR,
+    BACKOFF_MAX,
+    RETRY_AFTER_MAX,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+)
+from .exceptions import CircuitOpenError
+from .lazy import LazyModule
+from .logger import pippy_logger
+from .metrics import record
+
+requests = LazyModule("requests")
+
+_lock = threading.Lock()
+_config = {
+    "retries": RETRIES,
+    "retry_statuses": frozenset(RETRY_STATUSES),
+    "backoff_factor": BACKOFF_FACTOR,
+    "backoff_max": BACKOFF_MAX,
+    "retry_after_max": RETRY_AFTER_MAX,
+    "failure_threshold": BREAKER_FAILURE_THRESHOLD,
+    "reset_timeout": BREAKER_RESET_TIMEOUT,
+}
+_breakers = {}
+
+
+def configure_retries(
+    retries=None,
+    retry_statuses=None,
+    backoff_factor=None,
+    backoff_max=None,
+    retry_after_max=None,
+    failure_threshold=None,
+    reset_timeout=None,
+):
+    """
+    Configure retries and the circuit breaker. Circuit breakers are reset.
+
+    Args:
+        retries (int, optional): Retries after the first attempt; 0
+            disables retrying.
+        retry_statuses (iterable, optional): HTTP statuses to retry.
+        backoff_factor (float, optional): Base of the exponential backoff
+            in seconds.
+        backoff_max (float, optional): Longest backoff in seconds.
+        retry_after_max (float, optional): Longest ``Retry-After`` to wait
+            for; responses asking for more are returned as they are.
+        failure_threshold (int, optional): Consecutive failures that open
+            the circuit.
+        reset_timeout (float, optional): Seconds the circuit stays open.
+    """
+    with _lock:
+        if retries is not None:
+            _config["retries"] = retries
+        if retry_statuses is not None:
+            _config["retry_statuses"] = frozenset(retry_statuses)
+        if backoff_factor is not None:
+            _config["backoff_factor"] = backoff_factor
+        if backoff_max is not None:
+            _config["backoff_max"] = backoff_max
+        if retry_after_max is not None:
+            _config["retry_after_max"] = retry_after_max
+        if failure_threshold is not None:
+            _config["failure_threshold"] = failure_threshold
+        if reset_timeout is not None:
+            _config["reset_timeout"] = reset_timeout
+        _breakers.clear()
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures of one host.
+
+    The breaker is ``closed`` while requests succeed. After
+    ``failure_threshold`` failures in a row it is ``open`` and rejects
+    requests; after ``reset_timeout`` seconds it is ``half-open`` and lets
+    a single trial request through, which closes or reopens it.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit.
+        reset_timeout (float): Seconds the circuit stays open.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return "open"
+            return "half-open"
+
+    def before(self, host):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_timeout and not self._trial:
+                self._trial = True
+                return
+            retry_in = max(self.reset_timeout - waited, 0)
+        raise CircuitOpenError(
+            f"The API at {host} is failing; not retrying for "
+            f"{retry_in:.0f}s"
+        )
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def abort(self):
+        """Forget a trial request that ended without an answer."""
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+
+def get_breaker(url):
+    """
+    Get the circuit breaker for the host a URL points to.
+
+    Args:
+        url (str): The request URL.
+
+    Returns:
+        CircuitBreaker: The breaker shared by all requests to that host.
+    """
+    host = urlsplit(url).netloc
+    with _lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(
+                _config["failure_threshold"], _config["reset_timeout"]
+            )
+        return breaker
+
+
+def reset_breakers():
+    """Close every circuit breaker."""
+    with _lock:
+        _breakers.clear()
+
+
+def send_with_retries(url, send):
+    """
+    Send a request through the circuit breaker, retrying transient failures.
+
+    Args:
+        url (str): The request URL, used to pick the circuit breaker.
+        send (callable): Sends the request and returns the response.
+
+    Returns:
+        requests.Response: The first response that isn't retried. It may
+            still have a retryable status if the retries ran out.
+
+    Raises:
+        CircuitOpenError: If the circuit for the host is open.
+        requests.RequestException: If the last attempt failed to connect
+            or timed out.
+    """
+    breaker = get_breaker(url)
+    host = urlsplit(url).netloc
+    breaker.before(host)
+    retries = _config["retries"]
+    for attempt in range(retries + 1):
+        try:
+            response = send()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                breaker.failure()
+                raise
+            delay = _backoff(attempt)
+            pippy_logger.debug("Retrying in %.2fs after: %s", delay, e)
+            record("retry", url=url, reason=type(e).__name__)
+        except BaseException:
+            breaker.abort()
+            raise
+        else:
+            status = response.status_code
+            if status not in _config["retry_statuses"]:
+                breaker.success()
+                return response
+            delay = _retry_after(response)
+            if delay is None:
+                delay = _backoff(attempt)
+            if attempt == retries or delay > _config["retry_after_max"]:
+                if status >= 500:
+                    breaker.failure()
+                else:
+                    breaker.success()
+                return response
+            response.close()
+            pippy_logger.debug("Retrying in %.2fs after %s", delay, status)
+            record("retry", url=url, reason=status)
+        time.sleep(delay)
+
+
+def _backoff(attempt):
+    """Exponential backoff with full jitter."""
+    ceiling = min(
+        _config["backoff_max"], _config["backoff_factor"] * 2**attempt
+    )
+    return random.uniform(0, ceiling)
+
+
+def _retry_after(response):
+    """Seconds to wait according to ``Retry-After``, or None."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
@@ -0,0 +1,208 @@
+"""
+Compact column types for the DataFrames pippy returns.
+
+By default frames are built with ``pd.DataFrame(records)``, which stores
+codes as Python strings and every number as float64 or int64. A schema maps
+column names to smaller dtypes: categoricals for codes and labels, int16
+for years and float32 for measures. The dtypes are applied while the frame
+is built from the parsed records (or passed to ``read_csv``), so the
+default-typed frame is never materialized.
+"""
+
+import json
+from .lazy import LazyModule
+
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+_CATEGORIES = [
+    "region_name",
+    "region_code",
+    "region",
+    "country_name",
+    "country_code",
+    "reporting_level",
+    "survey_acronym",
+    "survey_coverage",
+    "welfare_type",
+    "comparable_spell",
+    "distribution_type",
+    "estimation_type",
+    "cpi_data_level",
+    "ppp_data_level",
+    "gdp_data_level",
+    "pce_data_level",
+    "data_level",
+    "grouping_type",
+    "africa_split",
+    "release_version",
+    "ppp_version",
+]
+_YEARS = ["reporting_year", "year", "survey_comparability"]
+# Poverty lines and population totals are left in float64: the former are
+# compared for equality and the latter need more than 7 significant digits.
+_MEASURES = [
+    "survey_year",
+    "headcount",
+    "poverty_gap",
+    "poverty_severity",
+    "watts",
+    "mean",
+    "median",
+    "mld",
+    "gini",
+    "polarization",
+    "decile1",
+    "decile2",
+    "decile3",
+    "decile4",
+    "decile5",
+    "decile6",
+    "decile7",
+    "decile8",
+    "decile9",
+    "decile10",
+    "cpi",
+    "ppp",
+    "reporting_gdp",
+    "reporting_pce",
+    "spl",
+    "spr",
+    "pg",
+    "value",
+]
+
+SCHEMA = {
+    **{name: "category" for name in _CATEGORIES},
+    **{name: "int16" for name in _YEARS},
+    **{name: "float32" for name in _MEASURES},
+}
+
+_DICTIONARY_TYPES = {
+    "str": "category",
+    "int": "int32",
+    "float": "float32",
+    "bool": "bool",
+}
+
+
+def schema_from_dictionary(dictionary):
+    """
+    Derive a schema from the data dictionary returned by get_dictionary().
+
+    If the dictionary has a ``type`` column, every variable gets the compact
+    dtype for its type. Otherwise the built-in SCHEMA is restricted to the
+    variables the dictionary lists.
+
+    Args:
+        dictionary (pandas.DataFrame): The data dictionary.
+
+    Returns:
+        dict: A mapping of column names to dtypes.
+    """
+    if "type" not in dictionary.columns:
+        variables = set(dictionary["variable"])
+        return {k: v for k, v in SCHEMA.items() if k in variables}
+    schema = {}
+    for variable, kind in zip(dictionary["variable"], dictionary["type"]):
+        dtype = _DICTIONARY_TYPES.get(kind)
+        if variable in SCHEMA and dtype != "category":
+            dtype = SCHEMA[variable]
+        if dtype is not None:
+            schema[variable] = dtype
+    return schema
+
+
+def resolve_schema(compact):
+    """
+    Turn the ``compact`` argument of the data functions into a schema.
+
+    Args:
+        compact (bool or dict): False for default dtypes, True for SCHEMA,
+            or a schema of its own.
+
+    Returns:
+        dict or None: The schema to apply, or None.
+    """
+    if compact is True:
+        return SCHEMA
+    return compact or None
+
+
+def schema_key(schema):
+    """Render a schema as a string, for use in cache keys."""
+    return json.dumps(schema, sort_keys=True, separators=(",", ":"))
+
+
+def frame_from_records(data, schema=None):
+    """
+    Build a DataFrame from parsed JSON records, applying ``schema``.
+
+    Args:
+        data (list or dict): The records, or a single record.
+        schema (dict, optional): Column dtypes to apply.
+
+    Returns:
+        pandas.DataFrame: The records as a DataFrame.
+    """
+    records = data if isinstance(data, list) else [data]
+    if schema is None:
+        return pd.DataFrame(records)
+    names = list(dict.fromkeys(name for row in records for name in row))
+    return pd.DataFrame(
+        {
+            name: _column([row.get(name) for row in records], schema.get(name))
+            for name in names
+        }
+    )
+
+
+def csv_dtypes(schema):
+    """
+    The part of a schema ``read_csv`` can apply while parsing. Integer
+    columns are left out, as a missing value would make parsing fail; use
+    apply_schema() on the result for those.
+    """
+    return {
+        name: dtype
+        for name, dtype in (schema or {}).items()
+        if not dtype.startswith("int")
+    }
+
+
+def apply_schema(df, schema):
+    """
+    Cast the columns of ``df`` that don't have their schema dtype yet.
+
+    Args:
+        df (pandas.DataFrame): The frame to convert.
+        schema (dict): Column dtypes to apply.
+
+    Returns:
+        pandas.DataFrame: The converted frame.
+    """
+    casts = {
+        name: dtype
+        for name, dtype in schema.items()
+        if name in df.columns and str(df[name].dtype) != dtype
+    }
+    for name, dtype in casts.items():
+        try:
+            df[name] = df[name].astype(dtype)
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return df
+
+
+def _column(values, dtype):
+    if dtype is None:
+        return pd.Series(values)
+    if dtype == "category":
+        return pd.Categorical(values)
+    if dtype == "bool" and None in values:
+        return pd.Series(values)
+    try:
+        return np.array(values, dtype=dtype)
+    except (TypeError, ValueError, OverflowError):
+        # Missing values in an integer column, or unexpected types.
+        return pd.Series(values)
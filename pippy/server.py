@@ -1,52 +1,118 @@
-import requests
-from .constants import SERVERS, DEFAULT_SERVER
+import os
+import threading
+import time
+from .constants import SERVERS, DEFAULT_SERVER, HEALTH_CHECK_TTL
 from .exceptions import PIPAPIError
+from .lazy import LazyModule
+from .session import http_get
 
+requests = LazyModule("requests")
 
-def set_server(server=DEFAULT_SERVER):
+_lock = threading.Lock()
+_state = {"base_url": None, "checked_at": None}
+
+
+def _resolve_base_url(server):
     """
-    Set the server for API requests and perform a health check.
+    Translate a server name or URL into a base URL.
 
     Args:
-        server (str): The server to use. Defaults to DEFAULT_SERVER.
+        server (str): A key of SERVERS or an explicit http(s) URL.
 
     Returns:
-        str: The base URL of the selected server.
+        str: The base URL without a trailing slash.
 
     Raises:
         ValueError: If an invalid server is provided.
-        PIPAPIError: If the API health check fails.
     """
-    if server not in SERVERS:
-        raise ValueError(
-            f"Invalid server: {server}. Choose from {', '.join(SERVERS.keys())}"
-        )
+    if server in SERVERS:
+        return SERVERS[server]
+    if isinstance(server, str) and server.startswith(("http://", "https://")):
+        return server.rstrip("/")
+    raise ValueError(
+        f"Invalid server: {server}. Choose from {', '.join(SERVERS.keys())}"
+    )
 
-    base_url = SERVERS[server]
 
-    # Health check
+def health_check(base_url):
+    """
+    Check that the API at the given base URL is up.
+
+    Args:
+        base_url (str): The base URL of the API.
+
+    Raises:
+        PIPAPIError: If the API health check fails.
+    """
     try:
-        response = requests.get(f"{base_url}/health-check")
+        response = http_get(f"{base_url}/health-check")
         response.raise_for_status()
         if "API is running" not in response.text:
             raise PIPAPIError("API health check failed")
     except requests.RequestException as e:
         raise PIPAPIError(f"Failed to connect to the API: {str(e)}")
 
-    return base_url
 
+def set_server(server=DEFAULT_SERVER, lazy=False):
+    """
+    Set the server for API requests and perform a health check.
+
+    Args:
+        server (str): The server to use, either a key of SERVERS or an
+            explicit base URL. Defaults to DEFAULT_SERVER.
+        lazy (bool): Defer the health check until the server is first
+            used. Defaults to False.
+
+    Returns:
+        str: The base URL of the selected server.
+
+    Raises:
+        ValueError: If an invalid server is provided.
+        PIPAPIError: If the API health check fails.
+    """
+    base_url = _resolve_base_url(server)
+
+    checked_at = None
+    if not lazy:
+        health_check(base_url)
+        checked_at = time.monotonic()
+
+    with _lock:
+        _state["base_url"] = base_url
+        _state["checked_at"] = checked_at
 
-current_server = set_server()
+    return base_url
 
 
-def get_base_url():
+def get_base_url(check=True):
     """
     Get the current base URL for API requests.
 
+    The first call after the server is selected runs the health check;
+    a successful result is then trusted for HEALTH_CHECK_TTL seconds.
+
+    Args:
+        check (bool): Run the health check if it is due. Defaults to True.
+
     Returns:
         str: The current base URL.
+
+    Raises:
+        PIPAPIError: If the API health check fails.
     """
-    return current_server
+    with _lock:
+        base_url = _state["base_url"]
+        checked_at = _state["checked_at"]
+
+    if check and (
+        checked_at is None or time.monotonic() - checked_at > HEALTH_CHECK_TTL
+    ):
+        health_check(base_url)
+        with _lock:
+            if _state["base_url"] == base_url:
+                _state["checked_at"] = time.monotonic()
+
+    return base_url
 
 
 def get_pip_url():
@@ -56,7 +122,7 @@ def get_pip_url():
     Returns:
         str: The URL for PIP API requests.
     """
-    return f"{current_server}/pip"
+    return f"{get_base_url()}/pip"
 
 
 def get_pip_grp_url():
@@ -66,4 +132,15 @@ def get_pip_grp_url():
     Returns:
         str: The URL for grouped PIP API requests.
     """
-    return f"{current_server}/pip-grp"
+    return f"{get_base_url()}/pip-grp"
+
+
+def __getattr__(name):
+    # ``current_server`` used to be a module constant filled in at import
+    # time; keep it readable without paying for the health check upfront.
+    if name == "current_server":
+        return get_base_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+set_server(os.environ.get("PIPPY_SERVER", DEFAULT_SERVER), lazy=True)
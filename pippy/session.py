@@ -0,0 +1,238 @@
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+from .constants import (
+    POOL_CONNECTIONS,
+    POOL_MAXSIZE,
+    DEFAULT_TIMEOUT,
+    ENDPOINT_TIMEOUTS,
+)
+from .lazy import LazyModule
+from .metrics import record
+from .resilience import send_with_retries
+
+requests = LazyModule("requests")
+
+_lock = threading.Lock()
+_local = threading.local()
+_config = {
+    "pool_connections": POOL_CONNECTIONS,
+    "pool_maxsize": POOL_MAXSIZE,
+    "timeouts": dict(ENDPOINT_TIMEOUTS),
+    "default_timeout": DEFAULT_TIMEOUT,
+    "headers": {
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    },
+    "mounts": {},
+}
+_shared = {"adapter": None, "generation": 0, "session": None}
+
+
+def configure_session(
+    pool_connections=None,
+    pool_maxsize=None,
+    timeouts=None,
+    default_timeout=None,
+    headers=None,
+):
+    """
+    Configure the HTTP session shared by all pippy requests.
+
+    Sessions created after this call pick up the new settings; existing
+    pooled connections are closed.
+
+    Args:
+        pool_connections (int, optional): Number of hosts to keep pools for.
+        pool_maxsize (int, optional): Maximum connections kept per host.
+        timeouts (dict, optional): Per-endpoint ``(connect, read)``
+            timeouts, merged into the current ones.
+        default_timeout (tuple, optional): Timeout for endpoints without a
+            specific entry.
+        headers (dict, optional): Extra headers sent with every request.
+    """
+    with _lock:
+        if pool_connections is not None:
+            _config["pool_connections"] = pool_connections
+        if pool_maxsize is not None:
+            _config["pool_maxsize"] = pool_maxsize
+        if timeouts:
+            _config["timeouts"].update(timeouts)
+        if default_timeout is not None:
+            _config["default_timeout"] = default_timeout
+        if headers:
+            _config["headers"].update(headers)
+    reset_session()
+
+
+def mount_adapter(prefix, adapter):
+    """
+    Route requests whose URL starts with ``prefix`` through ``adapter``.
+
+    This is the hook tests use to serve requests from a local stand-in
+    instead of the network. Pass ``adapter=None`` to remove a mount.
+
+    Args:
+        prefix (str): URL prefix, e.g. ``"http://127.0.0.1:8000/"``.
+        adapter (requests.adapters.BaseAdapter or None): Adapter to use.
+    """
+    with _lock:
+        if adapter is None:
+            _config["mounts"].pop(prefix, None)
+        else:
+            _config["mounts"][prefix] = adapter
+    reset_session()
+
+
+def set_session(session):
+    """
+    Use the given session for every request instead of the pooled one.
+
+    Args:
+        session (requests.Session or None): Session to use, or None to go
+            back to the pooled session.
+    """
+    with _lock:
+        _shared["session"] = session
+        _shared["generation"] += 1
+
+
+def reset_session():
+    """Close pooled connections so the next request builds a new session."""
+    with _lock:
+        adapter = _shared["adapter"]
+        _shared["adapter"] = None
+        _shared["generation"] += 1
+    if adapter is not None:
+        adapter.close()
+
+
+def _get_adapter():
+    with _lock:
+        if _shared["adapter"] is None:
+            _shared["adapter"] = requests.adapters.HTTPAdapter(
+                pool_connections=_config["pool_connections"],
+                pool_maxsize=_config["pool_maxsize"],
+            )
+        return _shared["adapter"], _shared["generation"]
+
+
+def get_session():
+    """
+    Get the HTTP session for the current thread.
+
+    Each thread gets its own ``requests.Session`` (sessions are not safe to
+    share between threads), but all of them mount the same connection pool,
+    so keep-alive connections are reused across threads.
+
+    Returns:
+        requests.Session: The session to send requests with.
+    """
+    override = _shared["session"]
+    if override is not None:
+        return override
+
+    adapter, generation = _get_adapter()
+    session = getattr(_local, "session", None)
+    if session is None or _local.generation != generation:
+        session = requests.Session()
+        session.headers.update(_config["headers"])
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        for prefix, mounted in _config["mounts"].items():
+            session.mount(prefix, mounted)
+        _local.session = session
+        _local.generation = generation
+    return session
+
+
+def endpoint_timeout(url):
+    """
+    Get the ``(connect, read)`` timeout for the endpoint a URL points to.
+
+    Args:
+        url (str): The request URL.
+
+    Returns:
+        tuple: The connect and read timeouts in seconds.
+    """
+    return _config["timeouts"].get(
+        endpoint_name(url), _config["default_timeout"]
+    )
+
+
+def endpoint_name(url):
+    """The API endpoint a URL points to, e.g. ``"pip"``."""
+    return urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+
+
+def http_get(url, params=None, timeout=None, **kwargs):
+    """
+    Send a GET request through the shared session.
+
+    Transient failures are retried and repeated failures open the circuit
+    breaker of the host; see pippy.resilience. The time to the response
+    headers and, unless ``stream=True``, the download of the body are
+    recorded in pippy.metrics.
+
+    Args:
+        url (str): The request URL.
+        params (dict, optional): Query parameters.
+        timeout (float or tuple, optional): Overrides the endpoint timeout.
+        **kwargs: Additional keyword arguments passed to ``Session.get``.
+
+    Returns:
+        requests.Response: The response.
+
+    Raises:
+        CircuitOpenError: If the circuit breaker of the host is open.
+    """
+    if timeout is None:
+        timeout = endpoint_timeout(url)
+
+    def send():
+        start = time.perf_counter()
+        response = get_session().get(
+            url, params=params, timeout=timeout, **kwargs
+        )
+        seconds = time.perf_counter() - start
+        _record_response(url, response, seconds, kwargs.get("stream"))
+        return response
+
+    return send_with_retries(url, send)
+
+
+def _record_response(url, response, seconds, stream):
+    """
+    Split the time ``Session.get`` took into time to the headers and, when
+    it read the body, the download.
+    """
+    endpoint = endpoint_name(url)
+    elapsed = getattr(response, "elapsed", None)
+    ttfb = seconds
+    if isinstance(elapsed, timedelta):
+        ttfb = min(elapsed.total_seconds(), seconds)
+    record(
+        "ttfb", ttfb, endpoint=endpoint, status=response.status_code, url=url
+    )
+    if not stream:
+        record(
+            "download",
+            seconds - ttfb,
+            _wire_bytes(response),
+            endpoint=endpoint,
+            url=url,
+        )
+
+
+def _wire_bytes(response):
+    """Bytes read from the network for a response, before decompression."""
+    try:
+        read = response.raw.tell()
+    except (AttributeError, OSError, ValueError):
+        read = None
+    if isinstance(read, int) and read > 0:
+        return read
+    content = response.content
+    return len(content) if isinstance(content, bytes) else 0
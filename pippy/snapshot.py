@@ -0,0 +1,424 @@
+"""
+Offline snapshots of a PIP release.
+
+build_snapshot() downloads the ``pip`` rows of a release (for the chosen
+poverty lines, with and without filled gaps), the ``pip-grp`` aggregates
+and every auxiliary table into a single SQLite file. Queries are then
+answered from that file through indexes on country, year, welfare type and
+reporting level, without touching the network: either directly with
+Snapshot.query_stats() / Snapshot.query_aux(), or by passing
+``offline=True`` to get_stats(), get_wb() and get_aux().
+
+The snapshot used by ``offline=True`` is the one last opened with
+open_snapshot(), else the file named by the ``PIPPY_SNAPSHOT`` environment
+variable, else the most recently built snapshot in the cache directory.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from . import cache
+from .cache import server_slug
+from .exceptions import PIPAPIError
+from .lazy import LazyModule
+
+pd = LazyModule("pandas")
+
+_INDEXES = {
+    "pip_query": (
+        "pip",
+        "fill_gaps, poverty_line, country_code, reporting_year, "
+        "welfare_type, reporting_level",
+    ),
+    "pip_year": ("pip", "fill_gaps, poverty_line, reporting_year"),
+    "pip_region": ("pip", "fill_gaps, poverty_line, region_code"),
+    "pip_grp_query": ("pip_grp", "poverty_line, reporting_year"),
+}
+
+_lock = threading.Lock()
+_state = {"snapshot": None}
+
+
+def snapshot_dir():
+    """Return the directory snapshots are built in by default."""
+    return cache.CACHE_DIR / "snapshots"
+
+
+def build_snapshot(
+    path=None, povlines=(None,), ppp_version=None, release_version=None
+):
+    """
+    Download a release into a local SQLite snapshot.
+
+    Args:
+        path (str or Path, optional): Where to write the snapshot. Defaults
+            to ``<cache dir>/snapshots/<server>-<release>.sqlite``.
+        povlines (iterable): Poverty lines to download the ``pip`` and
+            ``pip-grp`` rows for; None stands for the API's default line.
+            Defaults to the default line only.
+        ppp_version (str, optional): Version of PPP to use.
+        release_version (str, optional): Release to download. Defaults to
+            the server's current release.
+
+    Returns:
+        Snapshot: The snapshot, opened and used for ``offline=True``.
+
+    Raises:
+        PIPAPIError: If any of the downloads fails.
+    """
+    from .auxiliary import get_aux
+    from .server import get_base_url
+    from .stats import get_stats
+    from .utils import get_current_release
+
+    base_url = get_base_url()
+    if release_version is None:
+        release_version = get_current_release(ppp_version)
+    if path is None:
+        path = (
+            snapshot_dir()
+            / f"{server_slug(base_url)}-{release_version}.sqlite"
+        )
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    versions = {"ppp_version": ppp_version, "release_version": release_version}
+
+    temp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temp.unlink(missing_ok=True)
+    conn = sqlite3.connect(temp)
+    try:
+        dtypes = {}
+        default_povline = None
+        for povline in povlines:
+            for fill_gaps in (False, True):
+                df = get_stats(
+                    povline=povline,
+                    fill_gaps=fill_gaps,
+                    use_cache=False,
+                    **versions,
+                )
+                if povline is None and len(df):
+                    default_povline = float(df["poverty_line"].iloc[0])
+                _write(conn, "pip", df.assign(fill_gaps=fill_gaps), dtypes)
+            df = get_stats(
+                povline=povline, group_by="wb", use_cache=False, **versions
+            )
+            _write(conn, "pip_grp", df, dtypes)
+
+        aux_tables = get_aux()
+        for table in aux_tables:
+            df = get_aux(table, use_cache=False, **versions)
+            _write(conn, f"aux_{table}", df, dtypes)
+
+        for name, (table, columns) in _INDEXES.items():
+            if table in dtypes:
+                conn.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+        metadata = {
+            "server": base_url,
+            "release_version": release_version,
+            "ppp_version": ppp_version,
+            "default_povline": default_povline,
+            "povlines": [
+                default_povline if p is None else float(p) for p in povlines
+            ],
+            "aux_tables": list(aux_tables),
+            "dtypes": dtypes,
+            "built_at": datetime.now().isoformat(),
+        }
+        conn.execute("CREATE TABLE metadata (value TEXT)")
+        conn.execute("INSERT INTO metadata VALUES (?)", [json.dumps(metadata)])
+        conn.commit()
+    except BaseException:
+        conn.close()
+        temp.unlink(missing_ok=True)
+        raise
+    conn.close()
+    os.replace(temp, path)
+    return open_snapshot(path)
+
+
+def _write(conn, table, df, dtypes):
+    """Append a frame to a table, remembering the dtypes to restore."""
+    df.to_sql(table, conn, index=False, if_exists="append")
+    if table not in dtypes or not df.empty:
+        dtypes[table] = {c: str(t) for c, t in df.dtypes.items()}
+
+
+def open_snapshot(path=None):
+    """
+    Open a snapshot and use it for ``offline=True`` queries.
+
+    Args:
+        path (str or Path, optional): The snapshot file. Defaults to the
+            ``PIPPY_SNAPSHOT`` environment variable, then to the most
+            recently built snapshot in the cache directory.
+
+    Returns:
+        Snapshot: The opened snapshot.
+
+    Raises:
+        PIPAPIError: If there is no snapshot to open.
+    """
+    if path is None:
+        path = os.environ.get("PIPPY_SNAPSHOT")
+    if path is None:
+        built = sorted(
+            snapshot_dir().glob("*.sqlite"), key=lambda p: p.stat().st_mtime
+        )
+        if not built:
+            raise PIPAPIError(
+                "No snapshot available; build one with build_snapshot()"
+            )
+        path = built[-1]
+    snapshot = Snapshot(path)
+    with _lock:
+        previous = _state["snapshot"]
+        _state["snapshot"] = snapshot
+    if previous is not None:
+        previous.close()
+    return snapshot
+
+
+def close_snapshot():
+    """Close the snapshot used for ``offline=True`` queries."""
+    with _lock:
+        snapshot = _state["snapshot"]
+        _state["snapshot"] = None
+    if snapshot is not None:
+        snapshot.close()
+
+
+def get_snapshot():
+    """
+    Get the snapshot used for ``offline=True`` queries, opening the
+    default one if necessary.
+
+    Returns:
+        Snapshot: The current snapshot.
+
+    Raises:
+        PIPAPIError: If there is no snapshot to open.
+    """
+    snapshot = _state["snapshot"]
+    if snapshot is None:
+        snapshot = open_snapshot()
+    return snapshot
+
+
+def query_stats(**kwargs):
+    """
+    Answer a get_stats() query from the current snapshot.
+
+    Args:
+        **kwargs: Keyword arguments accepted by get_stats().
+
+    Returns:
+        pandas.DataFrame: The matching rows.
+    """
+    return get_snapshot().query_stats(**kwargs)
+
+
+def query_aux(table=None, **kwargs):
+    """
+    Answer a get_aux() query from the current snapshot.
+
+    Args:
+        table (str, optional): Name of the auxiliary table.
+        **kwargs: Keyword arguments accepted by get_aux().
+
+    Returns:
+        pandas.DataFrame or list: The table, or the table names.
+    """
+    return get_snapshot().query_aux(table, **kwargs)
+
+
+class Snapshot:
+    """
+    A release stored in a local SQLite file.
+
+    Connections are opened read-only, one per thread.
+
+    Args:
+        path (str or Path): The snapshot file.
+
+    Raises:
+        PIPAPIError: If the file is not a pippy snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        try:
+            (value,) = (
+                self._connect()
+                .execute("SELECT value FROM metadata")
+                .fetchone()
+            )
+        except sqlite3.Error as e:
+            self.close()
+            raise PIPAPIError(f"Not a pippy snapshot: {self.path} ({e})")
+        self.metadata = json.loads(value)
+
+    def __repr__(self):
+        return (
+            f"<Snapshot {self.metadata['release_version']} "
+            f"of {self.metadata['server']}>"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                f"{self.path.resolve().as_uri()}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Close every connection to the snapshot file."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def _read(self, table, sql, params=()):
+        df = pd.read_sql_query(sql, self._connect(), params=list(params))
+        for column, dtype in self.metadata["dtypes"][table].items():
+            if column in df.columns and str(df[column].dtype) != dtype:
+                try:
+                    df[column] = df[column].astype(dtype)
+                except (TypeError, ValueError):
+                    pass
+        return df
+
+    def _check_versions(self, ppp_version, release_version):
+        for name, value in (
+            ("ppp_version", ppp_version),
+            ("release_version", release_version),
+        ):
+            stored = self.metadata[name]
+            if value is not None and str(value) != str(stored):
+                raise PIPAPIError(
+                    f"The snapshot holds {name} {stored}, not {value}"
+                )
+
+    def query_stats(
+        self,
+        country="all",
+        year="all",
+        povline=None,
+        popshare=None,
+        fill_gaps=False,
+        region=None,
+        welfare_type="all",
+        reporting_level="all",
+        ppp_version=None,
+        release_version=None,
+        group_by=None,
+        **_,
+    ):
+        """
+        Answer a get_stats() query from the snapshot.
+
+        Takes the arguments of get_stats(); arguments that only affect the
+        transport (format, caching) are ignored.
+
+        Returns:
+            pandas.DataFrame: The matching rows.
+
+        Raises:
+            PIPAPIError: If the snapshot can't answer the query, e.g. for a
+                poverty line or release it doesn't hold.
+        """
+        self._check_versions(ppp_version, release_version)
+        if popshare is not None:
+            raise PIPAPIError("popshare queries can't be answered offline")
+        if povline is None:
+            povline = self.metadata["default_povline"]
+        if float(povline) not in self.metadata["povlines"]:
+            raise PIPAPIError(
+                f"The snapshot has no data for poverty line {povline}"
+            )
+        if group_by not in (None, "wb"):
+            raise PIPAPIError(f"group_by={group_by!r} isn't in the snapshot")
+        table = "pip_grp" if group_by else "pip"
+        if table not in self.metadata["dtypes"]:
+            raise PIPAPIError(f"The snapshot has no {table} data")
+
+        where = ["poverty_line = ?"]
+        params = [float(povline)]
+        if table == "pip":
+            where.insert(0, "fill_gaps = ?")
+            params.insert(0, bool(fill_gaps))
+            codes = _as_list(region if region else country)
+            if codes is not None:
+                column = "region_code" if region else "country_code"
+                _filter_in(where, params, column, codes)
+            if welfare_type != "all":
+                where.append("welfare_type = ?")
+                params.append(welfare_type)
+            if reporting_level != "all":
+                where.append("reporting_level = ?")
+                params.append(reporting_level)
+        years = _as_list(year)
+        if years is not None:
+            try:
+                years = [int(y) for y in years]
+            except ValueError:
+                raise PIPAPIError(f"Invalid year: {year}")
+            _filter_in(where, params, "reporting_year", years)
+
+        # Keep the order the API returned the rows in.
+        sql = (
+            f"SELECT * FROM {table} WHERE {' AND '.join(where)} "
+            "ORDER BY rowid"
+        )
+        df = self._read(table, sql, params)
+        return df.drop(columns="fill_gaps") if table == "pip" else df
+
+    def query_aux(self, table, ppp_version=None, release_version=None, **_):
+        """
+        Answer a get_aux() query from the snapshot.
+
+        Args:
+            table (str or None): Name of the auxiliary table, or None for
+                the list of tables.
+            ppp_version (str, optional): Version of PPP to use.
+            release_version (str, optional): Release version of the data.
+
+        Returns:
+            pandas.DataFrame or list: The table, or the table names.
+
+        Raises:
+            PIPAPIError: If the snapshot doesn't hold the table.
+        """
+        self._check_versions(ppp_version, release_version)
+        if table is None:
+            return list(self.metadata["aux_tables"])
+        name = f"aux_{table}"
+        if name not in self.metadata["dtypes"]:
+            raise PIPAPIError(f"The snapshot has no {table} table")
+        return self._read(name, f'SELECT * FROM "{name}"')
+
+
+def _as_list(value):
+    if value is None or str(value).upper() == "ALL":
+        return None
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [v for v in str(value).split(",") if v]
+
+
+def _filter_in(where, params, column, values):
+    where.append(f"{column} IN ({', '.join('?' * len(values))})")
+    params.extend(values)
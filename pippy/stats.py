@@ -1,10 +1,70 @@
-import requests
-import pandas as pd
+import inspect
 import logging
-from .exceptions import PIPAPIError
-from .cache import cache_response, get_cached_response
-from .server import current_server, set_server
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import NamedTuple
+from .constants import (
+    BATCH_MAX_WORKERS,
+    NEGATIVE_CACHE_HOURS,
+    STREAM_CHUNKSIZE,
+)
+from .exceptions import CircuitOpenError, PIPAPIError
+from .cache import (
+    _protect,
+    cache_frame,
+    cache_lock,
+    cache_not_found,
+    get_cached_entry,
+    get_cached_not_found,
+    is_cached,
+    make_cache_key,
+    renew_entry,
+)
+from .auxiliary import ENRICH_TABLES, enrich_stats
+from .coalesce import stats_flights
+from .server import get_base_url
+from .planner import is_list, plan_query
+from .snapshot import get_snapshot
 from .logger import pippy_logger
+from .lazy import LazyModule
+from .schema import (
+    apply_schema,
+    csv_dtypes,
+    frame_from_records,
+    resolve_schema,
+    schema_key,
+)
+from .metrics import record, timed
+from .session import endpoint_name, http_get
+from .utils import get_current_release
+from .wire import (
+    arrow_rejected,
+    frame_from_arrow,
+    is_arrow,
+    read_arrow,
+    wire_params,
+)
+
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+urllib3 = LazyModule("urllib3")
+
+
+class QueryFailure(NamedTuple):
+    """A query from get_stats_many() that raised a PIPAPIError."""
+
+    query_id: int
+    query: dict
+    error: PIPAPIError
+
+
+class StatsBatch(NamedTuple):
+    """Result of get_stats_many(): the combined data and failed queries."""
+
+    data: object
+    failures: list
 
 
 def get_stats(
@@ -22,13 +82,24 @@ def get_stats(
     group_by=None,
     debug=False,
     use_cache=True,
+    stale_while_revalidate=False,
+    compact=False,
+    offline=False,
+    enrich=None,
 ):
     """
     Retrieve poverty and inequality statistics from the World Bank's PIP API.
 
+    Lists of countries or years are answered with one bulk request
+    filtered locally, targeted requests sent concurrently or cached
+    results, whichever pippy.planner estimates is cheapest; the chosen plan
+    is logged in debug mode.
+
     Args:
-        country (str): Country code or 'all' for all countries. Defaults to 'all'.
-        year (str or int): Year or 'all' for all years. Defaults to 'all'.
+        country (str or list): Country code, list of country codes or 'all'
+            for all countries. Defaults to 'all'.
+        year (str, int or list): Year, list of years or 'all' for all
+            years. Defaults to 'all'.
         povline (float, optional): Poverty line in PPP dollars per day.
         popshare (float, optional): Population share (0-100).
         fill_gaps (bool): Whether to fill gaps in the data. Defaults to False.
@@ -37,10 +108,24 @@ def get_stats(
         reporting_level (str): Level of reporting. Defaults to 'all'.
         ppp_version (str, optional): Version of PPP to use.
         release_version (str, optional): Release version of the data.
-        format (str): Format of the returned data. Defaults to 'json'.
+        format (str): Wire format of the response, 'json' or 'arrow'.
+            Arrow responses are decoded without parsing text; pippy falls
+            back to JSON if pyarrow isn't installed or the server doesn't
+            serve Arrow. Defaults to 'json'.
         group_by (str, optional): Grouping option for the data.
         debug (bool): Enable debug logging. Defaults to False.
         use_cache (bool): Use cached data if available. Defaults to True.
+        stale_while_revalidate (bool): Return expired cached data right away
+            and refresh it in the background. Defaults to False.
+        compact (bool or dict): Use compact dtypes (categorical codes,
+            int16 years, float32 measures), or a schema of your own mapping
+            columns to dtypes. Defaults to False.
+        offline (bool): Answer the query from the local snapshot (see
+            pippy.snapshot) instead of the API. Defaults to False.
+        enrich (bool, str or list, optional): Join columns of these cached
+            auxiliary tables to the rows (see
+            pippy.auxiliary.enrich_stats); True joins the GDP and CPI
+            tables. Defaults to None.
 
     Returns:
         pandas.DataFrame: A DataFrame containing the requested statistics.
@@ -48,6 +133,19 @@ def get_stats(
     Raises:
         PIPAPIError: If the API request fails or returns unexpected data.
     """
+    if enrich:
+        if group_by:
+            raise PIPAPIError("Only country-level rows can be enriched")
+        arguments = {k: v for k, v in locals().items() if k != "enrich"}
+        return enrich_stats(
+            get_stats(**arguments),
+            ENRICH_TABLES if enrich is True else enrich,
+            ppp_version=ppp_version,
+            release_version=release_version,
+            use_cache=use_cache,
+            offline=offline,
+        )
+
     if debug:
         pippy_logger.setLevel(logging.DEBUG)
     else:
@@ -55,16 +153,283 @@ def get_stats(
 
     pippy_logger.debug("Debug mode enabled")
 
-    cache_key = f"stats_{country}_{year}_{povline}_{popshare}_{welfare_type}_{reporting_level}_{ppp_version}_{release_version}"
+    if not offline and (is_list(country) or is_list(year)):
+        return _get_planned(dict(locals()))
 
+    schema = resolve_schema(compact)
+    if offline:
+        df = get_snapshot().query_stats(
+            country=country,
+            year=year,
+            povline=povline,
+            popshare=popshare,
+            fill_gaps=fill_gaps,
+            region=region,
+            welfare_type=welfare_type,
+            reporting_level=reporting_level,
+            ppp_version=ppp_version,
+            release_version=release_version,
+            group_by=group_by,
+        )
+        return apply_schema(df, schema) if schema else df
+
+    endpoint, params = _stats_request(
+        country=country,
+        year=year,
+        povline=povline,
+        popshare=popshare,
+        fill_gaps=fill_gaps,
+        region=region,
+        welfare_type=welfare_type,
+        reporting_level=reporting_level,
+        ppp_version=ppp_version,
+        release_version=release_version,
+        format=format,
+        group_by=group_by,
+    )
+
+    cache_key = entry = None
     if use_cache:
-        cached_data = get_cached_response(cache_key)
-        if cached_data:
-            pippy_logger.debug("Using cached data")
-            return pd.DataFrame(cached_data)
+        cache_key = _stats_cache_key(endpoint, params, schema)
+        entry = _get_cached_stats(cache_key)
+        if entry is not None and entry.fresh:
+            return entry.data
+        if entry is not None and stale_while_revalidate:
+            pippy_logger.debug("Serving stale data while revalidating")
+            _revalidate_in_background(
+                endpoint, params, cache_key, entry, schema
+            )
+            return entry.data
+
+    def download():
+        with cache_lock(cache_key) if use_cache else nullcontext() as locked:
+            if locked:
+                # Another process may have refilled the key while we waited.
+                refilled = _get_cached_stats(cache_key)
+                if refilled is not None and refilled.fresh:
+                    return refilled.data
+            url = f"{get_base_url()}/{endpoint}"
+            return _download_stats(
+                url, params, cache_key, use_cache, entry, schema
+            )
+
+    try:
+        if cache_key is None:
+            return download()
+        # Identical queries running in other threads share one download.
+        return _protect(stats_flights.do(cache_key, download))
+    except CircuitOpenError:
+        if entry is None:
+            raise
+        pippy_logger.warning("The API is unavailable; serving stale data")
+        return entry.data
+
+
+def _get_planned(arguments):
+    """Answer a query for lists of countries or years as planned."""
+    schema = resolve_schema(arguments["compact"])
+
+    def cached(request):
+        return arguments["use_cache"] and is_cached(
+            _stats_cache_key(*_stats_request(**request), schema)
+        )
+
+    plan = plan_query(arguments, cached)
+    pippy_logger.debug("Query plan: %s", plan.describe())
+    if len(plan.requests) == 1:
+        df = get_stats(**plan.requests[0])
+    else:
+        data, failures = get_stats_many(plan.requests)
+        if failures:
+            failure = failures[0]
+            raise PIPAPIError(
+                f"Query for country {failure.query['country']}, year "
+                f"{failure.query['year']} failed: {failure.error}"
+            )
+        df = data.drop(columns="query_id")
+
+    keep = None
+    if plan.countries is not None and "country_code" in df.columns:
+        keep = df["country_code"].isin(plan.countries)
+    if plan.years is not None and "reporting_year" in df.columns:
+        in_years = df["reporting_year"].isin(plan.years)
+        keep = in_years if keep is None else keep & in_years
+    if keep is None or keep.all():
+        return df
+    return df[keep].reset_index(drop=True)
+
+
+def _download_stats(
+    url, params, cache_key, use_cache, entry=None, schema=None
+):
+    """
+    Request a stats query from the API and cache the result.
+
+    If ``entry`` is an expired cache entry with validators, the request is
+    made conditional, and a 304 Not Modified response renews the entry
+    without downloading or parsing the body again.
+    """
+    headers = {}
+    if entry is not None:
+        if "etag" in entry.validators:
+            headers["If-None-Match"] = entry.validators["etag"]
+        if "last_modified" in entry.validators:
+            headers["If-Modified-Since"] = entry.validators["last_modified"]
 
+    params = wire_params(params)
+    pippy_logger.debug("Request URL: %s", url)
+    pippy_logger.debug("Request params: %s", params)
+
+    try:
+        response = http_get(url, params=params, headers=headers)
+        if arrow_rejected(params, response):
+            params = dict(params, format="json")
+            response = http_get(url, params=params, headers=headers)
+        if pippy_logger.isEnabledFor(logging.DEBUG):
+            pippy_logger.debug(
+                "Response status code: %s", response.status_code
+            )
+            pippy_logger.debug("Response headers: %s", response.headers)
+            pippy_logger.debug(
+                "Raw response content: %s...", _preview(response)
+            )
+
+        if response.status_code == 304 and entry is not None:
+            pippy_logger.debug("Cached data is still valid")
+            expiry_hours = _expiry_hours(entry.data, params)
+            validators = _validators(response) or entry.validators
+            if not renew_entry(cache_key, expiry_hours, validators):
+                cache_frame(cache_key, entry.data, expiry_hours, validators)
+            return entry.data
+
+        response.raise_for_status()
+
+        endpoint = endpoint_name(url)
+        content_type = response.headers.get("Content-Type", "")
+        if is_arrow(response):
+            with timed("parse", endpoint=endpoint, format="arrow"):
+                table = read_arrow(response.content)
+            with timed("build", endpoint=endpoint) as details:
+                df = frame_from_arrow(table, schema)
+                details["rows"] = len(df)
+        elif "application/json" not in content_type:
+            if "<html>" in response.text[:100]:
+                raise PIPAPIError(
+                    "API returned an HTML error page. The service may be experiencing issues."
+                )
+            else:
+                raise PIPAPIError(
+                    f"Unexpected content type: {content_type}. Full response: {response.text[:1000]}..."
+                )
+        else:
+            with timed("parse", endpoint=endpoint):
+                data = response.json()
+            with timed("build", endpoint=endpoint) as details:
+                df = frame_from_records(data, schema)
+                details["rows"] = len(df)
+
+        if use_cache:
+            cache_frame(
+                cache_key,
+                df,
+                _expiry_hours(df, params),
+                _validators(response),
+            )
+
+        return df
+    except requests.RequestException as e:
+        pippy_logger.error(f"API request failed: {str(e)}")
+        status_code = getattr(e.response, "status_code", None)
+        if use_cache and status_code == 404:
+            cache_not_found(cache_key, f"API request failed: {str(e)}")
+        if isinstance(e, requests.HTTPError) and e.response.status_code == 500:
+            raise PIPAPIError(
+                "The API server encountered an internal error. Please try again later or contact the API maintainers."
+            )
+        raise PIPAPIError(
+            f"API request failed: {str(e)}\nResponse content: {getattr(e.response, 'text', '')[:1000]}..."
+        )
+    except ValueError as e:
+        pippy_logger.error(f"Failed to parse API response: {str(e)}")
+        raise PIPAPIError(f"Failed to parse API response: {str(e)}")
+
+
+def _preview(response, size=1000):
+    """The start of a response body, decoding no more than is shown."""
+    return response.content[:size].decode(
+        response.encoding or "utf-8", errors="replace"
+    )
+
+
+def _expiry_hours(df, params):
+    """
+    Data of a known release never changes, so it is cached without expiry.
+    Empty results are only cached briefly.
+    """
+    if df.empty:
+        return NEGATIVE_CACHE_HOURS
+    if _stats_release(params) is not None:
+        return None
+    return 24
+
+
+def _validators(response):
+    """Extract the headers needed to revalidate a response later."""
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
+
+
+_refresh_lock = threading.Lock()
+_refreshing = set()
+_refresh_pool = {"executor": None}
+
+
+def _revalidate_in_background(endpoint, params, cache_key, entry, schema):
+    """Refresh an expired entry on a worker thread, once per key."""
+    with _refresh_lock:
+        if cache_key in _refreshing:
+            return
+        _refreshing.add(cache_key)
+        if _refresh_pool["executor"] is None:
+            _refresh_pool["executor"] = ThreadPoolExecutor(
+                max_workers=2, thread_name_prefix="pippy-refresh"
+            )
+        executor = _refresh_pool["executor"]
+
+    def refresh():
+        try:
+            url = f"{get_base_url()}/{endpoint}"
+            _download_stats(url, params, cache_key, True, entry, schema)
+        except PIPAPIError as e:
+            pippy_logger.warning(f"Background refresh failed: {str(e)}")
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(cache_key)
+
+    executor.submit(refresh)
+
+
+def _stats_request(
+    country="all",
+    year="all",
+    povline=None,
+    popshare=None,
+    fill_gaps=False,
+    region=None,
+    welfare_type="all",
+    reporting_level="all",
+    ppp_version=None,
+    release_version=None,
+    format="json",
+    group_by=None,
+    **_,
+):
+    """Translate get_stats() arguments into an endpoint and query params."""
     endpoint = "pip-grp" if group_by else "pip"
-    url = f"{current_server}/{endpoint}"
 
     params = {
         "country": country if country != "all" else "ALL",
@@ -87,48 +452,322 @@ def get_stats(
 
     # Remove None values
     params = {k: v for k, v in params.items() if v is not None}
+    return endpoint, params
 
-    pippy_logger.debug(f"Request URL: {url}")
-    pippy_logger.debug(f"Request params: {params}")
 
+def _stats_release(params):
+    """
+    The release a query is answered from: the pinned ``release_version``,
+    else the server's current release, or None if it can't be resolved.
+    """
+    if "release_version" in params:
+        return params["release_version"]
     try:
-        response = requests.get(url, params=params, timeout=10)
-        pippy_logger.debug(f"Response status code: {response.status_code}")
-        pippy_logger.debug(f"Response headers: {response.headers}")
-        pippy_logger.debug(f"Raw response content: {response.text[:1000]}...")
-        response.raise_for_status()
+        return get_current_release(params.get("ppp_version"))
+    except PIPAPIError as e:
+        pippy_logger.debug("Caching without a release: %s", e)
+        return None
 
-        content_type = response.headers.get("Content-Type", "")
-        if "application/json" not in content_type:
-            if "<html>" in response.text[:100]:
-                raise PIPAPIError(
-                    "API returned an HTML error page. The service may be experiencing issues."
-                )
-            else:
-                raise PIPAPIError(
-                    f"Unexpected content type: {content_type}. Full response: {response.text[:1000]}..."
-                )
 
-        data = response.json()
-        df = (
-            pd.DataFrame(data)
-            if isinstance(data, list)
-            else pd.DataFrame([data])
+def _stats_cache_key(endpoint, params, schema=None):
+    """
+    Key a query on the concrete release it is answered from, so unpinned
+    entries are left behind as soon as a new release is published. Frames
+    with a compact schema are cached separately.
+    """
+    release = _stats_release(params)
+    if release is not None:
+        params = dict(params, release_version=release)
+    if schema is not None:
+        params = dict(params, compact=schema_key(schema))
+    if params.get("format") == "arrow":
+        # Arrow and JSON responses give the same frame; share the entries.
+        params = dict(params, format="json")
+    return make_cache_key("stats", get_base_url(check=False), endpoint, params)
+
+
+_LEGACY_FIELDS = (
+    "country",
+    "year",
+    "povline",
+    "popshare",
+    "welfare_type",
+    "reporting_level",
+    "ppp_version",
+    "release_version",
+)
+
+
+def _legacy_stats_key(name, data):
+    """
+    The cache key of an entry an older pippy stored as ``<name>.json``.
+
+    Those names only record some of the get_stats() arguments, so the entry
+    is taken to be a plain country-level query of the current server. It is
+    rejected (None is returned) when its rows show otherwise: aggregates
+    from ``group_by``, estimates from ``fill_gaps`` or a single region from
+    ``region``.
+    """
+    values = name.removeprefix("stats_").split("_")
+    if not name.startswith("stats_") or len(values) != len(_LEGACY_FIELDS):
+        return None
+    arguments = {}
+    for field, value in zip(_LEGACY_FIELDS, values):
+        if value == "None":
+            continue
+        if field in ("povline", "popshare"):
+            try:
+                value = float(value)
+            except ValueError:
+                return None
+        arguments[field] = value
+
+    rows = data if isinstance(data, list) else [data]
+    if not rows or not all("country_code" in row for row in rows):
+        return None
+    if any(
+        row.get("is_interpolated")
+        or row.get("estimation_type", "survey") != "survey"
+        for row in rows
+    ):
+        return None
+    country = arguments["country"]
+    if country == "all":
+        if len({row.get("region_code") for row in rows}) < 2:
+            return None
+    elif any(row["country_code"] != country for row in rows):
+        return None
+    return _stats_cache_key(*_stats_request(**arguments))
+
+
+def _get_cached_stats(cache_key):
+    not_found = get_cached_not_found(cache_key)
+    if not_found is not None:
+        pippy_logger.debug("Using cached not-found response")
+        raise PIPAPIError(not_found)
+    entry = get_cached_entry(cache_key)
+    if entry is not None and entry.fresh:
+        pippy_logger.debug("Using cached data")
+    return entry
+
+
+def get_stats_many(queries, max_workers=BATCH_MAX_WORKERS):
+    """
+    Retrieve statistics for many queries concurrently.
+
+    Cached queries are answered before any request is sent; the rest are
+    fetched on a thread pool. A query that fails with PIPAPIError is
+    reported in the result instead of aborting the batch.
+
+    Args:
+        queries (iterable): get_stats() arguments for each query, either as
+            a dict of keyword arguments or a tuple of positional ones such
+            as ``(country, year, povline)``.
+        max_workers (int): Maximum number of concurrent requests.
+            Defaults to BATCH_MAX_WORKERS.
+
+    Returns:
+        StatsBatch: ``data`` is a DataFrame with the rows of every
+            successful query and a ``query_id`` column holding the index of
+            the originating query; ``failures`` lists a QueryFailure for
+            each query that raised PIPAPIError.
+    """
+    signature = inspect.signature(get_stats)
+    frames = {}
+    failures = []
+    pending = {}
+    for query_id, query in enumerate(queries):
+        if isinstance(query, dict):
+            bound = signature.bind(**query)
+        else:
+            bound = signature.bind(*query)
+        bound.apply_defaults()
+        arguments = dict(bound.arguments)
+        cacheable = arguments["use_cache"] and not arguments["offline"]
+        if cacheable and not arguments["enrich"]:
+            cache_key = _stats_cache_key(
+                *_stats_request(**arguments),
+                resolve_schema(arguments["compact"]),
+            )
+            try:
+                entry = _get_cached_stats(cache_key)
+            except PIPAPIError as e:
+                failures.append(QueryFailure(query_id, arguments, e))
+                continue
+            if entry is not None and entry.fresh:
+                frames[query_id] = entry.data
+                continue
+        pending[query_id] = arguments
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(get_stats, **arguments): query_id
+                for query_id, arguments in pending.items()
+            }
+            for future in as_completed(futures):
+                query_id = futures[future]
+                try:
+                    frames[query_id] = future.result()
+                except PIPAPIError as e:
+                    failures.append(
+                        QueryFailure(query_id, pending[query_id], e)
+                    )
+
+    if frames:
+        parts = [
+            frame.assign(query_id=query_id)
+            for query_id, frame in sorted(frames.items())
+        ]
+        # Empty results have no columns (or untyped ones); concatenating
+        # them would turn int and bool columns into float and object.
+        data = pd.concat(
+            [part for part in parts if len(part)] or parts,
+            ignore_index=True,
         )
+    else:
+        data = pd.DataFrame({"query_id": pd.Series(dtype="int64")})
+    failures.sort(key=lambda failure: failure.query_id)
+    return StatsBatch(data, failures)
 
-        if use_cache:
-            cache_response(cache_key, data)
 
-        return df
-    except requests.RequestException as e:
-        pippy_logger.error(f"API request failed: {str(e)}")
-        if isinstance(e, requests.HTTPError) and e.response.status_code == 500:
-            raise PIPAPIError(
-                "The API server encountered an internal error. Please try again later or contact the API maintainers."
+def iter_stats(
+    country="all",
+    year="all",
+    povline=None,
+    popshare=None,
+    fill_gaps=False,
+    region=None,
+    welfare_type="all",
+    reporting_level="all",
+    ppp_version=None,
+    release_version=None,
+    group_by=None,
+    chunksize=STREAM_CHUNKSIZE,
+    path=None,
+    use_cache=True,
+    compact=False,
+):
+    """
+    Retrieve statistics as a stream of DataFrame chunks.
+
+    The query is requested as CSV and the response body is parsed while it
+    is downloaded, so memory use is bounded by ``chunksize`` rather than by
+    the size of the result. A query that get_stats() has already cached is
+    served from the cache instead.
+
+    Args:
+        country (str): Country code or 'all' for all countries. Defaults to 'all'.
+        year (str or int): Year or 'all' for all years. Defaults to 'all'.
+        povline (float, optional): Poverty line in PPP dollars per day.
+        popshare (float, optional): Population share (0-100).
+        fill_gaps (bool): Whether to fill gaps in the data. Defaults to False.
+        region (str, optional): Region code.
+        welfare_type (str): Type of welfare measure. Defaults to 'all'.
+        reporting_level (str): Level of reporting. Defaults to 'all'.
+        ppp_version (str, optional): Version of PPP to use.
+        release_version (str, optional): Release version of the data.
+        group_by (str, optional): Grouping option for the data.
+        chunksize (int): Number of rows per chunk. Defaults to
+            STREAM_CHUNKSIZE.
+        path (str or Path, optional): Also write the rows to this CSV file
+            as they arrive.
+        use_cache (bool): Use cached data if available. Defaults to True.
+        compact (bool or dict): Use compact dtypes, as in get_stats().
+            Defaults to False.
+
+    Yields:
+        pandas.DataFrame: Consecutive chunks of the requested statistics.
+
+    Raises:
+        PIPAPIError: If the API request fails or returns unexpected data.
+    """
+    arguments = dict(
+        country=country,
+        year=year,
+        povline=povline,
+        popshare=popshare,
+        fill_gaps=fill_gaps,
+        region=region,
+        welfare_type=welfare_type,
+        reporting_level=reporting_level,
+        ppp_version=ppp_version,
+        release_version=release_version,
+        group_by=group_by,
+    )
+    schema = resolve_schema(compact)
+    chunks = None
+    if use_cache:
+        entry = _get_cached_stats(
+            _stats_cache_key(*_stats_request(**arguments), schema)
+        )
+        if entry is not None and entry.fresh:
+            df = entry.data
+            chunks = (
+                df.iloc[start : start + chunksize]
+                for start in range(0, len(df), chunksize)
             )
-        raise PIPAPIError(
-            f"API request failed: {str(e)}\nResponse content: {getattr(e.response, 'text', '')[:1000]}..."
+    if chunks is None:
+        endpoint, params = _stats_request(format="csv", **arguments)
+        chunks = _stream_csv(
+            f"{get_base_url()}/{endpoint}", params, chunksize, schema
         )
+
+    header = True
+    for chunk in chunks:
+        if path is not None:
+            chunk.to_csv(
+                path, mode="w" if header else "a", header=header, index=False
+            )
+            header = False
+        yield chunk
+
+
+def _stream_csv(url, params, chunksize, schema=None):
+    """Parse a CSV response in chunks while it is being downloaded."""
+    pippy_logger.debug("Streaming URL: %s", url)
+    pippy_logger.debug("Request params: %s", params)
+    try:
+        with http_get(url, params=params, stream=True) as response:
+            pippy_logger.debug(
+                "Response status code: %s", response.status_code
+            )
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            if "text/csv" not in content_type:
+                raise PIPAPIError(f"Unexpected content type: {content_type}")
+            response.raw.decode_content = True
+            try:
+                reader = pd.read_csv(
+                    response.raw,
+                    chunksize=chunksize,
+                    dtype=csv_dtypes(schema),
+                )
+            except pd.errors.EmptyDataError:
+                return
+            # Downloading and parsing are interleaved; the time spent
+            # producing chunks is recorded as the download.
+            reading = 0.0
+            try:
+                with reader:
+                    while True:
+                        start = time.perf_counter()
+                        chunk = next(reader, None)
+                        reading += time.perf_counter() - start
+                        if chunk is None:
+                            break
+                        yield apply_schema(chunk, schema) if schema else chunk
+            finally:
+                record(
+                    "download",
+                    reading,
+                    response.raw.tell(),
+                    endpoint=endpoint_name(url),
+                    url=url,
+                )
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        pippy_logger.error(f"API request failed: {str(e)}")
+        raise PIPAPIError(f"API request failed: {str(e)}")
     except ValueError as e:
         pippy_logger.error(f"Failed to parse API response: {str(e)}")
         raise PIPAPIError(f"Failed to parse API response: {str(e)}")
@@ -140,6 +779,7 @@ def get_wb(
     ppp_version=None,
     release_version=None,
     format="json",
+    offline=False,
 ):
     """
     Retrieve World Bank global/regional statistics from the PIP API.
@@ -150,6 +790,8 @@ def get_wb(
         ppp_version (str, optional): Version of PPP to use.
         release_version (str, optional): Release version of the data.
         format (str): Format of the returned data. Defaults to 'json'.
+        offline (bool): Answer the query from the local snapshot instead of
+            the API. Defaults to False.
 
     Returns:
         pandas.DataFrame: A DataFrame containing the World Bank global/regional statistics.
@@ -165,8 +807,5 @@ def get_wb(
         ppp_version=ppp_version,
         release_version=release_version,
         format=format,
+        offline=offline,
     )
-
-
-# Ensure the server is set correctly
-set_server()
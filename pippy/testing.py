@@ -0,0 +1,749 @@
+"""
+A local stand-in for the PIP API.
+
+The stub speaks enough of the PIP REST interface (``health-check``, ``pip``,
+``pip-grp``, ``aux``, ``versions`` and ``pip-info``) for tests to exercise
+pippy end to end without touching ``api.worldbank.org``. Survey rows are
+generated deterministically from a log-normal welfare distribution, so
+headcounts respond sensibly to the poverty line.
+
+It only depends on the standard library, so importing it does not pull in
+pandas or requests; pyarrow is imported when an Arrow response is first
+rendered.
+
+StubKeyValueStore stands in for a remote key-value store such as Redis, to
+exercise pippy.backends.RemoteBackend.
+"""
+
+import csv
+import fnmatch
+import gzip
+import hashlib
+import io
+import json
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from statistics import NormalDist
+from urllib.parse import parse_qs, urlsplit
+
+_NORMAL = NormalDist()
+
+# (country_code, country_name, region_code, daily mean, gini, population)
+COUNTRIES = [
+    ("AGO", "Angola", "SSA", 4.1, 0.51, 31.8e6),
+    ("ALB", "Albania", "ECA", 9.8, 0.30, 2.9e6),
+    ("ARG", "Argentina", "LAC", 17.2, 0.42, 44.9e6),
+    ("ARM", "Armenia", "ECA", 8.9, 0.29, 3.0e6),
+    ("BGD", "Bangladesh", "SAS", 3.9, 0.32, 163.0e6),
+    ("BOL", "Bolivia", "LAC", 10.4, 0.42, 11.5e6),
+    ("BRA", "Brazil", "LAC", 15.6, 0.53, 211.0e6),
+    ("CHN", "China", "EAP", 11.3, 0.38, 1400.0e6),
+    ("COL", "Colombia", "LAC", 12.1, 0.51, 50.3e6),
+    ("EGY", "Egypt, Arab Rep.", "MNA", 5.2, 0.32, 100.4e6),
+    ("ETH", "Ethiopia", "SSA", 3.3, 0.35, 112.1e6),
+    ("GHA", "Ghana", "SSA", 6.0, 0.43, 30.4e6),
+    ("IDN", "Indonesia", "EAP", 6.8, 0.38, 270.6e6),
+    ("IND", "India", "SAS", 4.0, 0.36, 1366.0e6),
+    ("IRN", "Iran, Islamic Rep.", "MNA", 14.5, 0.41, 82.9e6),
+    ("JOR", "Jordan", "MNA", 11.8, 0.34, 10.1e6),
+    ("KEN", "Kenya", "SSA", 4.9, 0.39, 52.6e6),
+    ("MEX", "Mexico", "LAC", 10.9, 0.45, 127.6e6),
+    ("NGA", "Nigeria", "SSA", 3.4, 0.35, 201.0e6),
+    ("PAK", "Pakistan", "SAS", 4.2, 0.30, 216.6e6),
+    ("PER", "Peru", "LAC", 11.0, 0.42, 32.5e6),
+    ("PHL", "Philippines", "EAP", 7.1, 0.42, 108.1e6),
+    ("POL", "Poland", "ECA", 22.4, 0.30, 38.0e6),
+    ("THA", "Thailand", "EAP", 12.6, 0.35, 69.6e6),
+    ("TUR", "Turkiye", "ECA", 15.3, 0.42, 83.4e6),
+    ("TZA", "Tanzania", "SSA", 3.0, 0.40, 58.0e6),
+    ("UKR", "Ukraine", "ECA", 13.9, 0.26, 44.4e6),
+    ("USA", "United States", "NAC", 68.2, 0.41, 328.2e6),
+    ("VNM", "Viet Nam", "EAP", 9.4, 0.36, 96.5e6),
+    ("ZAF", "South Africa", "SSA", 13.1, 0.63, 58.6e6),
+]
+
+REGIONS = {
+    "EAP": "East Asia & Pacific",
+    "ECA": "Europe & Central Asia",
+    "LAC": "Latin America & Caribbean",
+    "MNA": "Middle East & North Africa",
+    "NAC": "North America",
+    "SAS": "South Asia",
+    "SSA": "Sub-Saharan Africa",
+}
+
+YEARS = list(range(2000, 2020))
+
+DEFAULT_RELEASE = "20240627"
+
+
+def scaled_countries(count):
+    """
+    Return ``count`` COUNTRIES-style tuples, for payloads the size of the
+    production API's (about 170 countries).
+
+    The first entries are COUNTRIES; the rest are variations of them with
+    codes ``X00``, ``X01``, ... and shifted means and Gini indexes.
+    """
+    countries = []
+    for i in range(count):
+        code, name, region, mean, gini, pop = COUNTRIES[i % len(COUNTRIES)]
+        copy = i // len(COUNTRIES)
+        if copy:
+            code = f"X{i - len(COUNTRIES):02X}"
+            name = f"{name} {copy}"
+            mean *= 1 + 0.15 * copy
+            gini = min(gini + 0.01 * copy, 0.7)
+        countries.append((code, name, region, mean, gini, pop))
+    return countries
+
+
+def _lognormal(mean, gini):
+    """Return (mu, sigma) of a log-normal with the given mean and Gini."""
+    sigma = 2**0.5 * _NORMAL.inv_cdf((gini + 1) / 2)
+    mu = math.log(mean) - sigma**2 / 2
+    return mu, sigma
+
+
+def poverty_measures(mean, gini, povline):
+    """
+    Compute FGT poverty measures for a log-normal welfare distribution.
+
+    Args:
+        mean (float): Mean daily welfare.
+        gini (float): Gini index (0-1).
+        povline (float): Poverty line.
+
+    Returns:
+        dict: headcount, poverty_gap, poverty_severity and watts.
+    """
+    mu, sigma = _lognormal(mean, gini)
+    a = (math.log(povline) - mu) / sigma
+    headcount = _NORMAL.cdf(a)
+    # E[y | y < z] P(y < z) for a log-normal is mean * Phi(a - sigma)
+    below_mean = mean * _NORMAL.cdf(a - sigma)
+    poverty_gap = headcount - below_mean / povline
+    second = mean**2 * _NORMAL.cdf(a - 2 * sigma) * math.exp(sigma**2)
+    poverty_severity = max(
+        headcount - 2 * below_mean / povline + second / povline**2, 0.0
+    )
+    watts = (math.log(povline) - mu) * headcount + sigma * _NORMAL.pdf(a)
+    return {
+        "headcount": headcount,
+        "poverty_gap": max(poverty_gap, 0.0),
+        "poverty_severity": poverty_severity,
+        "watts": watts,
+    }
+
+
+def _has_survey(country_code, year):
+    return (year + sum(map(ord, country_code))) % 3 == 0
+
+
+def make_pip_row(country, year, povline=2.15, release=DEFAULT_RELEASE):
+    """Build one ``pip`` response row for a COUNTRIES entry."""
+    code, name, region, mean, gini, pop = country
+    growth = 1.02 ** (year - 2010)
+    year_mean = mean * growth
+    measures = poverty_measures(year_mean, gini, povline)
+    mu, sigma = _lognormal(year_mean, gini)
+    welfare_type = (
+        "income" if region in ("LAC", "NAC", "ECA") else "consumption"
+    )
+    return {
+        "region_name": REGIONS[region],
+        "region_code": region,
+        "country_name": name,
+        "country_code": code,
+        "reporting_year": year,
+        "reporting_level": "national",
+        "survey_acronym": f"{code}-HS",
+        "survey_coverage": "national",
+        "survey_year": float(year),
+        "welfare_type": welfare_type,
+        "survey_comparability": 1,
+        "comparable_spell": f"{YEARS[0]} - {YEARS[-1]}",
+        "poverty_line": povline,
+        "headcount": measures["headcount"],
+        "poverty_gap": measures["poverty_gap"],
+        "poverty_severity": measures["poverty_severity"],
+        "watts": measures["watts"],
+        "mean": year_mean,
+        "median": math.exp(mu),
+        "mld": sigma**2 / 2,
+        "gini": gini,
+        "polarization": gini * 0.9,
+        "decile1": 0.1 * (1 - gini) ** 2,
+        "decile10": 0.1 + 0.35 * gini,
+        "cpi": 0.6 + 0.02 * (year - YEARS[0]),
+        "ppp": 1.0,
+        "reporting_pop": pop * 1.01 ** (year - 2010),
+        "reporting_gdp": year_mean * 365 * 2.1,
+        "reporting_pce": year_mean * 365 * 1.3,
+        "is_interpolated": not _has_survey(code, year),
+        "distribution_type": "micro",
+        "estimation_type": "survey",
+        "spl": max(2.15, year_mean / 2),
+        "spr": measures["headcount"],
+        "pg": 0.0,
+        "cpi_data_level": "national",
+        "ppp_data_level": "national",
+        "gdp_data_level": "national",
+        "pce_data_level": "national",
+        "release_version": release,
+    }
+
+
+def _as_list(value, default):
+    if value is None or str(value).upper() == "ALL":
+        return default
+    return [v for v in str(value).split(",") if v]
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up early (timeouts, aborted streams) are expected.
+        pass
+
+
+class StubPIPServer:
+    """
+    Threaded HTTP server that imitates the PIP API on 127.0.0.1.
+
+    Use it as a context manager; ``url`` is the base URL to pass to
+    ``pippy.set_server``. Every request is recorded in ``requests`` as a
+    ``(path, params)`` tuple and its headers in ``headers``; ``connections``
+    counts the TCP connections accepted and ``max_in_flight`` the highest
+    number of requests served at once.
+
+    Args:
+        countries (list, optional): COUNTRIES-style tuples to serve.
+        years (list, optional): Reporting years to serve.
+        release (str): Release version reported by ``/versions``.
+        delay (float): Seconds to wait before answering each request.
+        validators (bool): Send ``ETag`` and ``Last-Modified`` headers and
+            answer matching conditional requests with 304 Not Modified.
+        memoize (bool): Render each distinct request once and replay the
+            encoded body afterwards, so serving costs little more than
+            writing it out. Defaults to False.
+        arrow (bool): Answer ``format=arrow`` with an Arrow IPC file, as the
+            PIP API does. With False such requests get 400 Bad Request, like
+            a server that doesn't support Arrow. Defaults to True.
+
+    Faults can be injected with inject(), and ``down = True`` answers every
+    request with 503 Service Unavailable.
+    """
+
+    def __init__(
+        self,
+        countries=None,
+        years=None,
+        release=DEFAULT_RELEASE,
+        delay=0.0,
+        validators=True,
+        memoize=False,
+        arrow=True,
+    ):
+        self.countries = list(countries or COUNTRIES)
+        self.years = list(years or YEARS)
+        self.release = release
+        self.delay = delay
+        self.validators = validators
+        self.memoize = memoize
+        self.arrow = arrow
+        self.down = False
+        self.faults = []
+        self.requests = []
+        self.headers = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._rendered = {}
+        self._httpd = None
+        self._thread = None
+
+    # -- lifecycle -----------------------------------------------------
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; without this,
+            # Nagle's algorithm delays responses by tens of milliseconds.
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self):
+                with server._lock:
+                    server.in_flight += 1
+                    server.max_in_flight = max(
+                        server.max_in_flight, server.in_flight
+                    )
+                try:
+                    server._handle(self)
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = _QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/pip/v1"
+
+    def count(self, path):
+        """Return how many requests were made to an endpoint path."""
+        with self._lock:
+            return sum(1 for p, _ in self.requests if p == path)
+
+    def inject(self, status=503, times=1, path=None, retry_after=None):
+        """
+        Make the next matching requests fail.
+
+        Args:
+            status (int or None): Status code to answer with, or None to
+                close the connection without answering.
+            times (int): Number of requests to fail.
+            path (str, optional): Only fail requests to this endpoint path,
+                e.g. ``"/pip"``.
+            retry_after (str or int, optional): ``Retry-After`` header to
+                send with the error.
+        """
+        with self._lock:
+            self.faults.extend(
+                [{"status": status, "path": path, "retry_after": retry_after}]
+                * times
+            )
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.headers.clear()
+            self.connections = 0
+            self.max_in_flight = 0
+            self.faults.clear()
+            self.down = False
+
+    # -- request handling ----------------------------------------------
+
+    def _handle(self, handler):
+        parts = urlsplit(handler.path)
+        path = parts.path
+        if path.startswith("/pip/v1"):
+            path = path[len("/pip/v1") :]
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        with self._lock:
+            self.requests.append((path, params))
+            self.headers.append(dict(handler.headers))
+        if self.delay:
+            time.sleep(self.delay)
+
+        fault = self._next_fault(path)
+        if fault is not None:
+            self._send_fault(handler, fault)
+            return
+
+        key = (path, tuple(sorted(params.items())), self.release)
+        rendered = self._rendered.get(key) if self.memoize else None
+        if rendered is None:
+            route = {
+                "/health-check": self._health_check,
+                "/pip": self._pip,
+                "/pip-grp": self._pip_grp,
+                "/aux": self._aux,
+                "/versions": self._versions,
+                "/pip-info": self._pip_info,
+            }.get(path)
+            if route is None:
+                status, payload = 404, {"error": f"Unknown endpoint {path}"}
+            else:
+                status, payload = route(params)
+            rendered = self._render(
+                status, payload, params.get("format", "json")
+            )
+            if self.memoize:
+                with self._lock:
+                    self._rendered[key] = rendered
+        self._send(handler, rendered)
+
+    def _next_fault(self, path):
+        with self._lock:
+            if self.down:
+                return {"status": 503, "retry_after": None}
+            for i, fault in enumerate(self.faults):
+                if fault["path"] in (None, path):
+                    return self.faults.pop(i)
+        return None
+
+    def _send_fault(self, handler, fault):
+        if fault["status"] is None:
+            handler.close_connection = True
+            return
+        body = json.dumps({"error": "Injected fault"}).encode()
+        handler.send_response(fault["status"])
+        handler.send_header("Content-Type", "application/json")
+        if fault["retry_after"] is not None:
+            handler.send_header("Retry-After", str(fault["retry_after"]))
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _render(self, status, payload, format="json"):
+        """Encode a response as ``(status, content type, body, validators)``."""
+        if format == "arrow" and not self.arrow:
+            status, payload = 400, {"error": "Unsupported format arrow"}
+        if status == 200 and format == "csv" and isinstance(payload, list):
+            body = _to_csv(payload).encode()
+            content_type = "text/csv"
+        elif status == 200 and format == "arrow" and isinstance(payload, list):
+            body = _to_arrow(payload)
+            content_type = "application/vnd.apache.arrow.file"
+        else:
+            body = json.dumps(payload).encode()
+            content_type = "application/json"
+        validators = {}
+        if status == 200:
+            digest = hashlib.sha1(body).hexdigest()[:20]
+            validators = {
+                "ETag": f'"{digest}"',
+                "Last-Modified": _http_date(self.release),
+            }
+        return {
+            "status": status,
+            "content_type": content_type,
+            "body": body,
+            "validators": validators,
+        }
+
+    def _send(self, handler, rendered):
+        status = rendered["status"]
+        body = rendered["body"]
+        validators = rendered["validators"] if self.validators else {}
+        if validators:
+            if_none_match = handler.headers.get("If-None-Match")
+            if_modified_since = handler.headers.get("If-Modified-Since")
+            if (
+                if_none_match == validators["ETag"]
+                if if_none_match is not None
+                else if_modified_since == validators["Last-Modified"]
+            ):
+                handler.send_response(304)
+                for name, value in validators.items():
+                    handler.send_header(name, value)
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+
+        handler.send_response(status)
+        handler.send_header("Content-Type", rendered["content_type"])
+        for name, value in validators.items():
+            handler.send_header(name, value)
+        if "gzip" in handler.headers.get("Accept-Encoding", ""):
+            if "gzip" not in rendered:
+                rendered["gzip"] = gzip.compress(body)
+            body = rendered["gzip"]
+            handler.send_header("Content-Encoding", "gzip")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _health_check(self, params):
+        return 200, ["PIP API is running"]
+
+    def _versions(self, params):
+        return 200, [
+            {
+                "version": f"{self.release}_2017_01_02_PROD",
+                "release_version": self.release,
+                "ppp_version": "2017",
+                "identity": "PROD",
+            }
+        ]
+
+    def _pip_info(self, params):
+        return 200, {"available_versions": self._versions(params)[1]}
+
+    def _select(self, params):
+        """Resolve the country and year filters of a request."""
+        codes = {c[0] for c in self.countries}
+        countries = _as_list(params.get("country"), sorted(codes))
+        if any(c not in codes for c in countries):
+            return None, None, (404, {"error": "Invalid country"})
+        years = _as_list(params.get("year"), self.years)
+        try:
+            years = [int(y) for y in years]
+        except ValueError:
+            return None, None, (404, {"error": "Invalid year"})
+        if any(y not in self.years for y in years):
+            return None, None, (404, {"error": "Invalid year"})
+        try:
+            povline = float(params.get("povline", 2.15))
+        except ValueError:
+            povline = -1
+        if povline <= 0:
+            return None, None, (404, {"error": "Invalid poverty line"})
+        return [c for c in self.countries if c[0] in countries], years, None
+
+    def _pip(self, params):
+        countries, years, error = self._select(params)
+        if error:
+            return error
+        povline = float(params.get("povline", 2.15))
+        fill_gaps = params.get("fill_gaps") == "true"
+        rows = [
+            make_pip_row(country, year, povline, self.release)
+            for country in countries
+            for year in years
+            if fill_gaps or _has_survey(country[0], year)
+        ]
+        return 200, rows
+
+    def _pip_grp(self, params):
+        countries, years, error = self._select({**params, "country": "ALL"})
+        if error:
+            return error
+        povline = float(params.get("povline", 2.15))
+        rows = []
+        for year in years:
+            country_rows = [
+                make_pip_row(country, year, povline, self.release)
+                for country in countries
+            ]
+            groups = {}
+            for row in country_rows:
+                groups.setdefault(row["region_code"], []).append(row)
+            groups["WLD"] = country_rows
+            for code, members in sorted(groups.items()):
+                pop = sum(r["reporting_pop"] for r in members)
+
+                def weighted(col):
+                    return (
+                        sum(r[col] * r["reporting_pop"] for r in members) / pop
+                    )
+
+                rows.append(
+                    {
+                        "region_name": REGIONS.get(code, "World"),
+                        "region_code": code,
+                        "reporting_year": year,
+                        "reporting_pop": pop,
+                        "poverty_line": povline,
+                        "mean": weighted("mean"),
+                        "headcount": weighted("headcount"),
+                        "poverty_gap": weighted("poverty_gap"),
+                        "poverty_severity": weighted("poverty_severity"),
+                        "watts": weighted("watts"),
+                        "pop_in_poverty": weighted("headcount") * pop,
+                    }
+                )
+        return 200, rows
+
+    def _aux(self, params):
+        table = params.get("table")
+        tables = {
+            "countries": self._aux_countries,
+            "regions": self._aux_regions,
+            "cpi": self._aux_cpi,
+            "gdp": self._aux_gdp,
+            "pop": self._aux_pop,
+            "dictionary": self._aux_dictionary,
+        }
+        if table is None:
+            return 200, sorted(tables)
+        if table not in tables:
+            return 404, {"error": f"Invalid table {table}"}
+        return 200, tables[table]()
+
+    def _aux_countries(self):
+        return [
+            {
+                "country_code": code,
+                "country_name": name,
+                "africa_split": None,
+                "region": REGIONS[region],
+                "region_code": region,
+            }
+            for code, name, region, *_ in self.countries
+        ]
+
+    def _aux_regions(self):
+        return [
+            {"region_code": code, "region": name, "grouping_type": "region"}
+            for code, name in sorted(REGIONS.items())
+        ]
+
+    def _aux_cpi(self):
+        return [
+            {
+                "country_code": code,
+                "data_level": "national",
+                "year": year,
+                "cpi": 0.6 + 0.02 * (year - YEARS[0]),
+            }
+            for code, *_ in self.countries
+            for year in self.years
+        ]
+
+    def _aux_gdp(self):
+        return [
+            {
+                "country_code": code,
+                "data_level": "national",
+                "year": year,
+                "gdp": mean * 365 * 2.1 * 1.02 ** (year - 2010),
+            }
+            for code, _, _, mean, *_ in self.countries
+            for year in self.years
+        ]
+
+    def _aux_pop(self):
+        return [
+            {
+                "country_code": code,
+                "data_level": "national",
+                "year": year,
+                "pop": pop * 1.01 ** (year - 2010),
+            }
+            for code, *_, pop in self.countries
+            for year in self.years
+        ]
+
+    def _aux_dictionary(self):
+        row = make_pip_row(self.countries[0], self.years[0])
+        return [
+            {
+                "variable": name,
+                "definition": name.replace("_", " ").capitalize(),
+                "type": type(value).__name__,
+            }
+            for name, value in row.items()
+        ]
+
+
+class StubKeyValueStore:
+    """
+    In-memory stand-in for a remote key-value store.
+
+    It implements the part of the redis-py client that RemoteBackend uses:
+    ``get``, ``set`` with an expiry in seconds, ``delete`` and
+    ``scan_iter``. Keys and values come back as bytes, as they do from
+    redis-py, and ``calls`` counts the calls per method.
+    """
+
+    def __init__(self):
+        self.calls = Counter()
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            self.calls["get"] += 1
+            stored = self._live(name)
+            return stored[0] if stored is not None else None
+
+    def set(self, name, value, ex=None):
+        deadline = time.monotonic() + ex if ex is not None else None
+        with self._lock:
+            self.calls["set"] += 1
+            self._values[name.encode()] = (bytes(value), deadline)
+        return True
+
+    def delete(self, *names):
+        with self._lock:
+            self.calls["delete"] += 1
+            return sum(
+                self._values.pop(name.encode(), None) is not None
+                for name in names
+            )
+
+    def scan_iter(self, match=None):
+        with self._lock:
+            self.calls["scan_iter"] += 1
+            names = [
+                name
+                for name in list(self._values)
+                if self._live(name.decode()) is not None
+            ]
+        for name in names:
+            if match is None or fnmatch.fnmatchcase(name.decode(), match):
+                yield name
+
+    def ttl(self, name):
+        """Seconds until ``name`` expires; -1 if it never does, -2 if gone."""
+        with self._lock:
+            stored = self._live(name)
+        if stored is None:
+            return -2
+        if stored[1] is None:
+            return -1
+        return math.ceil(stored[1] - time.monotonic())
+
+    def _live(self, name):
+        stored = self._values.get(name.encode())
+        if stored is not None and stored[1] is not None:
+            if time.monotonic() >= stored[1]:
+                del self._values[name.encode()]
+                return None
+        return stored
+
+
+def _http_date(release):
+    """Format a ``YYYYMMDD`` release as an HTTP date."""
+    released = datetime.strptime(release, "%Y%m%d").replace(
+        tzinfo=timezone.utc
+    )
+    return format_datetime(released, usegmt=True)
+
+
+def _to_arrow(rows):
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    table = pa.Table.from_pylist(rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _to_csv(rows):
+    if not rows:
+        return ""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
@@ -0,0 +1,281 @@
+"""
+Recording and replaying API responses.
+
+In record mode every response pippy receives is saved to a cassette
+directory, one gzip-compressed JSON file per request, keyed on the
+canonical request: the URL path and the sorted query parameters (plus any
+conditional request headers). The host isn't part of the key, so a
+cassette recorded from one server replays for any base URL.
+
+In replay mode responses are served from the cassette without any network
+access, after an optional simulated latency; a request that wasn't recorded
+raises ReplayMissError. This makes runs deterministic and lets the client's
+own overhead be measured separately from the API's latency:
+
+    from pippy import transport
+
+    with transport.cassette("tests/cassettes/alb", mode="record"):
+        pippy.get_stats(country="ALB")
+
+    with transport.cassette("tests/cassettes/alb", latency=0.05):
+        pippy.get_stats(country="ALB")  # served from the cassette
+
+Both modes work by mounting a requests transport adapter on the shared
+session (see pippy.session.mount_adapter), so every pippy function is
+covered.
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+import urllib3
+
+from .exceptions import ReplayMissError
+from .session import mount_adapter
+
+PREFIXES = ("http://", "https://")
+
+# Request headers that change the response and so are part of the key.
+_KEYED_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+# Response headers that describe the transfer rather than the content;
+# bodies are stored decoded.
+_DROPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class Cassette:
+    """
+    A directory of recorded responses.
+
+    Args:
+        path (str or Path): The directory; created when the first response
+            is recorded.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._loaded = {}
+
+    def key(self, request):
+        """
+        The canonical key of a prepared request.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+
+        Returns:
+            str: A hex digest identifying the request.
+        """
+        parts = urlsplit(request.url)
+        canonical = {
+            "method": request.method,
+            "path": parts.path.rstrip("/"),
+            "params": sorted(parse_qsl(parts.query, keep_blank_values=True)),
+            "headers": {
+                name: request.headers[name]
+                for name in _KEYED_HEADERS
+                if name in request.headers
+            },
+        }
+        encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _file(self, key):
+        return self.path / f"{key}.json.gz"
+
+    def save(self, request, response, body):
+        """Record the response to a request, replacing any earlier one."""
+        key = self.key(request)
+        record = {
+            "url": request.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in _DROPPED_HEADERS
+            },
+            "body": base64.b64encode(body).decode("ascii"),
+        }
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self._file(key)
+        temp = path.with_name(
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with gzip.open(temp, "wt", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(temp, path)
+        with self._lock:
+            self._loaded[key] = record
+
+    def load(self, request):
+        """
+        Get the recorded response to a request.
+
+        Returns:
+            dict or None: The recorded status, reason, headers and body, or
+                None if the request wasn't recorded.
+        """
+        key = self.key(request)
+        with self._lock:
+            record = self._loaded.get(key)
+        if record is not None:
+            return record
+        try:
+            with gzip.open(self._file(key), "rt", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        record["body"] = base64.b64decode(record["body"])
+        with self._lock:
+            self._loaded[key] = record
+        return record
+
+    def __len__(self):
+        return len(list(self.path.glob("*.json.gz")))
+
+
+class RecordingAdapter(requests.adapters.HTTPAdapter):
+    """
+    Transport adapter that sends requests over the network and records the
+    responses in a cassette.
+
+    Args:
+        cassette (Cassette): Where to record the responses.
+        **kwargs: Passed to ``requests.adapters.HTTPAdapter``.
+    """
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, stream=False, **kwargs):
+        response = super().send(request, stream=stream, **kwargs)
+        body = response.content
+        self.cassette.save(request, response, body)
+        # The body has been read; let streaming callers read it again.
+        response.raw = io.BytesIO(body)
+        return response
+
+
+class ReplayAdapter(requests.adapters.HTTPAdapter):
+    """
+    Transport adapter that answers requests from a cassette without
+    touching the network.
+
+    Args:
+        cassette (Cassette): The recorded responses.
+        latency (float or callable): Seconds to wait before answering, or a
+            function of the prepared request returning them. Defaults to 0.
+    """
+
+    def __init__(self, cassette, latency=0.0):
+        super().__init__()
+        self.cassette = cassette
+        self.latency = latency
+
+    def send(self, request, stream=False, **kwargs):
+        record = self.cassette.load(request)
+        if record is None:
+            raise ReplayMissError(
+                f"No recorded response for {request.method} {request.url}"
+            )
+        latency = (
+            self.latency(request) if callable(self.latency) else self.latency
+        )
+        if latency:
+            time.sleep(latency)
+        body = record["body"]
+        headers = dict(record["headers"], **{"Content-Length": len(body)})
+        raw = urllib3.HTTPResponse(
+            body=io.BytesIO(body),
+            headers={k: str(v) for k, v in headers.items()},
+            status=record["status"],
+            reason=record["reason"],
+            preload_content=False,
+            decode_content=False,
+        )
+        return self.build_response(request, raw)
+
+
+def record(path):
+    """
+    Record every response pippy receives from now on.
+
+    Args:
+        path (str or Path): The cassette directory.
+
+    Returns:
+        RecordingAdapter: The mounted adapter.
+    """
+    adapter = RecordingAdapter(Cassette(path))
+    _mount(adapter)
+    return adapter
+
+
+def replay(path, latency=0.0):
+    """
+    Answer every request from recorded responses from now on.
+
+    Args:
+        path (str or Path): The cassette directory.
+        latency (float or callable): Simulated latency in seconds, or a
+            function of the prepared request returning it. Defaults to 0.
+
+    Returns:
+        ReplayAdapter: The mounted adapter.
+    """
+    adapter = ReplayAdapter(Cassette(path), latency)
+    _mount(adapter)
+    return adapter
+
+
+def stop():
+    """Go back to sending requests over the network."""
+    for prefix in PREFIXES:
+        mount_adapter(prefix, None)
+
+
+@contextmanager
+def cassette(path, mode="replay", latency=0.0):
+    """
+    Record or replay responses within a ``with`` block.
+
+    Args:
+        path (str or Path): The cassette directory.
+        mode (str): 'record' or 'replay'. Defaults to 'replay'.
+        latency (float or callable): Simulated latency when replaying.
+            Defaults to 0.
+
+    Yields:
+        Cassette: The cassette in use.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+    if mode == "record":
+        adapter = record(path)
+    elif mode == "replay":
+        adapter = replay(path, latency)
+    else:
+        raise ValueError(f"Unknown mode {mode!r}; use 'record' or 'replay'")
+    try:
+        yield adapter.cassette
+    finally:
+        stop()
+
+
+def _mount(adapter):
+    for prefix in PREFIXES:
+        mount_adapter(prefix, adapter)
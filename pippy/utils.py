@@ -1,6 +1,16 @@
-import requests
-from .exceptions import PIPAPIError
-from .server import current_server
+import threading
+import time
+from .cache import cache_response, get_cached_response, server_slug
+from .constants import RELEASE_RETRY_INTERVAL, RELEASE_TTL
+from .exceptions import CircuitOpenError, PIPAPIError
+from .server import get_base_url
+from .lazy import LazyModule
+from .session import http_get
+
+requests = LazyModule("requests")
+
+_release_lock = threading.Lock()
+_releases = {}
 
 
 def check_api_status():
@@ -10,16 +20,17 @@ def check_api_status():
     Returns:
         dict: A dictionary with the status of each endpoint.
     """
+    base_url = get_base_url(check=False)
     endpoints = {
-        "pip": f"{current_server}/pip",
-        "pip-info": f"{current_server}/pip-info",
-        "health-check": f"{current_server}/health-check",
+        "pip": f"{base_url}/pip",
+        "pip-info": f"{base_url}/pip-info",
+        "health-check": f"{base_url}/health-check",
     }
 
     status = {}
     for name, url in endpoints.items():
         try:
-            response = requests.get(url)
+            response = http_get(url)
             if (
                 response.status_code == 200
                 and not response.text.strip().startswith("<html>")
@@ -29,6 +40,8 @@ def check_api_status():
                 status[name] = f"Error (Status: {response.status_code})"
         except requests.RequestException:
             status[name] = "Connection Error"
+        except CircuitOpenError:
+            status[name] = "Circuit Open"
 
     return status
 
@@ -47,7 +60,7 @@ def check_api(api_version="v1"):
         PIPAPIError: If the API health check fails.
     """
     try:
-        response = requests.get(f"{current_server}/health-check")
+        response = http_get(f"{get_base_url(check=False)}/health-check")
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
@@ -68,7 +81,7 @@ def get_versions(api_version="v1"):
         PIPAPIError: If the request to retrieve versions fails.
     """
     try:
-        response = requests.get(f"{current_server}/versions")
+        response = http_get(f"{get_base_url()}/versions")
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
@@ -89,8 +102,68 @@ def get_pip_info(api_version="v1"):
         PIPAPIError: If the request to retrieve PIP info fails.
     """
     try:
-        response = requests.get(f"{current_server}/pip-info")
+        response = http_get(f"{get_base_url()}/pip-info")
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
         raise PIPAPIError(f"Failed to retrieve PIP info: {str(e)}")
+
+
+def get_current_release(ppp_version=None):
+    """
+    Get the latest release version published by the current server.
+
+    The answer is kept in memory for RELEASE_TTL seconds, so the versions
+    endpoint is queried at most once per period. The last answer is also
+    written to the cache and used if the server can't be reached; the
+    server is then asked again after RELEASE_RETRY_INTERVAL seconds.
+
+    Args:
+        ppp_version (str, optional): Only consider releases for this PPP
+            version.
+
+    Returns:
+        str: The latest release version, e.g. ``"20240627"``.
+
+    Raises:
+        PIPAPIError: If no release is known and the versions can't be
+            retrieved.
+    """
+    base_url = get_base_url(check=False)
+    lookup = (base_url, ppp_version)
+    with _release_lock:
+        known = _releases.get(lookup)
+    if known is not None and time.monotonic() - known[1] < RELEASE_TTL:
+        if known[0] is None:
+            raise PIPAPIError(
+                "Failed to resolve the current release; retrying in at "
+                f"most {RELEASE_RETRY_INTERVAL} seconds"
+            )
+        return known[0]
+
+    key = f"releases/{server_slug(base_url)}/{ppp_version or 'all'}"
+    try:
+        release = max(
+            v["release_version"]
+            for v in get_versions()
+            if ppp_version is None
+            or str(v.get("ppp_version")) == str(ppp_version)
+        )
+    except (PIPAPIError, KeyError, TypeError, ValueError) as e:
+        release = known[0] if known is not None else None
+        if release is None:
+            release = get_cached_response(key)
+        # Every cache key needs the release, and the failed lookup may have
+        # waited on health checks and retries, so keep its outcome (a stale
+        # release or the failure) for RELEASE_RETRY_INTERVAL seconds.
+        resolved_at = time.monotonic() - RELEASE_TTL + RELEASE_RETRY_INTERVAL
+        with _release_lock:
+            _releases[lookup] = (release, resolved_at)
+        if release is None:
+            raise PIPAPIError(f"Failed to resolve the current release: {e}")
+        return release
+
+    cache_response(key, release, None)
+    with _release_lock:
+        _releases[lookup] = (release, time.monotonic())
+    return release
@@ -0,0 +1,132 @@
+"""
+Wire formats of API responses.
+
+The data endpoints answer in JSON by default. With ``format="arrow"`` they
+send an Arrow IPC file instead: the columns arrive as typed buffers, so the
+DataFrame is built from them directly rather than by parsing text into
+Python records and assembling those row by row.
+
+Arrow is only requested when pyarrow is installed and the server hasn't
+turned it down before; otherwise the query is sent as JSON. A server that
+answers ``format=arrow`` with one of ARROW_FALLBACK_STATUSES, or with a 400
+or 422 whose body names the ``format`` parameter, is remembered for the rest
+of the process. Other client errors are left to the caller, so a bad country
+or year doesn't turn Arrow off.
+"""
+
+import re
+import threading
+from .cache import _pyarrow
+from .constants import ARROW_FALLBACK_STATUSES, ARROW_REJECTION_STATUSES
+from .logger import pippy_logger
+from .schema import apply_schema
+from .server import get_base_url
+
+ARROW_CONTENT_TYPES = (
+    "application/vnd.apache.arrow.file",
+    "application/vnd.apache.arrow.stream",
+)
+
+_lock = threading.Lock()
+_no_arrow = set()
+_FORMAT_PARAM = re.compile(r"\bformat\b", re.IGNORECASE)
+
+
+def wire_params(params):
+    """
+    The query params to send for a query.
+
+    ``format=arrow`` becomes ``format=json`` if pyarrow isn't installed or
+    the current server doesn't serve Arrow.
+
+    Args:
+        params (dict): The query params.
+
+    Returns:
+        dict: ``params``, or a copy asking for JSON.
+    """
+    if params.get("format") != "arrow":
+        return params
+    if _pyarrow() is None:
+        pippy_logger.debug("pyarrow is not installed; requesting JSON")
+        return dict(params, format="json")
+    with _lock:
+        unsupported = get_base_url(check=False) in _no_arrow
+    if unsupported:
+        return dict(params, format="json")
+    return params
+
+
+def arrow_rejected(params, response):
+    """
+    Whether the server turned down a ``format=arrow`` request.
+
+    That is a 406 or 415, or a 400 or 422 whose body names the ``format``
+    parameter; other errors are about the query and are not retried. If it
+    did, the server is remembered, so later queries ask for JSON
+    straight away.
+
+    Args:
+        params (dict): The query params that were sent.
+        response (requests.Response): The server's answer.
+
+    Returns:
+        bool: True if the request should be repeated as JSON.
+    """
+    if params.get("format") != "arrow":
+        return False
+    status = response.status_code
+    if status in ARROW_REJECTION_STATUSES:
+        if not _FORMAT_PARAM.search(response.text):
+            return False
+    elif status not in ARROW_FALLBACK_STATUSES:
+        return False
+    with _lock:
+        _no_arrow.add(get_base_url(check=False))
+    pippy_logger.info("The server does not serve Arrow; falling back to JSON")
+    return True
+
+
+def is_arrow(response):
+    """Whether a response body is an Arrow IPC file or stream."""
+    content_type = response.headers.get("Content-Type", "")
+    return content_type.split(";")[0].strip() in ARROW_CONTENT_TYPES
+
+
+def read_arrow(body):
+    """
+    Decode an Arrow IPC body into a table.
+
+    The table's buffers point into ``body``; nothing is copied or parsed.
+
+    Args:
+        body (bytes): An Arrow IPC file or stream.
+
+    Returns:
+        pyarrow.Table: The decoded table.
+
+    Raises:
+        ValueError: If the body isn't valid Arrow IPC data.
+    """
+    pa = _pyarrow()
+    buffer = pa.py_buffer(body)
+    if body[:6] == b"ARROW1":
+        return pa.ipc.open_file(buffer).read_all()
+    return pa.ipc.open_stream(buffer).read_all()
+
+
+def frame_from_arrow(table, schema=None):
+    """
+    Build a DataFrame from a decoded Arrow table, applying ``schema``.
+
+    Each column is converted from its Arrow buffer in one pass.
+
+    Args:
+        table (pyarrow.Table): The table.
+        schema (dict, optional): Column dtypes to apply.
+
+    Returns:
+        pandas.DataFrame: The table as a DataFrame.
+    """
+    df = table.to_pandas()
+    return apply_schema(df, schema) if schema else df
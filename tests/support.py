@@ -0,0 +1,81 @@
+"""
+Fixtures shared by the test modules.
+
+temporary_cache() points pippy's cache at an empty temporary directory and
+stub_server() points pippy at a running StubPIPServer; TempCacheMixin and
+StubServerMixin set them up around each test of a unittest.TestCase.
+"""
+
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from pippy import cache, configure_cache, set_server
+from pippy.cache import memory_cache
+from pippy.server import get_base_url
+from pippy.testing import StubPIPServer
+
+
+@contextmanager
+def temporary_cache():
+    """
+    Use an empty cache in a temporary directory, then restore the cache
+    configuration. Yields the directory.
+    """
+    previous = (cache.CACHE_DIR, cache.CACHE_MAX_BYTES, cache.CACHE_LOCKING)
+    backend = cache.CACHE_BACKEND
+    with tempfile.TemporaryDirectory() as directory:
+        configure_cache(directory)
+        try:
+            yield Path(directory)
+        finally:
+            configure_cache(*previous, backend=backend)
+            memory_cache.clear()
+
+
+@contextmanager
+def stub_server(lazy=False, **options):
+    """
+    Run a StubPIPServer and point pippy at it, health-checking it unless
+    ``lazy``. Yields the server.
+    """
+    original = get_base_url(check=False)
+    with StubPIPServer(**options) as stub:
+        set_server(stub.url, lazy=lazy)
+        try:
+            yield stub
+        finally:
+            set_server(original, lazy=True)
+
+
+def enter_context(test, context):
+    """
+    Enter ``context`` until ``test`` finishes, as TestCase.enterContext()
+    does from Python 3.11 on.
+    """
+    result = context.__enter__()
+    test.addCleanup(context.__exit__, None, None, None)
+    return result
+
+
+class TempCacheMixin:
+    """Give each test an empty cache in ``self.cache_dir``."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = enter_context(self, temporary_cache())
+
+
+class StubServerMixin(TempCacheMixin):
+    """
+    Also run each test against a fresh StubPIPServer, ``self.stub``, built
+    with the ``stub_options`` of the test case.
+    """
+
+    stub_options = {}
+    lazy_server = False
+
+    def setUp(self):
+        super().setUp()
+        self.stub = enter_context(
+            self, stub_server(self.lazy_server, **self.stub_options)
+        )
@@ -0,0 +1,97 @@
+import unittest
+import numpy as np
+import pandas as pd
+from pippy import aggregate_stats, get_aux, get_stats, get_wb
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+COMPARED = ["reporting_pop", "headcount", "poverty_gap", "watts", "mean"]
+
+
+class TestAggregateStats(StubServerMixin, unittest.TestCase):
+    def assert_matches_wb(self, local, povline=None):
+        wb = get_wb(povline=povline)
+        merged = wb.merge(
+            local, on=["region_code", "reporting_year"], suffixes=("", "_l")
+        )
+        self.assertEqual(len(merged), len(wb))
+        for column in COMPARED:
+            np.testing.assert_allclose(
+                merged[f"{column}_l"], merged[column], rtol=1e-9
+            )
+
+    def test_matches_wb_regions(self):
+        stats = get_stats(fill_gaps=True)
+        self.assert_matches_wb(aggregate_stats(stats, total="WLD"))
+
+    def test_population_from_aux(self):
+        stats = get_stats(fill_gaps=True).drop(columns="reporting_pop")
+        local = aggregate_stats(stats, pop=get_aux("pop"), total="WLD")
+        self.assert_matches_wb(local)
+
+    def test_several_poverty_lines(self):
+        stats = pd.concat(
+            [get_stats(fill_gaps=True, povline=p) for p in (2.15, 3.65)]
+        )
+        local = aggregate_stats(stats, total="WLD")
+        self.assertEqual(sorted(local["poverty_line"].unique()), [2.15, 3.65])
+        self.assert_matches_wb(
+            local[local["poverty_line"] == 3.65], povline=3.65
+        )
+
+    def test_custom_grouping(self):
+        stats = get_stats(fill_gaps=True, year=2015)
+        groups = {"BRA": "BIG", "IND": "BIG", "ALB": "SMALL", "ARM": "SMALL"}
+        local = aggregate_stats(stats, groups=groups)
+        self.assertEqual(list(local["group_code"]), ["BIG", "SMALL"])
+
+        members = stats[stats["country_code"].isin(["ALB", "ARM"])]
+        pop = members["reporting_pop"]
+        expected = (members["headcount"] * pop).sum() / pop.sum()
+        small = local[local["group_code"] == "SMALL"].iloc[0]
+        self.assertAlmostEqual(small["headcount"], expected)
+        self.assertAlmostEqual(small["reporting_pop"], pop.sum())
+        self.assertAlmostEqual(
+            small["pop_in_poverty"], (members["headcount"] * pop).sum()
+        )
+
+    def test_missing_values_are_skipped(self):
+        stats = get_stats(fill_gaps=True, year=2015, country="ALB,ARM")
+        stats.loc[stats["country_code"] == "ALB", "mean"] = np.nan
+        local = aggregate_stats(stats, groups={"ALB": "G", "ARM": "G"})
+        arm = stats[stats["country_code"] == "ARM"].iloc[0]
+        self.assertAlmostEqual(local["mean"].iloc[0], arm["mean"])
+        self.assertAlmostEqual(
+            local["reporting_pop"].iloc[0], stats["reporting_pop"].sum()
+        )
+
+    def test_national_rows_are_preferred(self):
+        stats = get_stats(fill_gaps=True, year=2015, country="ALB")
+        urban = stats.assign(reporting_level="urban", headcount=1.0)
+        local = aggregate_stats(
+            pd.concat([urban, stats], ignore_index=True), groups={"ALB": "G"}
+        )
+        self.assertEqual(len(local), 1)
+        self.assertAlmostEqual(
+            local["headcount"].iloc[0], stats["headcount"].iloc[0]
+        )
+
+    def test_missing_population(self):
+        stats = get_stats(fill_gaps=True, year=2015)
+        pop = get_aux("pop")
+        with self.assertRaises(PIPAPIError):
+            aggregate_stats(stats, pop=pop[pop["country_code"] != "ALB"])
+
+    def test_medians_are_not_averaged(self):
+        stats = get_stats(fill_gaps=True, year=2015)
+        self.assertIn("median", stats.columns)
+        self.assertNotIn("median", aggregate_stats(stats).columns)
+
+    def test_unknown_measure(self):
+        stats = get_stats(fill_gaps=True, year=2015)
+        with self.assertRaises(PIPAPIError):
+            aggregate_stats(stats, measures=["nonsense"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import time
+import unittest
+from pippy import (
+    aio,
+    get_stats_async,
+    get_wb_async,
+    get_countries_async,
+)
+from pippy.constants import ASYNC_CONCURRENCY
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+
+class TestAsyncAPI(StubServerMixin, unittest.IsolatedAsyncioTestCase):
+    async def test_get_stats_async(self):
+        df = await get_stats_async(country="ALB", use_cache=False)
+        self.assertGreater(len(df), 0)
+        self.assertTrue((df["country_code"] == "ALB").all())
+
+    async def test_get_wb_and_aux_async(self):
+        wb, countries = await asyncio.gather(
+            get_wb_async(year=2010), get_countries_async()
+        )
+        self.assertIn("WLD", set(wb["region_code"]))
+        self.assertGreater(len(countries), 0)
+
+    async def test_concurrency_is_bounded(self):
+        self.stub.delay = 0.1
+        semaphore = asyncio.Semaphore(4)
+        frames = await asyncio.gather(
+            *(
+                get_stats_async(
+                    country="ALB",
+                    year=year,
+                    fill_gaps=True,
+                    use_cache=False,
+                    semaphore=semaphore,
+                )
+                for year in range(2000, 2016)
+            )
+        )
+        self.assertEqual(len(frames), 16)
+        self.assertEqual(self.stub.max_in_flight, 4)
+
+    async def test_semaphore_is_not_capped_by_the_pool(self):
+        aio.configure_async(max_concurrency=2)
+        self.addCleanup(aio.configure_async, ASYNC_CONCURRENCY)
+        self.stub.delay = 0.1
+        semaphore = asyncio.Semaphore(6)
+        await asyncio.gather(
+            *(
+                get_stats_async(
+                    country="ALB",
+                    year=year,
+                    use_cache=False,
+                    semaphore=semaphore,
+                )
+                for year in range(2000, 2012)
+            )
+        )
+        self.assertEqual(self.stub.max_in_flight, 6)
+
+    async def test_event_loop_is_not_blocked(self):
+        self.stub.delay = 0.2
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await get_stats_async(country="ALB", use_cache=False)
+        elapsed = time.perf_counter() - start
+        task.cancel()
+        self.assertGreater(ticks, elapsed / 0.01 / 2)
+
+    async def test_errors_propagate(self):
+        with self.assertRaises(PIPAPIError):
+            await get_stats_async(country="INVALID", use_cache=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+from pippy import (
+    auxiliary,
+    get_aux,
+    get_aux_indexed,
+    get_countries,
+    get_country_lookup,
+    get_gdp,
+    get_stats,
+    get_stats_many,
+)
+from pippy.cache import invalidate, memory_cache
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin, temporary_cache
+
+
+class TestAuxCache(StubServerMixin, unittest.TestCase):
+    def test_tables_are_cached(self):
+        first = get_countries()
+        self.assertEqual(self.stub.count("/aux"), 1)
+        second = get_countries()
+        self.assertEqual(self.stub.count("/aux"), 1)
+        self.assertTrue(first.equals(second))
+
+    def test_tables_are_cached_on_disk(self):
+        get_gdp()
+        memory_cache.clear()
+        get_gdp()
+        self.assertEqual(self.stub.count("/aux"), 1)
+
+    def test_use_cache_false(self):
+        get_countries()
+        get_countries(use_cache=False)
+        self.assertEqual(self.stub.count("/aux"), 2)
+
+    def test_releases_are_cached_separately(self):
+        get_countries()
+        self.stub.release = "20250101"
+        get_countries(release_version="20250101")
+        self.assertEqual(self.stub.count("/aux"), 2)
+
+    def test_cached_frame_is_protected(self):
+        df = get_countries()
+        df.loc[0, "country_code"] = "XXX"
+        self.assertNotEqual(get_countries().loc[0, "country_code"], "XXX")
+
+    def test_table_list_errors(self):
+        self.stub.down = True
+        with self.assertRaises(PIPAPIError):
+            get_aux()
+
+    def test_country_lookup(self):
+        regions = get_country_lookup()
+        self.assertEqual(regions["ALB"], "ECA")
+        names = get_country_lookup("country_name")
+        self.assertEqual(names["BRA"], "Brazil")
+        self.assertIs(get_country_lookup(), regions)
+        self.assertEqual(self.stub.count("/aux"), 1)
+        with self.assertRaises(TypeError):
+            regions["ALB"] = "SSA"
+        with self.assertRaises(PIPAPIError):
+            get_country_lookup("nonsense")
+
+    def test_lookups_follow_their_table(self):
+        regions = get_country_lookup()
+        invalidate(
+            auxiliary._aux_cache_key({"table": "countries", "format": "json"})
+        )
+        self.assertIsNot(get_country_lookup(), regions)
+        self.assertEqual(self.stub.count("/aux"), 2)
+        with temporary_cache():
+            get_country_lookup()
+            self.assertEqual(self.stub.count("/aux"), 3)
+            # Lookups of tables that left the cache are dropped.
+            self.assertEqual(len(auxiliary._derived), 1)
+
+    def test_indexed_table(self):
+        gdp = get_aux_indexed("gdp")
+        self.assertEqual(gdp.index.names, ["country_code", "year"])
+        self.assertTrue(gdp.index.is_monotonic_increasing)
+        raw = get_gdp()
+        expected = raw[(raw["country_code"] == "ALB") & (raw["year"] == 2015)][
+            "gdp"
+        ].iloc[0]
+        self.assertEqual(gdp.loc[("ALB", 2015), "gdp"], expected)
+        get_aux_indexed("gdp")
+        self.assertEqual(self.stub.count("/aux"), 1)
+
+    def test_enrich(self):
+        df = get_stats(country="ALB,BRA", enrich=True)
+        gdp = get_aux_indexed("gdp")
+        self.assertIn("gdp", df.columns)
+        self.assertIn("cpi_aux", df.columns)
+        for _, row in df.iterrows():
+            self.assertEqual(
+                row["gdp"],
+                gdp.loc[(row["country_code"], row["reporting_year"]), "gdp"],
+            )
+        requests = self.stub.count("/aux")
+        get_stats(country="ALB", enrich="gdp")
+        self.assertEqual(self.stub.count("/aux"), requests)
+
+    def test_enrich_many(self):
+        data, failures = get_stats_many(
+            [{"country": c, "enrich": "pop"} for c in ("ALB", "BRA", "AGO")]
+        )
+        self.assertEqual(failures, [])
+        self.assertFalse(data["pop"].isna().any())
+        self.assertEqual(self.stub.count("/aux"), 1)
+
+    def test_enrich_needs_country_rows(self):
+        with self.assertRaises(PIPAPIError):
+            get_stats(group_by="wb", enrich=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import pandas as pd
+from pippy import get_stats, get_stats_many
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+
+class TestGetStatsMany(StubServerMixin, unittest.TestCase):
+    def test_results_are_tagged_with_query_id(self):
+        queries = [("ALB", 2001), ("AGO", 2002, 3.65), {"country": "BRA"}]
+        data, failures = get_stats_many(queries, max_workers=3)
+        self.assertEqual(failures, [])
+        self.assertEqual(set(data["query_id"]), {0, 1, 2})
+        self.assertTrue(
+            (data.loc[data["query_id"] == 1, "poverty_line"] == 3.65).all()
+        )
+        self.assertTrue(
+            (data.loc[data["query_id"] == 2, "country_code"] == "BRA").all()
+        )
+
+    def test_failures_do_not_abort_the_batch(self):
+        queries = [("ALB", 2001), ("INVALID", 2001), ("ALB", 9999)]
+        result = get_stats_many(queries)
+        self.assertEqual(set(result.data["query_id"]), {0})
+        self.assertEqual([f.query_id for f in result.failures], [1, 2])
+        self.assertEqual(result.failures[0].query["country"], "INVALID")
+        self.assertIsInstance(result.failures[0].error, PIPAPIError)
+
+    def test_cached_queries_skip_the_network(self):
+        get_stats(country="ALB", year=2001)
+        self.stub.reset()
+        result = get_stats_many([("ALB", 2001), ("AGO", 2002)])
+        self.assertEqual(len(result.failures), 0)
+        self.assertEqual(self.stub.count("/pip"), 1)
+        self.assertEqual(self.stub.requests[-1][1]["country"], "AGO")
+
+    def test_requests_run_concurrently(self):
+        self.stub.delay = 0.1
+        get_stats_many(
+            [("ALB", year) for year in range(2000, 2008)], max_workers=4
+        )
+        self.assertEqual(self.stub.max_in_flight, 4)
+
+    def test_empty_results_keep_dtypes(self):
+        expected = get_stats(country="ALB").dtypes
+        queries = [("CHN", 2010), ("ALB",), ("AGO",)]
+        # The second run answers the empty query from the negative cache.
+        for _ in range(2):
+            data, failures = get_stats_many(queries)
+            self.assertEqual(failures, [])
+            pd.testing.assert_series_equal(
+                data.drop(columns="query_id").dtypes, expected
+            )
+
+    def test_all_failed(self):
+        result = get_stats_many([("INVALID", 2001)])
+        self.assertEqual(len(result.data), 0)
+        self.assertIn("query_id", result.data.columns)
+        self.assertEqual(len(result.failures), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
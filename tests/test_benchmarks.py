@@ -0,0 +1,66 @@
+import copy
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from benchmarks import bench
+
+
+class TestBenchmarks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.report = bench.run(size="quick", repeat=1)
+
+    def test_every_benchmark_runs(self):
+        results = self.report["results"]
+        for name in (
+            "get_stats_cold",
+            "get_stats_cold_arrow",
+            "get_stats_warm_disk",
+            "get_stats_warm_memory",
+            "parse_json",
+            "parse_csv",
+            "build_frame",
+            "parse_arrow",
+            "build_frame_arrow",
+            "cache_write",
+            "cache_read",
+            "fanout",
+        ):
+            self.assertIn(name, results)
+            self.assertGreater(results[name]["median"], 0)
+        self.assertLess(
+            results["get_stats_warm_memory"]["median"],
+            results["get_stats_cold"]["median"],
+        )
+        self.assertEqual(self.report["meta"]["size"], "quick")
+
+    def test_compare_flags_regressions(self):
+        slower = copy.deepcopy(self.report)
+        slower["results"]["parse_json"]["median"] *= 1.5
+        slower["results"]["cache_read"]["median"] *= 0.5
+        statuses = {
+            row[0]: row[4] for row in bench.compare(self.report, slower)
+        }
+        self.assertEqual(statuses["parse_json"], "regression")
+        self.assertEqual(statuses["cache_read"], "improvement")
+        self.assertEqual(statuses["fanout"], "ok")
+
+    def test_command_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = Path(directory) / "baseline.json"
+            current = Path(directory) / "current.json"
+            baseline.write_text(json.dumps(self.report))
+            slower = copy.deepcopy(self.report)
+            slower["results"]["fanout"]["median"] *= 2
+            current.write_text(json.dumps(slower))
+            self.assertEqual(
+                bench.main(["compare", str(baseline), str(baseline)]), 0
+            )
+            self.assertEqual(
+                bench.main(["compare", str(baseline), str(current)]), 1
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
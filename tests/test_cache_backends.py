@@ -0,0 +1,327 @@
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import pandas as pd
+from pippy import cache, configure_cache, get_aux, get_stats
+from pippy.backends import MemoryBackend, RemoteBackend, SQLiteBackend
+from pippy.cache import memory_cache
+from pippy.constants import CACHE_LOCK_STALE, STALE_GRACE_HOURS
+from pippy.testing import StubKeyValueStore
+from support import TempCacheMixin, stub_server
+
+KEYS = [f"stats/stress/{i}" for i in range(4)]
+
+
+def frame(rows=50):
+    return pd.DataFrame({"x": range(rows), "y": [0.5] * rows})
+
+
+def hammer(path, worker, rounds):
+    """Write and read the same keys as every other worker."""
+    cache.configure_cache(backend=SQLiteBackend(path))
+    problems = []
+    for i in range(rounds):
+        key = KEYS[i % len(KEYS)]
+        rows = 50 + (worker * 7 + i) % 200
+        df = pd.DataFrame({"worker": [worker] * rows, "i": range(rows)})
+        cache.cache_frame(key, df)
+        memory_cache.clear()
+        for other in KEYS:
+            entry = cache.get_cached_entry(other)
+            if entry is not None and (
+                list(entry.data["i"]) != list(range(len(entry.data)))
+                or entry.data["worker"].nunique() != 1
+            ):
+                problems.append(f"torn frame for {other}")
+    return problems
+
+
+class BackendTestCase(TempCacheMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        configure_cache(max_bytes=10**9)
+
+
+class TestBackends(BackendTestCase):
+    def backends(self):
+        store = StubKeyValueStore()
+        return {
+            "memory": MemoryBackend(),
+            "sqlite": SQLiteBackend(self.cache_dir / "shared.sqlite3"),
+            "remote": RemoteBackend(store),
+        }
+
+    def test_get_stats_and_get_aux(self):
+        with stub_server() as stub:
+            for name, backend in self.backends().items():
+                with self.subTest(backend=name):
+                    configure_cache(backend=backend)
+                    stats = get_stats(country="ALB")
+                    countries = get_aux("countries")
+                    requests = len(stub.requests)
+                    memory_cache.clear()
+                    pd.testing.assert_frame_equal(
+                        get_stats(country="ALB"), stats
+                    )
+                    pd.testing.assert_frame_equal(
+                        get_aux("countries"), countries
+                    )
+                    self.assertEqual(len(stub.requests), requests)
+                    info = cache.cache_info()
+                    self.assertEqual(info["backend"], name)
+                    self.assertEqual(info["hit_ratio"], 0.5)
+        # Nothing but the SQLite database was written to the directory.
+        for path in self.cache_dir.iterdir():
+            self.assertTrue(path.name.startswith("shared.sqlite3"), path)
+
+    def test_entries_round_trip(self):
+        for name, backend in self.backends().items():
+            with self.subTest(backend=name):
+                configure_cache(backend=backend)
+                cache.cache_frame("stats/a", frame())
+                cache.cache_response("release", {"version": "20240627"})
+                cache.cache_not_found("stats/b", "No data")
+                memory_cache.clear()
+                self.assertTrue(cache.is_cached("stats/a"))
+                pd.testing.assert_frame_equal(
+                    cache.get_cached_frame("stats/a"), frame()
+                )
+                self.assertEqual(
+                    cache.get_cached_response("release"),
+                    {"version": "20240627"},
+                )
+                self.assertEqual(
+                    cache.get_cached_not_found("stats/b"), "No data"
+                )
+                cache.invalidate("stats/a")
+                cache.invalidate("stats/b")
+                self.assertIsNone(cache.get_cached_frame("stats/a"))
+                self.assertIsNone(cache.get_cached_not_found("stats/b"))
+
+    def test_expired_entries(self):
+        for name, backend in self.backends().items():
+            with self.subTest(backend=name):
+                configure_cache(backend=backend)
+                cache.cache_frame("stale", frame(), expiry_hours=-1)
+                memory_cache.clear()
+                self.assertFalse(cache.is_cached("stale"))
+                entry = cache.get_cached_entry("stale")
+                self.assertFalse(entry.fresh)
+                pd.testing.assert_frame_equal(entry.data, frame())
+
+    def test_renew_entry(self):
+        backends = dict(self.backends(), filesystem=cache.FilesystemBackend())
+        for name, backend in backends.items():
+            with self.subTest(backend=name):
+                configure_cache(backend=backend)
+                cache.cache_frame("stats/a", frame(), -1, {"etag": '"1"'})
+                self.assertTrue(
+                    cache.renew_entry("stats/a", 1, {"etag": '"2"'})
+                )
+                self.assertTrue(cache.is_cached("stats/a"))
+                memory_cache.clear()
+                self.assertTrue(cache.is_cached("stats/a"))
+                entry = cache.get_cached_entry("stats/a")
+                self.assertTrue(entry.fresh)
+                self.assertEqual(entry.validators, {"etag": '"2"'})
+                pd.testing.assert_frame_equal(entry.data, frame())
+                # Metadata that outgrows its slot needs a full write.
+                etag = '"' + "x" * 300 + '"'
+                self.assertFalse(
+                    cache.renew_entry("stats/a", 1, {"etag": etag})
+                )
+                self.assertFalse(cache.renew_entry("stats/missing"))
+
+    def test_corrupt_entries_are_misses(self):
+        backend = SQLiteBackend(self.cache_dir / "cache.sqlite3")
+        configure_cache(backend=backend)
+        backend.set("stats/a", b"ARROW1\x00\x00", cache._expiry(1))
+        backend.set("stats/b", b'{"data": [1, ', cache._expiry(1))
+        self.assertIsNone(cache.get_cached_entry("stats/a"))
+        self.assertIsNone(cache.get_cached_response("stats/b"))
+        self.assertEqual(list(backend.entries()), [])
+
+
+class TestSelection(BackendTestCase):
+    def test_by_name(self):
+        configure_cache(backend="sqlite")
+        self.assertIsInstance(cache.get_backend(), SQLiteBackend)
+        cache.cache_frame("stats/a", frame())
+        self.assertTrue((self.cache_dir / "cache.sqlite3").exists())
+        # Backends chosen by name follow the cache directory.
+        other = tempfile.TemporaryDirectory()
+        self.addCleanup(other.cleanup)
+        configure_cache(other.name)
+        self.assertIsNone(cache.get_cached_frame("stats/a"))
+        configure_cache(backend="memory")
+        self.assertEqual(cache.cache_info()["directory"], "memory")
+
+    def test_invalid_name(self):
+        with self.assertRaises(ValueError):
+            configure_cache(backend="floppy")
+
+    def test_environment_variable(self):
+        env = dict(
+            os.environ,
+            PIPPY_CACHE_DIR=str(self.cache_dir),
+            PIPPY_CACHE_BACKEND="sqlite",
+        )
+        output = subprocess.run(
+            [sys.executable, "-m", "pippy.cache", "info"],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        ).stdout
+        self.assertIn("backend: sqlite", output)
+        self.assertIn(str(self.cache_dir / "cache.sqlite3"), output)
+
+
+class TestSQLiteBackend(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = self.cache_dir / "cache.sqlite3"
+        self.backend = SQLiteBackend(self.path)
+        configure_cache(backend=self.backend)
+
+    def test_wal_mode(self):
+        cache.cache_frame("stats/a", frame())
+        connection = cache.get_backend()._connection()
+        mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_cleanup_and_eviction(self):
+        cache.cache_frame("fresh", frame())
+        cache.cache_frame(
+            "gone", frame(), expiry_hours=-(STALE_GRACE_HOURS + 1)
+        )
+        self.assertEqual(cache.cleanup()["expired"], 1)
+        cache.cache_frame("newer", frame())
+        backend = cache.get_backend()
+        backend._connection().execute(
+            "UPDATE entries SET accessed = accessed - 100 WHERE key = 'fresh'"
+        )
+        size = next(backend.entries()).size
+        result = cache.cleanup(max_bytes=size)
+        self.assertEqual(result["evicted"], 1)
+        self.assertEqual([e.key for e in backend.entries()], ["newer"])
+
+    def test_purge(self):
+        cache.cache_frame("stats/a", frame())
+        cache.cache_frame("aux/a", frame())
+        self.assertEqual(cache.purge(prefix="stats/", older_than=1), 0)
+        self.assertEqual(cache.purge(prefix="stats/"), 1)
+        self.assertEqual(cache.cache_info()["entries"], 1)
+
+    def test_threads_share_the_database(self):
+        errors = []
+
+        def work(worker):
+            try:
+                for i in range(20):
+                    cache.cache_frame(f"stats/{worker}/{i}", frame(i + 1))
+                    cache.get_cached_frame(f"stats/{worker}/{i}")
+            except Exception as e:  # pragma: no cover - reported below
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(w,)) for w in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.cache_info()["entries"], 80)
+
+    def test_concurrent_processes(self):
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(4) as pool:
+            results = pool.starmap(
+                hammer, [(self.path, worker, 40) for worker in range(4)]
+            )
+        self.assertEqual([p for problems in results for p in problems], [])
+        memory_cache.clear()
+        for key in KEYS:
+            self.assertIsNotNone(cache.get_cached_frame(key))
+
+    def test_lock(self):
+        configure_cache(locking=True)
+        self.addCleanup(configure_cache, locking=cache.CACHE_LOCKING)
+        other = SQLiteBackend(self.path)
+        with cache.cache_lock("stats/a") as locked:
+            self.assertTrue(locked)
+            with other.lock("stats/a", 0.05) as held:
+                self.assertFalse(held)
+            with other.lock("stats/b", 0.05) as held:
+                self.assertTrue(held)
+        with other.lock("stats/a", 0.05) as held:
+            self.assertTrue(held)
+
+    def hold(self, key, taken, host=None, pid=None):
+        """Record a lock on ``key`` as another process would."""
+        self.backend._connection().execute(
+            "INSERT INTO lock_holders VALUES (?, ?, ?, ?)",
+            (key, taken, host or socket.gethostname(), pid or os.getpid()),
+        )
+
+    def test_locks_of_live_processes_are_kept(self):
+        # However long ago a live process took it, past the wait timeout.
+        self.hold("stats/a", time.time() - 600)
+        with self.backend.lock("stats/a", 0.05) as held:
+            self.assertFalse(held)
+
+    def test_locks_of_dead_processes_are_taken_over(self):
+        child = subprocess.Popen([sys.executable, "-c", "pass"])
+        child.wait()
+        self.hold("stats/a", time.time(), pid=child.pid)
+        with self.backend.lock("stats/a", 0.05) as held:
+            self.assertTrue(held)
+
+    def test_stale_locks_of_other_hosts_are_taken_over(self):
+        self.hold("stats/a", time.time() - 600, host="elsewhere")
+        with self.backend.lock("stats/a", 0.05) as held:
+            self.assertFalse(held)
+        self.hold("stats/b", time.time() - CACHE_LOCK_STALE, host="elsewhere")
+        with self.backend.lock("stats/b", 0.05) as held:
+            self.assertTrue(held)
+
+
+class TestRemoteBackend(BackendTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = StubKeyValueStore()
+        configure_cache(backend=RemoteBackend(self.store, prefix="test:"))
+
+    def test_keys_and_expiry(self):
+        cache.cache_frame("stats/a", frame(), expiry_hours=1)
+        cache.cache_frame("stats/b", frame(), expiry_hours=None)
+        self.assertEqual(
+            sorted(self.store.scan_iter()), [b"test:stats/a", b"test:stats/b"]
+        )
+        # The store drops entries once they are past revalidation.
+        ttl = self.store.ttl("test:stats/a")
+        self.assertAlmostEqual(ttl, (1 + STALE_GRACE_HOURS) * 3600, delta=5)
+        self.assertEqual(self.store.ttl("test:stats/b"), -1)
+
+    def test_store_expires_entries(self):
+        cache.cache_frame("stats/a", frame(), -STALE_GRACE_HOURS)
+        memory_cache.clear()
+        self.assertIsNotNone(cache.get_cached_entry("stats/a"))
+        time.sleep(1.1)
+        self.assertIsNone(cache.get_cached_entry("stats/a"))
+
+    def test_writes_do_not_sweep(self):
+        configure_cache(max_bytes=1)
+        for key in ("a", "b", "c"):
+            cache.cache_frame(key, frame())
+        self.assertEqual(self.store.calls["scan_iter"], 0)
+        self.assertEqual(cache.cache_info()["entries"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
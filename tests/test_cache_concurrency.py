@@ -0,0 +1,75 @@
+import multiprocessing
+import unittest
+import pandas as pd
+from pippy import cache, get_stats, set_server
+from pippy.cache import memory_cache
+from support import TempCacheMixin, stub_server
+
+KEYS = [f"stats/stress/{i}" for i in range(4)]
+
+
+def hammer(cache_dir, worker, rounds):
+    """Write and read the same keys as every other worker."""
+    cache.configure_cache(cache_dir)
+    problems = []
+    for i in range(rounds):
+        key = KEYS[i % len(KEYS)]
+        rows = 50 + (worker * 7 + i) % 200
+        frame = pd.DataFrame({"worker": [worker] * rows, "i": range(rows)})
+        cache.cache_frame(key, frame)
+        cache.cache_response(f"{key}.raw", frame.to_dict(orient="records"))
+        memory_cache.clear()
+        for other in KEYS:
+            entry = cache.get_cached_entry(other)
+            if entry is not None and (
+                list(entry.data["i"]) != list(range(len(entry.data)))
+                or entry.data["worker"].nunique() != 1
+            ):
+                problems.append(f"torn frame for {other}")
+            raw = cache.get_cached_response(f"{other}.raw")
+            if raw is not None and [r["i"] for r in raw] != list(
+                range(len(raw))
+            ):
+                problems.append(f"torn response for {other}")
+    return problems
+
+
+def fetch(cache_dir, url):
+    cache.configure_cache(cache_dir, locking=True)
+    set_server(url, lazy=True)
+    return len(get_stats(country="ALB"))
+
+
+class TestCacheConcurrency(TempCacheMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.context = multiprocessing.get_context("spawn")
+
+    def test_concurrent_writers_and_readers(self):
+        with self.context.Pool(4) as pool:
+            results = pool.starmap(
+                hammer, [(self.cache_dir, worker, 40) for worker in range(4)]
+            )
+        self.assertEqual([p for problems in results for p in problems], [])
+        self.assertEqual(list(self.cache_dir.rglob("*.tmp")), [])
+
+    def test_corrupt_entries_are_misses(self):
+        cache.cache_frame("stats/a", pd.DataFrame({"x": [1, 2]}))
+        cache.cache_response("stats/b", [1, 2])
+        memory_cache.clear()
+        (self.cache_dir / "stats/a.arrow").write_bytes(b"ARROW1\x00\x00")
+        (self.cache_dir / "stats/b.json").write_text('{"data": [1, ')
+        self.assertIsNone(cache.get_cached_entry("stats/a"))
+        self.assertIsNone(cache.get_cached_response("stats/b"))
+        self.assertFalse((self.cache_dir / "stats/a.arrow").exists())
+
+    def test_only_one_process_refills_a_key(self):
+        with stub_server(delay=0.5) as stub:
+            with self.context.Pool(4) as pool:
+                sizes = pool.starmap(fetch, [(self.cache_dir, stub.url)] * 4)
+            self.assertEqual(len(set(sizes)), 1)
+            self.assertEqual(stub.count("/pip"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from pippy import get_stats, get_wb
+from pippy.cache import make_cache_key
+from pippy.exceptions import PIPAPIError
+from pippy.stats import _stats_cache_key, _stats_request
+from support import StubServerMixin
+
+SERVER = "https://api.worldbank.org/pip/v1"
+
+
+class TestMakeCacheKey(unittest.TestCase):
+    def test_equivalent_params_share_a_key(self):
+        a = make_cache_key(
+            "stats", SERVER, "pip", {"country": "ALB", "year": 2019}
+        )
+        b = make_cache_key(
+            "stats",
+            SERVER + "/",
+            "pip",
+            {"year": "2019", "povline": None, "country": "ALB"},
+        )
+        self.assertEqual(a, b)
+
+    def test_every_parameter_is_part_of_the_key(self):
+        base = {"country": "ALB", "year": 2019}
+        keys = {
+            make_cache_key("stats", SERVER, "pip", base),
+            make_cache_key("stats", SERVER, "pip-grp", base),
+            make_cache_key("stats", SERVER, "pip", {**base, "fill_gaps": 1}),
+            make_cache_key("stats", SERVER, "pip", {**base, "format": "csv"}),
+            make_cache_key(
+                "stats", SERVER.replace("api", "api-qa"), "pip", base
+            ),
+        }
+        self.assertEqual(len(keys), 5)
+
+    def test_layout_is_sharded_by_server(self):
+        key = make_cache_key("stats", SERVER, "pip", {"country": "ALB"})
+        namespace, server, shard, digest = key.split("/")
+        self.assertEqual(namespace, "stats")
+        self.assertEqual(server, "api.worldbank.org-pip-v1")
+        self.assertEqual(shard, digest[:2])
+        self.assertEqual(len(digest), 64)
+
+    def test_get_wb_and_get_stats_do_not_collide(self):
+        stats_key = _stats_cache_key(*_stats_request(year=2019))
+        wb_key = _stats_cache_key(*_stats_request(year=2019, group_by="wb"))
+        fill_key = _stats_cache_key(*_stats_request(year=2019, fill_gaps=True))
+        self.assertEqual(len({stats_key, wb_key, fill_key}), 3)
+
+
+class TestNegativeCaching(StubServerMixin, unittest.TestCase):
+    def test_wb_and_stats_results_are_cached_separately(self):
+        stats = get_stats(year=2010)
+        wb = get_wb(year=2010)
+        self.assertIn("country_code", stats.columns)
+        self.assertNotIn("country_code", wb.columns)
+        self.assertEqual(self.stub.count("/pip"), 1)
+        self.assertEqual(self.stub.count("/pip-grp"), 1)
+
+    def test_fill_gaps_is_not_served_for_survey_queries(self):
+        filled = get_stats(country="ALB", fill_gaps=True)
+        surveys = get_stats(country="ALB")
+        self.assertGreater(len(filled), len(surveys))
+
+    def test_empty_results_are_cached(self):
+        year = next(y for y in range(2000, 2020) if get_stats("ALB", y).empty)
+        self.stub.reset()
+        self.assertTrue(get_stats("ALB", year).empty)
+        self.assertEqual(self.stub.count("/pip"), 0)
+
+    def test_not_found_is_cached(self):
+        for _ in range(2):
+            with self.assertRaises(PIPAPIError):
+                get_stats(country="INVALID")
+        self.assertEqual(self.stub.count("/pip"), 1)
+
+    def test_not_found_is_not_cached_without_use_cache(self):
+        for _ in range(2):
+            with self.assertRaises(PIPAPIError):
+                get_stats(country="INVALID", use_cache=False)
+        self.assertEqual(self.stub.count("/pip"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
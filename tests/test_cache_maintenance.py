@@ -0,0 +1,143 @@
+import os
+import subprocess
+import sys
+import time
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from pippy import cache, configure_cache, get_stats, set_server
+from pippy.cache import memory_cache
+from pippy.constants import CACHE_SWEEP_INTERVAL, STALE_GRACE_HOURS
+from pippy.server import get_base_url
+from pippy.testing import StubPIPServer
+from support import TempCacheMixin
+
+
+def frame(n=200):
+    return pd.DataFrame({"value": range(n)})
+
+
+def age(path, seconds):
+    """Pretend an entry was last used and written ``seconds`` ago."""
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+class TestCacheMaintenance(TempCacheMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        configure_cache(max_bytes=10**9)
+
+    def entry(self, key):
+        return next(self.cache_dir.glob(f"{key}.*"))
+
+    def test_cache_info(self):
+        cache.cache_frame("stats/a", frame())
+        cache.cache_frame("stats/b", frame())
+        memory_cache.clear()
+        cache.get_cached_frame("stats/a")
+        cache.get_cached_frame("stats/missing")
+        info = cache.cache_info()
+        self.assertEqual(info["directory"], str(self.cache_dir))
+        self.assertEqual(info["entries"], 2)
+        self.assertGreater(info["bytes"], 0)
+        self.assertEqual(info["hit_ratio"], 0.5)
+
+    def test_cleanup_removes_expired_entries(self):
+        cache.cache_frame("fresh", frame())
+        cache.cache_frame("stale", frame(), expiry_hours=-1)
+        cache.cache_frame(
+            "gone", frame(), expiry_hours=-(STALE_GRACE_HOURS + 1)
+        )
+        result = cache.cleanup()
+        self.assertEqual(result["expired"], 1)
+        self.assertEqual(
+            sorted(p.name for p in self.cache_dir.glob("*.arrow")),
+            ["fresh.arrow", "stale.arrow"],
+        )
+
+    def test_cleanup_removes_corrupt_entries(self):
+        (self.cache_dir / "corrupt.arrow").write_bytes(b"not arrow")
+        (self.cache_dir / "corrupt.json").write_text("{")
+        self.assertEqual(cache.cleanup()["expired"], 2)
+
+    def test_lru_eviction(self):
+        for i, key in enumerate("abc"):
+            cache.cache_frame(key, frame())
+            age(self.entry(key), 100 - i)
+        memory_cache.clear()
+        cache.get_cached_frame("a")
+        size = self.entry("a").stat().st_size
+        result = cache.cleanup(max_bytes=2 * size)
+        self.assertEqual(result["evicted"], 1)
+        self.assertEqual(
+            sorted(p.stem for p in self.cache_dir.glob("*.arrow")),
+            ["a", "c"],
+        )
+
+    def test_writes_enforce_the_budget(self):
+        cache.cache_frame("first", frame())
+        size = self.entry("first").stat().st_size
+        configure_cache(max_bytes=int(size * 2.5))
+        for key in ("second", "third", "fourth"):
+            time.sleep(0.01)
+            cache.cache_frame(key, frame())
+        self.assertLessEqual(cache.cache_info()["bytes"], size * 2.5)
+        self.assertFalse(list(self.cache_dir.glob("first.*")))
+
+    def test_processes_share_the_sweep_time(self):
+        cache.cache_frame("first", frame())
+        self.assertTrue((self.cache_dir / ".last_sweep").exists())
+        sweeps = []
+        with patch.object(cache, "cleanup", lambda: sweeps.append(1)):
+            # Start over as a process that hasn't swept the cache yet.
+            cache._usage.update(bytes=None, last_sweep=None)
+            cache.cache_frame("second", frame())
+            self.assertEqual(sweeps, [])
+            age(self.cache_dir / ".last_sweep", CACHE_SWEEP_INTERVAL + 1)
+            cache._usage.update(bytes=None, last_sweep=None)
+            cache.cache_frame("third", frame())
+            self.assertEqual(sweeps, [1])
+
+    def test_purge_by_prefix_and_age(self):
+        cache.cache_frame("stats/a", frame())
+        cache.cache_frame("stats/b", frame())
+        cache.cache_frame("aux/a", frame())
+        age(self.cache_dir / "stats" / "a.arrow", 7200)
+        self.assertEqual(cache.purge(prefix="stats/", older_than=1), 1)
+        self.assertEqual(cache.purge(prefix="stats/"), 1)
+        self.assertEqual(cache.cache_info()["entries"], 1)
+        self.assertEqual(cache.purge(), 1)
+
+    def test_purge_by_server(self):
+        with StubPIPServer() as stub:
+            self.addCleanup(set_server, get_base_url(check=False), lazy=True)
+            set_server(stub.url)
+            get_stats(country="ALB")
+            get_stats(country="AGO")
+            url = stub.url
+        cache.cache_frame("stats/other-server/aa/aa", frame())
+        # Both queries and the server's last known release.
+        self.assertEqual(cache.purge(server=url), 3)
+        self.assertEqual(cache.cache_info()["entries"], 1)
+
+    def test_cli(self):
+        cache.cache_frame("stats/a", frame())
+        env = dict(os.environ, PIPPY_CACHE_DIR=str(self.cache_dir))
+
+        def run(*args):
+            return subprocess.run(
+                [sys.executable, "-m", "pippy.cache", *args],
+                capture_output=True,
+                text=True,
+                env=env,
+                check=True,
+            ).stdout
+
+        self.assertIn("entries: 1", run("info"))
+        self.assertIn("Removed 1 entries", run("purge", "--prefix", "stats"))
+        self.assertIn("entries: 0", run("info"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,15 +2,18 @@ import unittest
 import time
 from pippy import get_stats
 from pippy.exceptions import PIPAPIError
-from pippy.cache import cache_response, get_cached_response
+from pippy.cache import invalidate, get_cached_frame
+from pippy.stats import _stats_cache_key, _stats_request
 
 
 class TestCaching(unittest.TestCase):
     def test_caching(self):
         try:
             # Clear the cache for this specific call
-            cache_key = "stats_ALB_2019_None_None_all_all_None_None"
-            cache_response(cache_key, None)
+            cache_key = _stats_cache_key(
+                *_stats_request(country="ALB", year=2019)
+            )
+            invalidate(cache_key)
 
             # First call, should take some time
             start = time.time()
@@ -41,7 +44,7 @@ class TestCaching(unittest.TestCase):
             )
 
             # Check if cache is actually being used
-            cached_data = get_cached_response(cache_key)
+            cached_data = get_cached_frame(cache_key)
             self.assertIsNotNone(
                 cached_data, "Cache should contain data after the calls"
             )
@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pippy import get_stats
+from pippy.coalesce import SingleFlight, stats_flights
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def work():
+            calls.append(1)
+            release.wait()
+            return "result"
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(flights.do, "key", work) for _ in range(5)]
+            while flights.stats()["coalesced"] < 4:
+                time.sleep(0.001)
+            release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            flights.stats(), {"executed": 1, "coalesced": 4, "in_flight": 0}
+        )
+
+    def test_later_calls_run_again(self):
+        flights = SingleFlight()
+        flights.do("key", lambda: 1)
+        self.assertEqual(flights.do("key", lambda: 2), 2)
+        self.assertEqual(flights.stats()["coalesced"], 0)
+
+
+class TestStatsCoalescing(StubServerMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        stats_flights.reset_stats()
+        get_stats(country="AGO")  # resolve the release up front
+        self.stub.reset()
+
+    def run_concurrently(self, query, threads=8):
+        barrier = threading.Barrier(threads)
+
+        def call():
+            barrier.wait()
+            return get_stats(**query)
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = [pool.submit(call) for _ in range(threads)]
+        return futures
+
+    def test_identical_queries_are_fetched_once(self):
+        self.stub.delay = 0.3
+        futures = self.run_concurrently({"country": "ALB"})
+        frames = [future.result() for future in futures]
+        self.assertEqual(self.stub.count("/pip"), 1)
+        self.assertTrue(all(frame.equals(frames[0]) for frame in frames))
+        self.assertEqual(stats_flights.stats()["coalesced"], 7)
+
+    def test_errors_reach_every_caller(self):
+        self.stub.delay = 0.3
+        futures = self.run_concurrently({"country": "INVALID"})
+        for future in futures:
+            self.assertIsInstance(future.exception(), PIPAPIError)
+        self.assertEqual(self.stub.count("/pip"), 1)
+
+    def test_callers_get_independent_frames(self):
+        self.stub.delay = 0.3
+        futures = self.run_concurrently({"country": "ALB"}, threads=2)
+        first, second = (future.result() for future in futures)
+        first.loc[:, "headcount"] = -1.0
+        self.assertTrue((second["headcount"] >= 0).all())
+
+    def test_uncached_queries_are_not_coalesced(self):
+        self.stub.delay = 0.2
+        futures = self.run_concurrently(
+            {"country": "ALB", "use_cache": False}, threads=3
+        )
+        [future.result() for future in futures]
+        self.assertEqual(self.stub.count("/pip"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
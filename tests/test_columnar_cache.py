@@ -0,0 +1,103 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+import pandas as pd
+from pippy import cache, get_stats
+from pippy.cache import memory_cache
+from support import TempCacheMixin, stub_server
+
+try:
+    import pyarrow  # noqa: F401
+
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+def sample_frame():
+    return pd.DataFrame(
+        {
+            "country_code": pd.Categorical(["ALB", "AGO", "ALB"]),
+            "reporting_year": pd.Series([2001, 2002, 2003], dtype="int16"),
+            "headcount": [0.1, 0.25, None],
+            "is_interpolated": [False, True, False],
+        }
+    )
+
+
+class TestColumnarCache(TempCacheMixin, unittest.TestCase):
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_round_trip_preserves_dtypes(self):
+        df = sample_frame()
+        cache.cache_frame("key", df)
+        self.assertTrue((self.cache_dir / "key.arrow").exists())
+        memory_cache.clear()
+        cached = cache.get_cached_frame("key")
+        pd.testing.assert_frame_equal(cached, df)
+
+    def test_expired_entries_are_misses(self):
+        cache.cache_frame("key", sample_frame(), expiry_hours=-1)
+        self.assertIsNone(cache.get_cached_frame("key"))
+
+    def test_missing_entries_are_misses(self):
+        self.assertIsNone(cache.get_cached_frame("missing"))
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_json_entries_are_migrated_on_read(self):
+        records = [{"country_code": "ALB", "headcount": 0.1}]
+        cache.cache_response("legacy", records)
+        df = cache.get_cached_frame("legacy")
+        self.assertEqual(df.to_dict(orient="records"), records)
+        self.assertFalse((self.cache_dir / "legacy.json").exists())
+        self.assertTrue((self.cache_dir / "legacy.arrow").exists())
+        memory_cache.clear()
+        pd.testing.assert_frame_equal(cache.get_cached_frame("legacy"), df)
+
+    def test_migrate_cache(self):
+        with stub_server() as stub:
+            expected = get_stats(country="ALB", use_cache=False)
+            filled = get_stats(fill_gaps=True, use_cache=False)
+            stub.reset()
+            # Entries as older versions of pippy wrote them.
+            legacy = {
+                "stats_ALB_all_None_None_all_all_None_None": (expected, 1),
+                "stats_all_all_None_None_all_all_None_None": (filled, 1),
+                "stats_AGO_all_None_None_all_all_None_None": (expected, -1),
+            }
+            for name, (df, hours) in legacy.items():
+                expiry = datetime.now() + timedelta(hours=hours)
+                (self.cache_dir / f"{name}.json").write_text(
+                    json.dumps(
+                        {
+                            "data": json.loads(df.to_json(orient="records")),
+                            "expiry": expiry.isoformat(),
+                        }
+                    )
+                )
+            # The fill_gaps rows can't be told apart from a plain query.
+            self.assertEqual(cache.migrate_cache(), 1)
+            self.assertEqual(list(self.cache_dir.glob("*.json")), [])
+            memory_cache.clear()
+            pd.testing.assert_frame_equal(get_stats(country="ALB"), expected)
+            self.assertEqual(stub.count("/pip"), 0)
+
+    def test_json_fallback_without_pyarrow(self):
+        with patch("pippy.cache._pyarrow", return_value=None):
+            cache.cache_frame("key", sample_frame())
+            with (self.cache_dir / "key.json").open() as f:
+                stored = json.load(f)
+            expiry = datetime.fromisoformat(stored["expiry"])
+            self.assertGreater(expiry, datetime.now() + timedelta(hours=23))
+            memory_cache.clear()
+            df = cache.get_cached_frame("key")
+        self.assertEqual(list(df["country_code"]), ["ALB", "AGO", "ALB"])
+
+    def test_invalidate(self):
+        cache.cache_frame("key", sample_frame())
+        cache.invalidate("key")
+        self.assertIsNone(cache.get_cached_frame("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import pandas as pd
+from pippy import get_countries, get_dictionary, get_stats, iter_stats
+from pippy.cache import memory_cache
+from pippy.schema import SCHEMA, schema_from_dictionary
+from support import StubServerMixin
+
+
+def memory(df):
+    return df.memory_usage(index=True, deep=True).sum()
+
+
+class TestCompact(StubServerMixin, unittest.TestCase):
+    def test_dtypes(self):
+        df = get_stats(fill_gaps=True, compact=True)
+        self.assertIsInstance(df["country_code"].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(df["welfare_type"].dtype, pd.CategoricalDtype)
+        self.assertEqual(df["reporting_year"].dtype, "int16")
+        self.assertEqual(df["headcount"].dtype, "float32")
+        self.assertEqual(df["poverty_line"].dtype, "float64")
+
+    def test_memory_usage(self):
+        default = get_stats(fill_gaps=True)
+        compact = get_stats(fill_gaps=True, compact=True)
+        self.assertEqual(default.shape, compact.shape)
+        self.assertLess(memory(compact), memory(default) / 3)
+
+    def test_values_are_preserved(self):
+        default = get_stats(country="ALB", fill_gaps=True)
+        compact = get_stats(country="ALB", fill_gaps=True, compact=True)
+        self.assertEqual(
+            list(compact["country_code"]), list(default["country_code"])
+        )
+        pd.testing.assert_series_equal(
+            compact["headcount"].astype("float64"),
+            default["headcount"],
+            rtol=1e-6,
+        )
+
+    def test_compact_frames_are_cached_separately(self):
+        get_stats(country="ALB", compact=True)
+        memory_cache.clear()
+        cached = get_stats(country="ALB", compact=True)
+        self.assertEqual(self.stub.count("/pip"), 1)
+        self.assertEqual(cached["reporting_year"].dtype, "int16")
+        default = get_stats(country="ALB")
+        self.assertEqual(self.stub.count("/pip"), 2)
+        self.assertEqual(default["reporting_year"].dtype, "int64")
+
+    def test_streamed_chunks(self):
+        chunk = next(iter_stats(chunksize=10, compact=True, use_cache=False))
+        self.assertIsInstance(chunk["country_code"].dtype, pd.CategoricalDtype)
+        self.assertEqual(chunk["reporting_year"].dtype, "int16")
+        self.assertEqual(chunk["headcount"].dtype, "float32")
+
+    def test_aux_tables(self):
+        countries = get_countries(compact=True)
+        self.assertIsInstance(
+            countries["region_code"].dtype, pd.CategoricalDtype
+        )
+
+    def test_schema_from_dictionary(self):
+        schema = schema_from_dictionary(get_dictionary())
+        self.assertEqual(schema["country_code"], "category")
+        self.assertEqual(schema["reporting_year"], SCHEMA["reporting_year"])
+        self.assertEqual(schema["headcount"], "float32")
+        df = get_stats(country="ALB", compact=schema)
+        self.assertEqual(df["headcount"].dtype, "float32")
+
+    def test_schema_from_dictionary_without_types(self):
+        dictionary = pd.DataFrame(
+            {"variable": ["country_code", "headcount", "unknown"]}
+        )
+        self.assertEqual(
+            schema_from_dictionary(dictionary),
+            {"country_code": "category", "headcount": "float32"},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import pandas as pd
+from pippy import get_stats, iter_stats
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+
+class TestIterStats(StubServerMixin, unittest.TestCase):
+    def test_chunks_match_get_stats(self):
+        chunks = list(iter_stats(fill_gaps=True, chunksize=50))
+        self.assertTrue(all(len(chunk) <= 50 for chunk in chunks))
+        self.assertGreater(len(chunks), 1)
+        streamed = pd.concat(chunks, ignore_index=True)
+        full = get_stats(fill_gaps=True, use_cache=False)
+        self.assertEqual(len(streamed), len(full))
+        pd.testing.assert_series_equal(
+            streamed["headcount"], full["headcount"]
+        )
+
+    def test_requests_csv_stream(self):
+        next(iter_stats(country="ALB", chunksize=5))
+        self.assertEqual(self.stub.requests[-1][1]["format"], "csv")
+
+    def test_writes_output_file(self):
+        path = self.cache_dir / "out.csv"
+        total = sum(
+            len(chunk) for chunk in iter_stats(chunksize=20, path=path)
+        )
+        self.assertEqual(len(pd.read_csv(path)), total)
+
+    def test_cached_query_is_served_in_chunks(self):
+        full = get_stats(country="ALB")
+        self.stub.reset()
+        chunks = list(iter_stats(country="ALB", chunksize=3))
+        self.assertEqual(self.stub.count("/pip"), 0)
+        self.assertEqual(sum(len(c) for c in chunks), len(full))
+
+    def test_empty_result(self):
+        year = next(y for y in range(2000, 2020) if get_stats("ALB", y).empty)
+        self.assertEqual(
+            list(iter_stats(country="ALB", year=year, use_cache=False)), []
+        )
+
+    def test_invalid_query_raises(self):
+        with self.assertRaises(PIPAPIError):
+            list(iter_stats(country="INVALID"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+import unittest
+from pippy import server
+from support import StubServerMixin
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import pippy
+elapsed = time.perf_counter() - start
+heavy = [m for m in ("pandas", "requests", "numpy") if m in sys.modules]
+print(f"{elapsed:.6f} {','.join(heavy)}")
+"""
+
+
+class TestLazyImport(StubServerMixin, unittest.TestCase):
+    lazy_server = True
+
+    def run_import(self):
+        env = dict(os.environ, PIPPY_SERVER=self.stub.url)
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        )
+        elapsed, _, heavy = result.stdout.strip().partition(" ")
+        return float(elapsed), heavy
+
+    def test_import_is_network_free(self):
+        self.run_import()
+        self.assertEqual(self.stub.requests, [])
+
+    def test_import_skips_heavy_modules(self):
+        elapsed, heavy = self.run_import()
+        self.assertEqual(heavy, "", f"Imported eagerly: {heavy}")
+        self.assertLess(elapsed, 1.0, f"import pippy took {elapsed:.3f}s")
+
+    def test_health_check_runs_once_on_first_use(self):
+        server.set_server(self.stub.url, lazy=True)
+        self.assertEqual(self.stub.count("/health-check"), 0)
+
+        server.get_pip_url()
+        server.get_pip_grp_url()
+        self.assertEqual(self.stub.count("/health-check"), 1)
+
+    def test_health_check_is_repeated_after_ttl(self):
+        server.set_server(self.stub.url)
+        self.assertEqual(self.stub.count("/health-check"), 1)
+        server._state["checked_at"] -= server.HEALTH_CHECK_TTL + 1
+        server.get_base_url()
+        self.assertEqual(self.stub.count("/health-check"), 2)
+
+    def test_current_server_is_still_available(self):
+        server.set_server(self.stub.url, lazy=True)
+        self.assertEqual(server.current_server, self.stub.url)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import pandas as pd
+from pippy import cache
+from pippy.cache import MemoryCache, memory_cache
+from support import TempCacheMixin
+
+
+def frame(n=3):
+    return pd.DataFrame({"country_code": ["ALB"] * n, "headcount": [0.1] * n})
+
+
+def later(hours=1):
+    return datetime.now() + timedelta(hours=hours)
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        mc = MemoryCache(max_entries=4, max_bytes=10**6)
+        self.assertIsNone(mc.get("a"))
+        mc.put("a", frame(), later())
+        self.assertIsNotNone(mc.get("a"))
+        self.assertEqual(mc.stats()["hits"], 1)
+        self.assertEqual(mc.stats()["misses"], 1)
+
+    def test_lru_eviction_by_entries(self):
+        mc = MemoryCache(max_entries=2, max_bytes=10**6)
+        mc.put("a", frame(), later())
+        mc.put("b", frame(), later())
+        mc.get("a")
+        mc.put("c", frame(), later())
+        self.assertIsNone(mc.get("b"))
+        self.assertIsNotNone(mc.get("a"))
+        self.assertIsNotNone(mc.get("c"))
+
+    def test_eviction_by_bytes(self):
+        size = int(frame(100).memory_usage(index=True, deep=True).sum())
+        mc = MemoryCache(max_entries=100, max_bytes=int(size * 2.5))
+        for key in "abc":
+            mc.put(key, frame(100), later())
+        self.assertEqual(mc.stats()["entries"], 2)
+        self.assertLessEqual(mc.stats()["bytes"], mc.max_bytes)
+        self.assertIsNone(mc.get("a"))
+
+    def test_oversized_frames_are_not_kept(self):
+        mc = MemoryCache(max_entries=100, max_bytes=10)
+        mc.put("a", frame(), later())
+        self.assertEqual(mc.stats()["entries"], 0)
+
+    def test_ttl(self):
+        mc = MemoryCache(max_entries=4, max_bytes=10**6)
+        mc.put("a", frame(), later(-1))
+        self.assertIsNone(mc.get("a"))
+        self.assertEqual(mc.stats()["entries"], 0)
+
+    def test_returned_frames_cannot_corrupt_the_cache(self):
+        mc = MemoryCache(max_entries=4, max_bytes=10**6)
+        original = frame()
+        mc.put("a", original, later())
+        original.loc[0, "headcount"] = 99.0
+        first = mc.get("a")
+        first.loc[0, "headcount"] = 42.0
+        first["extra"] = 1
+        second = mc.get("a")
+        self.assertEqual(second.loc[0, "headcount"], 0.1)
+        self.assertNotIn("extra", second.columns)
+
+    def test_shallow_copies_only_under_copy_on_write(self):
+        for version, option, deep in [
+            ("2.2.3", False, True),
+            ("2.2.3", "warn", True),
+            ("2.2.3", True, False),
+            ("3.0.0", False, False),
+        ]:
+            with self.subTest(version=version, copy_on_write=option):
+                mode = SimpleNamespace(copy_on_write=option)
+                fake = SimpleNamespace(
+                    __version__=version, options=SimpleNamespace(mode=mode)
+                )
+                df = Mock()
+                with patch("pippy.cache.pd", fake):
+                    cache._protect(df)
+                df.copy.assert_called_once_with(deep=deep)
+
+
+class TestMemoryTier(TempCacheMixin, unittest.TestCase):
+    def test_hits_are_served_from_memory(self):
+        cache.cache_frame("key", frame())
+        for path in self.cache_dir.iterdir():
+            path.unlink()
+        pd.testing.assert_frame_equal(cache.get_cached_frame("key"), frame())
+        self.assertEqual(memory_cache.stats()["hits"], 1)
+
+    def test_disk_hits_fill_the_memory_tier(self):
+        cache.cache_frame("key", frame())
+        memory_cache.clear()
+        cache.get_cached_frame("key")
+        cache.get_cached_frame("key")
+        self.assertEqual(memory_cache.stats()["hits"], 1)
+        self.assertEqual(memory_cache.stats()["misses"], 1)
+
+    def test_invalidate_clears_memory(self):
+        cache.cache_frame("key", frame())
+        cache.invalidate("key")
+        self.assertIsNone(cache.get_cached_frame("key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import logging
+import unittest
+from unittest.mock import patch
+from pippy import get_countries, get_stats, iter_stats, metrics
+from pippy import resilience
+from pippy.cache import memory_cache
+from pippy.logger import pippy_logger
+from support import StubServerMixin
+from pippy.utils import get_current_release
+
+
+class TestMetrics(StubServerMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        # Resolve the release up front so its request isn't counted.
+        get_current_release()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.events = []
+        metrics.subscribe(self.events.append)
+        self.addCleanup(metrics.unsubscribe, self.events.append)
+
+    def names(self):
+        return [event.name for event in self.events]
+
+    def test_download_phases(self):
+        get_stats(country="ALB")
+        names = self.names()
+        for name in ("cache_miss", "ttfb", "download", "parse", "build"):
+            self.assertIn(name, names)
+        self.assertLess(names.index("ttfb"), names.index("parse"))
+        self.assertLess(names.index("parse"), names.index("build"))
+        self.assertEqual(names[-1], "cache_write")
+
+        download = self.events[names.index("download")]
+        self.assertGreater(download.bytes, 0)
+        self.assertEqual(download.attrs["endpoint"], "pip")
+        build = self.events[names.index("build")]
+        self.assertGreater(build.attrs["rows"], 0)
+        self.assertGreaterEqual(build.seconds, 0)
+
+    def test_cache_hits(self):
+        get_stats(country="ALB")
+        self.events.clear()
+        get_stats(country="ALB")
+        self.assertEqual(self.names(), ["cache_hit"])
+        self.assertEqual(self.events[0].attrs["tier"], "memory")
+        memory_cache.clear()
+        get_stats(country="ALB")
+        self.assertEqual(self.events[-1].attrs["tier"], "disk")
+
+    def test_snapshot(self):
+        get_stats(country="ALB")
+        get_stats(country="ALB")
+        get_countries()
+        summary = metrics.snapshot()
+        self.assertEqual(summary["cache_hit"]["count"], 1)
+        self.assertEqual(summary["parse"]["count"], 2)
+        self.assertEqual(summary["ttfb"]["count"], 2)
+        self.assertGreater(summary["download"]["bytes"], 0)
+        self.assertGreater(summary["cache_write"]["bytes"], 0)
+        totals = summary["build"]
+        self.assertAlmostEqual(
+            totals["mean_seconds"], totals["seconds"] / totals["count"]
+        )
+        self.assertGreaterEqual(totals["max_seconds"], totals["mean_seconds"])
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_retries(self):
+        resilience.configure_retries(backoff_factor=0.01)
+        self.addCleanup(
+            resilience.configure_retries,
+            backoff_factor=resilience.BACKOFF_FACTOR,
+        )
+        self.stub.inject(503, times=2, path="/pip")
+        get_stats(country="ALB", use_cache=False)
+        retries = [e for e in self.events if e.name == "retry"]
+        self.assertEqual([e.attrs["reason"] for e in retries], [503, 503])
+        self.assertEqual(metrics.snapshot()["ttfb"]["count"], 3)
+
+    def test_streaming_download(self):
+        list(iter_stats(country="ALB", use_cache=False))
+        download = [e for e in self.events if e.name == "download"]
+        self.assertEqual(len(download), 1)
+        self.assertGreater(download[0].bytes, 0)
+
+    def test_failing_subscriber_is_ignored(self):
+        def broken(event):
+            raise RuntimeError("broken")
+
+        metrics.subscribe(broken)
+        self.addCleanup(metrics.unsubscribe, broken)
+        with self.assertLogs(pippy_logger, "WARNING"):
+            df = get_stats(country="ALB")
+        self.assertGreater(len(df), 0)
+
+    def test_debug_logging_is_lazy(self):
+        with patch("pippy.stats._preview") as preview:
+            get_stats(country="ALB", use_cache=False)
+            preview.assert_not_called()
+            self.addCleanup(pippy_logger.setLevel, logging.INFO)
+            with self.assertLogs(pippy_logger, "DEBUG"):
+                get_stats(country="ALB", use_cache=False, debug=True)
+            preview.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from pippy import get_stats
+from pippy.exceptions import PIPAPIError
+from pippy.logger import pippy_logger
+from pippy.planner import plan_query
+from pippy.testing import COUNTRIES
+from support import StubServerMixin
+
+
+def arguments(**kwargs):
+    defaults = {
+        "country": "all",
+        "year": "all",
+        "fill_gaps": False,
+        "region": None,
+        "group_by": None,
+    }
+    return dict(defaults, **kwargs)
+
+
+def never(request):
+    return False
+
+
+class TestPlanQuery(unittest.TestCase):
+    def test_few_countries_fan_out(self):
+        plan = plan_query(arguments(country=["BRA", "ALB"]), never)
+        self.assertEqual(plan.strategy, "fanout")
+        self.assertEqual([r["country"] for r in plan.requests], ["ALB", "BRA"])
+        self.assertEqual(plan.countries, ["ALB", "BRA"])
+
+    def test_many_countries_bulk(self):
+        codes = [f"C{i:02d}" for i in range(60)]
+        plan = plan_query(arguments(country=codes), never)
+        self.assertEqual(plan.strategy, "bulk")
+        self.assertEqual(len(plan.requests), 1)
+        self.assertEqual(plan.requests[0]["country"], "all")
+        self.assertEqual(len(plan.countries), 60)
+
+    def test_cached_superset(self):
+        def cached(request):
+            return request["country"] == "all"
+
+        plan = plan_query(arguments(country=["ALB", "AGO"]), cached)
+        self.assertEqual(plan.strategy, "cached")
+        self.assertEqual(plan.seconds, plan.rows * 1e-6)
+
+    def test_cached_superset_of_a_single_year(self):
+        def cached(request):
+            return request["country"] == request["year"] == "all"
+
+        query = arguments(country=["ALB", "AGO"], year=2015)
+        plan = plan_query(query, cached)
+        self.assertEqual(plan.strategy, "cached")
+        self.assertEqual(plan.countries, ["AGO", "ALB"])
+        self.assertEqual(plan.years, [2015])
+        # Without a cached result the single year is requested as is.
+        plan = plan_query(query, never)
+        self.assertEqual([r["year"] for r in plan.requests], [2015, 2015])
+        self.assertIsNone(plan.years)
+
+    def test_country_and_year_lists(self):
+        plan = plan_query(
+            arguments(country=["ALB", "AGO"], year=list(range(2000, 2020))),
+            never,
+        )
+        # One request per country for all years beats 40 targeted ones.
+        self.assertEqual(plan.strategy, "fanout")
+        self.assertEqual(
+            [(r["country"], r["year"]) for r in plan.requests],
+            [("AGO", "all"), ("ALB", "all")],
+        )
+        self.assertEqual(len(plan.years), 20)
+
+    def test_normalization(self):
+        plan = plan_query(
+            arguments(country=("alb", "ALB"), year=["2019", 2018]), never
+        )
+        self.assertEqual(plan.countries, ["ALB"])
+        self.assertEqual(plan.years, [2018, 2019])
+        plan = plan_query(arguments(country=["ALB", "all"]), never)
+        self.assertIsNone(plan.countries)
+        self.assertEqual(plan.requests[0]["country"], "all")
+
+    def test_invalid_lists(self):
+        for invalid in (
+            arguments(country=[]),
+            arguments(year=["mrv", 2019]),
+            arguments(country=["ALB"], region="SSA"),
+            arguments(country=["ALB"], group_by="wb"),
+        ):
+            with self.subTest(**invalid), self.assertRaises(PIPAPIError):
+                plan_query(invalid, never)
+
+
+class TestPlannedStats(StubServerMixin, unittest.TestCase):
+    def pip_requests(self):
+        return [
+            params for path, params in self.stub.requests if path == "/pip"
+        ]
+
+    def expected(self, countries, years=None):
+        df = get_stats(use_cache=False)
+        keep = df["country_code"].isin(countries)
+        if years is not None:
+            keep &= df["reporting_year"].isin(years)
+        return df[keep].reset_index(drop=True)
+
+    def test_fanout(self):
+        df = get_stats(country=["AGO", "ALB"], use_cache=False)
+        self.assertEqual(
+            sorted(params["country"] for params in self.pip_requests()),
+            ["AGO", "ALB"],
+        )
+        pd.testing.assert_frame_equal(df, self.expected(["AGO", "ALB"]))
+
+    def test_fanout_with_empty_results_keeps_dtypes(self):
+        # CHN has no survey in 2010, so one of the requests comes back
+        # empty.
+        df = get_stats(country=["ALB", "CHN"], year=[2010, 2012])
+        self.assertEqual(len(self.pip_requests()), 4)
+        pd.testing.assert_series_equal(
+            df.dtypes, get_stats(use_cache=False).dtypes
+        )
+
+    def test_bulk(self):
+        codes = [country[0] for country in COUNTRIES[:20]]
+        # Without a cost per row, one request beats two.
+        with patch("pippy.planner.PLANNER_ROW_SECONDS", 0):
+            df = get_stats(country=codes, year=[2010, 2015], use_cache=False)
+        self.assertEqual(
+            self.pip_requests(), [dict(self.pip_requests()[0], country="ALL")]
+        )
+        self.assertEqual(self.pip_requests()[0]["year"], "ALL")
+        pd.testing.assert_frame_equal(df, self.expected(codes, [2010, 2015]))
+
+    def test_reuses_cached_superset(self):
+        every = get_stats(year=2010)
+        requests = len(self.stub.requests)
+        df = get_stats(country=["BRA", "ALB", "CHN"], year=[2010])
+        self.assertEqual(len(self.stub.requests), requests)
+        expected = every[every["country_code"].isin(["ALB", "BRA", "CHN"])]
+        pd.testing.assert_frame_equal(df, expected.reset_index(drop=True))
+
+    def test_reuses_cached_superset_for_a_single_year(self):
+        every = get_stats()
+        requests = len(self.stub.requests)
+        df = get_stats(country=["BRA", "ALB", "CHN"], year=2012)
+        self.assertEqual(len(self.stub.requests), requests)
+        expected = every[
+            every["country_code"].isin(["ALB", "BRA", "CHN"])
+            & (every["reporting_year"] == 2012)
+        ]
+        self.assertGreater(len(expected), 0)
+        pd.testing.assert_frame_equal(df, expected.reset_index(drop=True))
+
+    def test_plan_in_debug_output(self):
+        self.addCleanup(pippy_logger.setLevel, pippy_logger.level)
+        with self.assertLogs(pippy_logger, "DEBUG") as logs:
+            get_stats(country=["ALB", "AGO"], debug=True)
+        plans = [line for line in logs.output if "Query plan" in line]
+        self.assertEqual(len(plans), 1)
+        self.assertIn("fanout: 2 request(s)", plans[0])
+
+    def test_year_list_with_group_by(self):
+        df = get_stats(group_by="wb", year=[2010, 2015])
+        self.assertEqual(sorted(df["reporting_year"].unique()), [2010, 2015])
+
+    def test_failed_request(self):
+        with self.assertRaises(PIPAPIError):
+            get_stats(country=["ALB", "XXX"], use_cache=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
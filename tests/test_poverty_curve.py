@@ -0,0 +1,68 @@
+import unittest
+import numpy as np
+from pippy import get_poverty_curve, get_stats
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+POVLINES = [1.0, 2.15, 3.65, 6.85, 10.0]
+
+
+class TestPovertyCurve(StubServerMixin, unittest.TestCase):
+    def test_long_format(self):
+        curve = get_poverty_curve(POVLINES, country="ALB", year=2019)
+        self.assertEqual(list(curve["poverty_line"]), POVLINES)
+        self.assertIn("headcount", curve.columns)
+        self.assertNotIn("survey_acronym", curve.columns)
+        self.assertFalse(curve["interpolated"].any())
+        self.assertTrue(curve["headcount"].is_monotonic_increasing)
+
+    def test_matches_get_stats(self):
+        curve = get_poverty_curve(POVLINES, country="ALB", year=2019)
+        point = get_stats(country="ALB", year=2019, povline=3.65)
+        self.assertAlmostEqual(
+            curve.loc[curve["poverty_line"] == 3.65, "headcount"].iloc[0],
+            point["headcount"].iloc[0],
+        )
+
+    def test_one_request_per_povline(self):
+        get_poverty_curve(POVLINES, country="ALB")
+        self.assertEqual(self.stub.count("/pip"), len(POVLINES))
+
+    def test_cached_points_are_reused(self):
+        get_stats(country="ALB", povline=2.15)
+        self.stub.reset()
+        get_poverty_curve(POVLINES, country="ALB")
+        self.assertEqual(self.stub.count("/pip"), len(POVLINES) - 1)
+
+    def test_array_output(self):
+        curve = get_poverty_curve(POVLINES, country="all", output="array")
+        self.assertEqual(curve.values.shape, (len(curve.surveys), 5))
+        np.testing.assert_array_equal(curve.povlines, POVLINES)
+        self.assertEqual(curve.measure, "headcount")
+        self.assertTrue((np.diff(curve.values, axis=1) >= 0).all())
+
+    def test_interpolation(self):
+        grid = np.geomspace(1, 20, 40)
+        curve = get_poverty_curve(
+            grid, country="ALB", year=2019, interpolate=8
+        )
+        self.assertEqual(self.stub.count("/pip"), 8)
+        self.assertEqual(len(curve), 40)
+        self.assertEqual((~curve["interpolated"]).sum(), 8)
+
+        exact = get_poverty_curve(grid, country="ALB", year=2019)
+        np.testing.assert_allclose(
+            curve["headcount"], exact["headcount"], atol=0.05
+        )
+
+    def test_invalid_povlines(self):
+        with self.assertRaises(PIPAPIError):
+            get_poverty_curve([0, 1.0], country="ALB")
+
+    def test_failed_query_raises(self):
+        with self.assertRaises(PIPAPIError):
+            get_poverty_curve(POVLINES, country="INVALID")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from datetime import datetime
+from pippy import cache, get_stats, utils
+from pippy.cache import memory_cache
+from pippy.exceptions import PIPAPIError
+from pippy.stats import _stats_cache_key, _stats_request
+from support import StubServerMixin
+
+
+def age_releases():
+    """Make every resolved release older than RELEASE_TTL."""
+    with utils._release_lock:
+        for lookup, (release, resolved_at) in utils._releases.items():
+            utils._releases[lookup] = (
+                release,
+                resolved_at - utils.RELEASE_TTL - 1,
+            )
+
+
+class TestReleaseCache(StubServerMixin, unittest.TestCase):
+    stub_options = {"release": "20240627"}
+
+    def test_current_release_is_resolved_once(self):
+        self.assertEqual(utils.get_current_release(), "20240627")
+        self.assertEqual(utils.get_current_release(), "20240627")
+        self.assertEqual(self.stub.count("/versions"), 1)
+
+    def test_release_is_resolved_again_after_ttl(self):
+        utils.get_current_release()
+        self.stub.release = "20250101"
+        self.assertEqual(utils.get_current_release(), "20240627")
+        age_releases()
+        self.assertEqual(utils.get_current_release(), "20250101")
+        self.assertEqual(self.stub.count("/versions"), 2)
+
+    def test_unknown_ppp_version_raises(self):
+        with self.assertRaises(PIPAPIError):
+            utils.get_current_release(ppp_version="1999")
+
+    def test_last_known_release_is_used_when_offline(self):
+        utils.get_current_release()
+        with utils._release_lock:
+            utils._releases.clear()
+        self.stub.stop()
+        self.assertEqual(utils.get_current_release(), "20240627")
+
+    def test_failed_lookups_are_not_repeated_straight_away(self):
+        utils.get_current_release()
+        age_releases()
+        self.stub.inject(status=404, times=10, path="/versions")
+        for _ in range(3):
+            self.assertEqual(utils.get_current_release(), "20240627")
+        self.assertEqual(self.stub.count("/versions"), 2)
+        # Past RELEASE_RETRY_INTERVAL the server is asked again.
+        age_releases()
+        utils.get_current_release()
+        self.assertEqual(self.stub.count("/versions"), 3)
+
+    def test_failures_are_remembered_briefly(self):
+        self.stub.inject(status=404, times=10, path="/versions")
+        for _ in range(3):
+            with self.assertRaises(PIPAPIError):
+                utils.get_current_release()
+        self.assertEqual(self.stub.count("/versions"), 1)
+
+    def test_entries_are_keyed_on_the_release(self):
+        get_stats(country="ALB")
+        key = _stats_cache_key(*_stats_request(country="ALB"))
+        pinned = _stats_cache_key(
+            *_stats_request(country="ALB", release_version="20240627")
+        )
+        self.assertEqual(key, pinned)
+
+    def test_release_entries_never_expire(self):
+        get_stats(country="ALB")
+        key = _stats_cache_key(*_stats_request(country="ALB"))
+        memory_cache.clear()
+        entry = cache.get_cached_entry(key)
+        self.assertEqual(entry.expiry, datetime.max)
+        self.assertTrue(entry.fresh)
+
+    def test_new_release_invalidates_unpinned_entries(self):
+        get_stats(country="ALB")
+        get_stats(country="ALB")
+        self.assertEqual(self.stub.count("/pip"), 1)
+
+        self.stub.release = "20250101"
+        age_releases()
+        df = get_stats(country="ALB")
+        self.assertEqual(self.stub.count("/pip"), 2)
+        self.assertEqual(set(df["release_version"]), {"20250101"})
+
+    def test_pinned_entries_survive_a_new_release(self):
+        get_stats(country="ALB", release_version="20240627")
+        self.stub.release = "20250101"
+        age_releases()
+        get_stats(country="ALB", release_version="20240627")
+        self.assertEqual(self.stub.count("/pip"), 1)
+
+    def test_empty_results_keep_a_short_ttl(self):
+        year = next(y for y in range(2000, 2020) if get_stats("ALB", y).empty)
+        key = _stats_cache_key(*_stats_request(country="ALB", year=year))
+        entry = cache.get_cached_entry(key)
+        self.assertLess(entry.expiry, datetime.max)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import time
+import unittest
+from pippy import get_stats, get_countries, get_versions
+from pippy import resilience
+from pippy.cache import memory_cache
+from pippy.exceptions import CircuitOpenError, PIPAPIError
+from pippy.stats import _stats_cache_key, _stats_request
+from support import StubServerMixin
+from pippy import cache
+
+
+class TestResilience(StubServerMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        resilience.configure_retries(
+            retries=3,
+            backoff_factor=0.01,
+            failure_threshold=2,
+            reset_timeout=0.3,
+        )
+        self.addCleanup(
+            resilience.configure_retries,
+            retries=resilience.RETRIES,
+            backoff_factor=resilience.BACKOFF_FACTOR,
+            failure_threshold=resilience.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=resilience.BREAKER_RESET_TIMEOUT,
+        )
+
+    def test_transient_errors_are_retried(self):
+        self.stub.inject(503, times=2, path="/pip")
+        df = get_stats(country="ALB", use_cache=False)
+        self.assertGreater(len(df), 0)
+        self.assertEqual(self.stub.count("/pip"), 3)
+
+    def test_dropped_connections_are_retried(self):
+        self.stub.inject(None, times=1, path="/aux")
+        self.assertGreater(len(get_countries()), 0)
+        self.assertEqual(self.stub.count("/aux"), 2)
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaises(PIPAPIError):
+            get_stats(country="INVALID", use_cache=False)
+        self.assertEqual(self.stub.count("/pip"), 1)
+
+    def test_retries_run_out(self):
+        self.stub.inject(500, times=10, path="/pip")
+        with self.assertRaises(PIPAPIError):
+            get_stats(country="ALB", use_cache=False)
+        self.assertEqual(self.stub.count("/pip"), 4)
+
+    def test_retry_after_is_honoured(self):
+        self.stub.inject(429, times=1, path="/versions", retry_after=0.3)
+        start = time.monotonic()
+        get_versions()
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(self.stub.count("/versions"), 2)
+
+    def test_long_retry_after_is_not_waited_for(self):
+        resilience.configure_retries(retry_after_max=1)
+        self.stub.inject(503, times=1, path="/versions", retry_after=3600)
+        with self.assertRaises(PIPAPIError):
+            get_versions()
+        self.assertEqual(self.stub.count("/versions"), 1)
+
+    def test_circuit_opens_and_fails_fast(self):
+        resilience.configure_retries(retries=0)
+        self.stub.down = True
+        for _ in range(2):
+            with self.assertRaises(PIPAPIError):
+                get_stats(country="ALB", use_cache=False)
+        sent = len(self.stub.requests)
+        with self.assertRaises(CircuitOpenError):
+            get_stats(country="ALB", use_cache=False)
+        self.assertEqual(len(self.stub.requests), sent)
+        breaker = resilience.get_breaker(self.stub.url)
+        self.assertEqual(breaker.state, "open")
+
+    def test_circuit_closes_after_successful_trial(self):
+        resilience.configure_retries(retries=0)
+        self.stub.down = True
+        for _ in range(2):
+            with self.assertRaises(PIPAPIError):
+                get_stats(country="ALB", use_cache=False)
+        self.stub.down = False
+        time.sleep(0.3)
+        breaker = resilience.get_breaker(self.stub.url)
+        self.assertEqual(breaker.state, "half-open")
+        self.assertGreater(len(get_stats(country="ALB", use_cache=False)), 0)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_stale_data_is_served_while_circuit_is_open(self):
+        df = get_stats(country="ALB")
+        key = _stats_cache_key(*_stats_request(country="ALB"))
+        cache.cache_frame(key, df, -1)
+        memory_cache.clear()
+
+        resilience.configure_retries(retries=0)
+        self.stub.down = True
+        for _ in range(2):
+            with self.assertRaises(PIPAPIError):
+                get_stats(country="AGO")
+        stale = get_stats(country="ALB")
+        self.assertEqual(len(stale), len(df))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import time
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from pippy import cache, get_stats
+from pippy.cache import memory_cache
+from pippy.stats import _stats_cache_key, _stats_request
+from support import StubServerMixin
+
+
+def expire(**query):
+    """Age the cached entry of a query past its expiry."""
+    key = _stats_cache_key(*_stats_request(**query))
+    entry = cache.get_cached_entry(key)
+    cache.cache_frame(key, entry.data, -1, entry.validators)
+    memory_cache.clear()
+    return key
+
+
+class TestRevalidation(StubServerMixin, unittest.TestCase):
+    def test_validators_are_stored(self):
+        get_stats(country="ALB")
+        key = _stats_cache_key(*_stats_request(country="ALB"))
+        validators = cache.get_cached_entry(key).validators
+        self.assertIn("etag", validators)
+        self.assertIn("last_modified", validators)
+
+    def test_not_modified_renews_the_entry(self):
+        original = get_stats(country="ALB")
+        key = expire(country="ALB")
+        self.stub.reset()
+
+        df = get_stats(country="ALB")
+        pd.testing.assert_frame_equal(df, original)
+        self.assertEqual(self.stub.count("/pip"), 1)
+        self.assertIn("If-None-Match", self.stub.headers[-1])
+        self.assertTrue(cache.get_cached_entry(key).fresh)
+
+        get_stats(country="ALB")
+        self.assertEqual(self.stub.count("/pip"), 1)
+
+    def test_not_modified_only_rewrites_the_metadata(self):
+        get_stats(country="ALB")
+        key = expire(country="ALB")
+        path = next(self.cache_dir.rglob("*.arrow"))
+        before = path.read_bytes()
+        with patch("pippy.stats.cache_frame") as cache_frame:
+            get_stats(country="ALB")
+        cache_frame.assert_not_called()
+        self.assertTrue(cache.get_cached_entry(key).fresh)
+        after = path.read_bytes()
+        self.assertEqual(len(after), len(before))
+        # Only the expiry, stored in the header and the footer, changed.
+        changed = sum(a != b for a, b in zip(before, after))
+        self.assertLess(changed, 64)
+
+    def test_changed_data_is_downloaded(self):
+        get_stats(country="ALB")
+        expire(country="ALB")
+        self.stub.release = "20250930"
+        df = get_stats(country="ALB")
+        self.assertEqual(set(df["release_version"]), {"20250930"})
+
+    def test_last_modified_is_used_without_etag(self):
+        get_stats(country="ALB")
+        key = _stats_cache_key(*_stats_request(country="ALB"))
+        entry = cache.get_cached_entry(key)
+        validators = {"last_modified": entry.validators["last_modified"]}
+        cache.cache_frame(key, entry.data, -1, validators)
+        memory_cache.clear()
+        self.stub.reset()
+        get_stats(country="ALB")
+        self.assertIn("If-Modified-Since", self.stub.headers[-1])
+        self.assertTrue(cache.get_cached_entry(key).fresh)
+
+    def test_stale_while_revalidate(self):
+        original = get_stats(country="ALB")
+        key = expire(country="ALB")
+        self.stub.reset()
+        self.stub.delay = 0.2
+
+        start = time.perf_counter()
+        df = get_stats(country="ALB", stale_while_revalidate=True)
+        self.assertLess(time.perf_counter() - start, 0.2)
+        pd.testing.assert_frame_equal(df, original)
+
+        deadline = time.monotonic() + 5
+        while not cache.get_cached_entry(key).fresh:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+        self.assertEqual(self.stub.count("/pip"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from pippy import get_stats, get_countries, get_versions
+from pippy import session
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+
+class TestSession(StubServerMixin, unittest.TestCase):
+    def setUp(self):
+        session.reset_session()
+        self.addCleanup(session.reset_session)
+        super().setUp()
+
+    def test_connections_are_reused(self):
+        for year in (2001, 2004, 2007):
+            get_stats(country="ALB", year=year, use_cache=False)
+        get_countries()
+        get_versions()
+        self.assertEqual(self.stub.connections, 1)
+
+    def test_pool_is_shared_across_threads(self):
+        session.configure_session(pool_maxsize=4)
+        self.addCleanup(session.configure_session, pool_maxsize=16)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            frames = list(
+                pool.map(
+                    lambda year: get_stats(
+                        country="ALB", year=year, use_cache=False
+                    ),
+                    range(2000, 2020),
+                )
+            )
+        self.assertEqual(len(frames), 20)
+        self.assertLessEqual(self.stub.connections, 5)
+
+    def test_gzip_is_negotiated(self):
+        df = get_stats(country="ALB", use_cache=False)
+        self.assertGreater(len(df), 0)
+        self.assertIn("gzip", self.stub.headers[-1]["Accept-Encoding"])
+
+    def test_endpoint_timeouts(self):
+        self.assertEqual(
+            session.endpoint_timeout(f"{self.stub.url}/pip"),
+            session.ENDPOINT_TIMEOUTS["pip"],
+        )
+        self.assertEqual(
+            session.endpoint_timeout(f"{self.stub.url}/unknown"),
+            session.DEFAULT_TIMEOUT,
+        )
+
+    def test_read_timeout_raises_pip_api_error(self):
+        session.configure_session(timeouts={"pip": (1, 0.05)})
+        self.addCleanup(
+            session.configure_session,
+            timeouts={"pip": session.ENDPOINT_TIMEOUTS["pip"]},
+        )
+        self.stub.delay = 0.5
+        with self.assertRaises(PIPAPIError):
+            get_stats(country="ALB", use_cache=False)
+
+    def test_set_session_overrides_pool(self):
+        custom = requests.Session()
+        session.set_session(custom)
+        self.addCleanup(session.set_session, None)
+        self.assertIs(session.get_session(), custom)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from contextlib import ExitStack
+import pandas as pd
+from pippy import get_countries, get_stats, get_wb
+from pippy import snapshot
+from pippy.cache import memory_cache
+from pippy.exceptions import PIPAPIError
+from support import stub_server, temporary_cache
+
+
+class TestSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        stack = ExitStack()
+        cls.addClassCleanup(stack.close)
+        stack.enter_context(temporary_cache())
+        with stub_server():
+            cls.online = {
+                "stats": get_stats(use_cache=False),
+                "filled": get_stats(fill_gaps=True, use_cache=False),
+                "alb": get_stats(country="ALB", povline=3.65, use_cache=False),
+                "wb": get_wb(year=2015),
+                "countries": get_countries(),
+            }
+            cls.snapshot = snapshot.build_snapshot(povlines=[None, 3.65])
+        memory_cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        snapshot.close_snapshot()
+
+    def test_offline_queries_match_the_api(self):
+        pd.testing.assert_frame_equal(
+            get_stats(offline=True), self.online["stats"]
+        )
+        pd.testing.assert_frame_equal(
+            get_stats(fill_gaps=True, offline=True), self.online["filled"]
+        )
+        pd.testing.assert_frame_equal(
+            get_stats(country="ALB", povline=3.65, offline=True),
+            self.online["alb"],
+        )
+        pd.testing.assert_frame_equal(
+            get_wb(year=2015, offline=True), self.online["wb"]
+        )
+        pd.testing.assert_frame_equal(
+            get_countries(offline=True), self.online["countries"]
+        )
+
+    def test_filters(self):
+        df = get_stats(
+            country="ALB,AGO",
+            year=2015,
+            welfare_type="income",
+            fill_gaps=True,
+            offline=True,
+        )
+        self.assertEqual(set(df["country_code"]), {"ALB"})
+        self.assertEqual(set(df["reporting_year"]), {2015})
+        region = get_stats(region="SSA", offline=True)
+        self.assertEqual(set(region["region_code"]), {"SSA"})
+
+    def test_missing_povline_raises(self):
+        with self.assertRaises(PIPAPIError):
+            get_stats(country="ALB", povline=10, offline=True)
+
+    def test_other_release_raises(self):
+        with self.assertRaises(PIPAPIError):
+            get_stats(release_version="20000101", offline=True)
+
+    def test_queries_use_the_indexes(self):
+        conn = self.snapshot._connect()
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM pip WHERE fill_gaps = 0 AND "
+            "poverty_line = 2.15 AND country_code IN ('ALB') "
+            "AND reporting_year IN (2015)"
+        ).fetchall()
+        self.assertIn("USING INDEX pip_query", " ".join(r[-1] for r in plan))
+
+    def test_default_snapshot_is_found(self):
+        snapshot.close_snapshot()
+        self.assertEqual(snapshot.get_snapshot().path, self.snapshot.path)
+        self.assertEqual(
+            snapshot.get_snapshot().metadata["release_version"],
+            self.online["stats"]["release_version"].iloc[0],
+        )
+
+    def test_aux_table_list(self):
+        self.assertIn("countries", snapshot.get_snapshot().query_aux(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from pippy import get_countries, get_stats, iter_stats, set_server, transport
+from pippy import utils
+from pippy.exceptions import ReplayMissError
+from support import StubServerMixin, enter_context, temporary_cache
+
+
+class TestTransport(StubServerMixin, unittest.TestCase):
+    lazy_server = True
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(transport.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cassette = Path(directory.name) / "cassette"
+        utils._releases.clear()
+        self.addCleanup(utils._releases.clear)
+
+    def use_empty_cache(self):
+        enter_context(self, temporary_cache())
+        utils._releases.clear()
+
+    def record(self):
+        with transport.cassette(self.cassette, mode="record") as cassette:
+            set_server(self.stub.url)
+            stats = get_stats(country="ALB")
+            countries = get_countries()
+        return cassette, stats, countries
+
+    def test_replay_without_network(self):
+        cassette, stats, countries = self.record()
+        self.assertEqual(len(cassette), 4)
+        url = self.stub.url
+        self.stub.stop()
+        self.use_empty_cache()
+
+        with transport.cassette(self.cassette):
+            set_server(url)
+            replayed = get_stats(country="ALB")
+            replayed_countries = get_countries()
+        self.assertTrue(stats.equals(replayed))
+        self.assertTrue(countries.equals(replayed_countries))
+
+    def test_replay_ignores_host(self):
+        self.record()
+        self.use_empty_cache()
+        requests = len(self.stub.requests)
+        with transport.cassette(self.cassette):
+            set_server("http://pip.invalid/pip/v1")
+            df = get_stats(country="ALB")
+        self.assertGreater(len(df), 0)
+        self.assertEqual(len(self.stub.requests), requests)
+
+    def test_unrecorded_request(self):
+        self.record()
+        with transport.cassette(self.cassette):
+            with self.assertRaises(ReplayMissError):
+                get_stats(country="AGO", use_cache=False)
+
+    def test_simulated_latency(self):
+        self.record()
+        self.use_empty_cache()
+        with transport.cassette(self.cassette, latency=0.05):
+            set_server(self.stub.url)
+            start = time.perf_counter()
+            get_stats(country="ALB")
+        # The release lookup and the query itself.
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+
+        seen = []
+
+        def latency(request):
+            seen.append(request.path_url)
+            return 0
+
+        self.use_empty_cache()
+        with transport.cassette(self.cassette, latency=latency):
+            get_stats(country="ALB")
+        self.assertTrue(any("/pip?" in url for url in seen))
+
+    def test_streaming_replay(self):
+        with transport.cassette(self.cassette, mode="record"):
+            set_server(self.stub.url)
+            recorded = list(iter_stats(country="ALB", use_cache=False))
+        self.stub.stop()
+        with transport.cassette(self.cassette):
+            replayed = list(iter_stats(country="ALB", use_cache=False))
+        self.assertEqual(len(replayed), len(recorded))
+        self.assertTrue(recorded[0].equals(replayed[0]))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            with transport.cassette(self.cassette, mode="rewind"):
+                pass
+
+
+if __name__ == "__main__":
+    unittest.main()
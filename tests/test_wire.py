@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+import pandas as pd
+from pippy import get_aux, get_stats, get_wb, metrics, wire
+from pippy.exceptions import PIPAPIError
+from support import StubServerMixin
+
+
+class TestArrowFormat(StubServerMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(wire._no_arrow.clear)
+
+    def formats(self, path):
+        return [
+            params.get("format")
+            for p, params in self.stub.requests
+            if p == path
+        ]
+
+    def test_same_frame_as_json(self):
+        for query in (
+            {"country": "ALB"},
+            {"fill_gaps": True, "povline": 3.65},
+            {"country": "ALB", "compact": True},
+        ):
+            with self.subTest(**query):
+                expected = get_stats(use_cache=False, **query)
+                df = get_stats(format="arrow", use_cache=False, **query)
+                pd.testing.assert_frame_equal(df, expected)
+        self.assertEqual(self.formats("/pip")[-1], "arrow")
+        pd.testing.assert_frame_equal(
+            get_wb(format="arrow"), get_wb(format="json")
+        )
+
+    def test_aux_tables(self):
+        df = get_aux("countries", format="arrow", use_cache=False)
+        expected = get_aux("countries", use_cache=False)
+        pd.testing.assert_frame_equal(df, expected)
+        self.assertEqual(self.formats("/aux"), ["arrow", "json"])
+
+    def test_shares_cache_with_json(self):
+        df = get_stats(country="ALB")
+        requests = len(self.stub.requests)
+        pd.testing.assert_frame_equal(
+            get_stats(country="ALB", format="arrow"), df
+        )
+        self.assertEqual(len(self.stub.requests), requests)
+
+    def test_frames_are_writable(self):
+        df = get_stats(country="ALB", format="arrow", use_cache=False)
+        df.loc[0, "headcount"] = 0.5
+        self.assertEqual(df.loc[0, "headcount"], 0.5)
+
+    def test_falls_back_when_server_refuses(self):
+        self.stub.arrow = False
+        expected = get_stats(country="ALB", use_cache=False)
+        df = get_stats(country="ALB", format="arrow", use_cache=False)
+        pd.testing.assert_frame_equal(df, expected)
+        get_stats(country="AGO", format="arrow", use_cache=False)
+        # Only the first query asks for Arrow, and is repeated as JSON.
+        self.assertEqual(
+            self.formats("/pip"), ["json", "arrow", "json", "json"]
+        )
+
+    def test_other_client_errors_keep_arrow(self):
+        self.stub.inject(status=400, path="/pip")
+        with self.assertRaises(PIPAPIError):
+            get_stats(country="ALB", format="arrow", use_cache=False)
+        self.assertEqual(wire._no_arrow, set())
+        get_stats(country="ALB", format="arrow", use_cache=False)
+        self.assertEqual(self.formats("/pip"), ["arrow", "arrow"])
+
+    def test_falls_back_without_pyarrow(self):
+        with patch("pippy.wire._pyarrow", return_value=None):
+            df = get_stats(country="ALB", format="arrow", use_cache=False)
+        self.assertGreater(len(df), 0)
+        self.assertEqual(self.formats("/pip"), ["json"])
+
+    def test_parse_metrics(self):
+        events = []
+        metrics.subscribe(events.append)
+        self.addCleanup(metrics.unsubscribe, events.append)
+        get_stats(country="ALB", format="arrow", use_cache=False)
+        parse = [event for event in events if event.name == "parse"]
+        self.assertEqual(parse[0].attrs["format"], "arrow")
+
+    def test_corrupt_body(self):
+        with patch("pippy.stats.read_arrow", side_effect=ValueError("bad")):
+            with self.assertRaises(PIPAPIError):
+                get_stats(country="ALB", format="arrow", use_cache=False)
+
+
+if __name__ == "__main__":
+    unittest.main()